@@ -1,5 +1,7 @@
 from __future__ import annotations
+import argparse
 import os
+import sys
 from pathlib import Path
 from dotenv import load_dotenv
 
@@ -13,10 +15,21 @@ loaded = load_dotenv(dotenv_path=ENV_FILE, override=True)
 from src.logger import get_logger, LOG_PATH
 from src.extract import fetch_movies, ExtractError
 from src.transform import transform_movies, TransformError
-from src.load import get_engine, load_movies_refresh
+from src.load import get_engine, load_movies_refresh, load_movies_incremental
+from src.profiling import add_profile_arguments, profiler_from_args
 
-def main() -> int:
+
+def parse_args(argv: list[str] | None = None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="OMDb ETL")
+    add_profile_arguments(parser)
+    return parser.parse_args([] if argv is None else argv)
+
+
+def main(argv: list[str] | None = None) -> int:
     logger = get_logger()
+    args = parse_args(argv)
+    # --profile: cProfile, samplade stackar (och ev. tracemalloc) per steg i data/profiles/<run-id>/
+    profiler = profiler_from_args(args)
 
     # För att visa vilken env som används och vilken query som används.
     logger.info(f".env loaded from {ENV_FILE} -> {loaded}")
@@ -27,15 +40,24 @@ def main() -> int:
         logger.warning("SEARCH_QUERY not set; using default 'Batman'")
 
     try:
-        raw = fetch_movies(query=query, page=1)
-        trf = transform_movies(raw)
+        with profiler.stage("extract"):
+            raw = fetch_movies(query=query, page=1)
+        with profiler.stage("transform"):
+            trf = transform_movies(raw, memory_hook=profiler.memory_hook("transform"))
         engine = get_engine()
         if engine.url.get_backend_name() == "sqlite":
             db_fs_path = Path(engine.url.database).resolve()
             logger.info(f"SQLite path: {db_fs_path}")
         logger.info(f"Log file path: {LOG_PATH}")
 
-        load_movies_refresh(engine, trf)
+        # LOAD_MODE=incremental slår ihop på imdb_id istället för full refresh
+        with profiler.stage("load"):
+            if os.getenv("LOAD_MODE", "refresh") == "incremental":
+                load_movies_incremental(
+                    engine, trf, delete_missing=os.getenv("LOAD_DELETE_MISSING", "0") == "1"
+                )
+            else:
+                load_movies_refresh(engine, trf)
         logger.info("✅ ETL klart utan fel.")
         return 0
 
@@ -45,6 +67,8 @@ def main() -> int:
     except Exception as e:
         logger.exception(f"❌ Oväntat fel: {e}")
         return 2
+    finally:
+        profiler.close()
 
 if __name__ == "__main__":
-    raise SystemExit(main())
+    raise SystemExit(main(sys.argv[1:]))
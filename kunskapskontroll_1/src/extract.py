@@ -1,5 +1,6 @@
 from __future__ import annotations
 import os
+import time
 import requests
 import pandas as pd
 from dotenv import load_dotenv
@@ -23,22 +24,29 @@ def fetch_movies(query: str, page: int = 1) -> pd.DataFrame:
         raise ExtractError("OMDB_API_KEY saknas i .env")
 
     params = {"apikey": OMDB_API_KEY, "s": query, "page": page}
+    fields = {"event": "omdb.page", "query": query, "page": page}
+    started = time.perf_counter()
     try:
         r = requests.get(OMDB_URL, params=params, timeout=15)
         r.raise_for_status()
         data = r.json()
     except requests.RequestException as e:
-        logger.error(f"HTTP-fel vid hämtning: {e}")
+        logger.error("HTTP-fel vid hämtning: %s", e, extra=fields)
         raise ExtractError("Nätverksfel mot OMDb") from e
+    fields["latency_ms"] = round((time.perf_counter() - started) * 1000, 1)
 
     if data.get("Response") != "True":
         # OMDb svarar med {"Response":"False","Error":"Movie not found!"} etc.
         msg = data.get("Error", "Okänt fel från OMDb")
-        logger.warning(f"OMDb fel: {msg}")
+        logger.warning("OMDb fel: %s", msg, extra=fields)
         # Returnera tom DF för minimalism (istället för exception)
         return pd.DataFrame(columns=["imdbID", "Title", "Year", "Type"])
 
     items = data.get("Search", [])
     df = pd.DataFrame(items, columns=["imdbID", "Title", "Year", "Type"])
-    logger.info(f"Hämtade {len(df)} rader från OMDb för '{query}' (page={page}).")
+    # Lat formatering + sampling (LOG_SAMPLE=omdb.page=N) – loggas för varje sida
+    logger.info(
+        "Hämtade %d rader från OMDb för '%s' (page=%s).", len(df), query, page,
+        extra={**fields, "rows": len(df)},
+    )
     return df
@@ -30,11 +30,33 @@ def ensure_schema(engine: Engine) -> None:
       title   TEXT NOT NULL,
       year    INTEGER,
       type    TEXT NOT NULL,
-      fetched_at TEXT NOT NULL
+      fetched_at TEXT NOT NULL,
+      row_hash TEXT
     );
     """
     with engine.begin() as conn:
         conn.execute(text(sql))
+        # Tables created before row_hash existed get the column added in place
+        _ensure_column(conn, "movies", "row_hash", "TEXT")
+
+def _ensure_column(conn, table: str, column: str, decl: str) -> None:
+    cols = {r[1] for r in conn.execute(text(f"PRAGMA table_info('{table}')")).fetchall()}
+    if column not in cols:
+        conn.execute(text(f"ALTER TABLE {table} ADD COLUMN {column} {decl}"))
+
+def _row_hashes(df: pd.DataFrame) -> pd.Series:
+    """
+    Per-row content hash (16 hex chars) over every column except fetched_at,
+    so a row that was merely re-fetched does not count as changed.
+    """
+    content_cols = [c for c in df.columns if c not in ("fetched_at", "row_hash")]
+    hashes = pd.util.hash_pandas_object(df[content_cols], index=False)
+    return hashes.map("{:016x}".format)
+
+def _to_records(df: pd.DataFrame) -> list[dict]:
+    """DataFrame -> list of dicts with plain Python values and None for NaN/NA."""
+    obj = df.astype(object)
+    return obj.where(obj.notna(), None).to_dict("records")
 
 def load_movies_refresh(engine: Engine, df: pd.DataFrame) -> None:
     """
@@ -51,5 +73,74 @@ def load_movies_refresh(engine: Engine, df: pd.DataFrame) -> None:
         logger.info("0 rader – tabellen rensad; inget att ladda.")
         return
 
+    df = df.assign(row_hash=_row_hashes(df))
     df.to_sql("movies", con=engine, if_exists="append", index=False)
     logger.info(f"Laddade {len(df)} rader till 'movies' (full refresh, behåller constraints).")
+
+def load_movies_incremental(
+    engine: Engine,
+    df: pd.DataFrame,
+    delete_missing: bool = False,
+) -> dict[str, int]:
+    """
+    Incremental merge on imdb_id (INSERT ... ON CONFLICT DO UPDATE):
+    - Inserts new imdb_ids
+    - Rewrites existing rows only when their row_hash (content) changed
+    - delete_missing=True removes rows absent from this run
+    - An empty df leaves the table untouched
+    Returns row counts: inserted, updated, unchanged, deleted.
+    """
+    ensure_schema(engine)
+    stats = {"inserted": 0, "updated": 0, "unchanged": 0, "deleted": 0}
+
+    if df.empty:
+        logger.info("0 rader – inget att slå ihop; tabellen lämnas orörd.")
+        return stats
+
+    df = df.drop_duplicates(subset=["imdb_id"], keep="first")
+    df = df.assign(row_hash=_row_hashes(df))
+
+    cols = list(df.columns)
+    col_list = ", ".join(cols)
+    params = ", ".join(f":{c}" for c in cols)
+    updates = ", ".join(f"{c} = excluded.{c}" for c in cols if c != "imdb_id")
+
+    with engine.begin() as conn:
+        # Incoming rows go to a TEMP table first (never written to the db file)
+        conn.execute(text("DROP TABLE IF EXISTS temp.movies_incoming"))
+        conn.execute(text(f"CREATE TEMP TABLE movies_incoming AS SELECT {col_list} FROM movies WHERE 0"))
+        conn.execute(text(f"INSERT INTO temp.movies_incoming ({col_list}) VALUES ({params})"), _to_records(df))
+
+        stats["inserted"] = conn.execute(text("""
+            SELECT COUNT(*) FROM temp.movies_incoming i
+            WHERE NOT EXISTS (SELECT 1 FROM movies m WHERE m.imdb_id = i.imdb_id)
+        """)).scalar_one()
+        stats["updated"] = conn.execute(text("""
+            SELECT COUNT(*) FROM temp.movies_incoming i
+            JOIN movies m ON m.imdb_id = i.imdb_id
+            WHERE m.row_hash IS NOT i.row_hash
+        """)).scalar_one()
+        stats["unchanged"] = len(df) - stats["inserted"] - stats["updated"]
+
+        # The WHERE clause skips the write entirely for unchanged rows
+        conn.execute(text(f"""
+            INSERT INTO movies ({col_list})
+            SELECT {col_list} FROM temp.movies_incoming WHERE true
+            ON CONFLICT(imdb_id) DO UPDATE SET {updates}
+            WHERE movies.row_hash IS NOT excluded.row_hash
+        """))
+
+        if delete_missing:
+            stats["deleted"] = conn.execute(text("""
+                DELETE FROM movies
+                WHERE imdb_id NOT IN (SELECT imdb_id FROM temp.movies_incoming)
+            """)).rowcount
+
+        conn.execute(text("DROP TABLE temp.movies_incoming"))
+
+    logger.info(
+        f"Inkrementell laddning till 'movies': {stats['inserted']} nya, "
+        f"{stats['updated']} ändrade, {stats['unchanged']} oförändrade, "
+        f"{stats['deleted']} borttagna."
+    )
+    return stats
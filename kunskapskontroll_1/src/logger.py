@@ -1,6 +1,10 @@
 from __future__ import annotations
+import atexit
+import json
 import logging
-from logging.handlers import RotatingFileHandler
+import queue
+import threading
+from logging.handlers import QueueHandler, QueueListener, RotatingFileHandler
 from pathlib import Path
 import os
 from dotenv import load_dotenv
@@ -16,46 +20,227 @@ LOG_PATH = LOG_DIR / LOG_FILE
 
 
 _logger: logging.Logger | None = None
+_settings: tuple | None = None  # inställningarna som nuvarande handlers byggdes med
 
-def get_logger() -> logging.Logger:
+
+# --- Delad kod: identisk i kunskapskontroll_1/src/logger.py och kunskapskontroll_2/src/logger.py ---
+# Projekten är fristående och kan inte dela modul: ändra båda filerna
+# (tests/test_logger.py jämför blocken när båda projekten finns).
+
+# Kö-läge (LOG_QUEUE=1): loggningen lägger bara posten i en begränsad kö och
+# en bakgrundstråd (QueueListener) skriver till fil/console. När kön är full:
+# - DEBUG/INFO kastas (och räknas i dropped), så att API-hämtningen aldrig väntar
+# - WARNING och högre väntar högst LOG_QUEUE_BLOCK_SEC innan de också kastas
+LOG_QUEUE_SIZE = 10_000
+LOG_QUEUE_BLOCK_SEC = 1.0
+
+# Strukturerad loggning (LOG_FORMAT=json): en JSON-rad per post med fasta
+# fält (se LOG_FIELDS) som skickas via extra={...}. Meddelandet formateras
+# lat (logger.info("... %s", x)), dvs. först när posten faktiskt skrivs.
+LOG_FIELDS = ("event", "query", "page", "imdb_id", "rows", "latency_ms")
+
+# Sampling av högvolym-händelser: LOG_SAMPLE="omdb.page=10,omdb.details=100"
+# behåller var 10:e/100:e post med det event-namnet. WARNING och högre samplas aldrig.
+
+
+class JsonFormatter(logging.Formatter):
+    """Formaterar en post som en JSON-rad (ts, level, msg + LOG_FIELDS)."""
+
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            "ts": self.formatTime(record),
+            "level": record.levelname,
+            "msg": record.getMessage(),
+        }
+        for field in LOG_FIELDS:
+            value = getattr(record, field, None)
+            if value is not None:
+                entry[field] = value
+        if record.exc_info:
+            entry["exc"] = self.formatException(record.exc_info)
+        return json.dumps(entry, ensure_ascii=False, default=str)
+
+
+def parse_sample_rates(spec: str | None) -> dict[str, int]:
+    """'omdb.page=10,omdb.details=100' -> {"omdb.page": 10, "omdb.details": 100}"""
+    rates = {}
+    for part in (spec or "").split(","):
+        name, _, every = part.partition("=")
+        if name.strip() and every.strip().isdigit() and int(every) > 1:
+            rates[name.strip()] = int(every)
+    return rates
+
+
+class SamplingFilter(logging.Filter):
     """
-    Skapa en 'etl' loggare på ett idempotent vis:
-    - Alltid (re)konfigurerar loggaren baserad på nuvarande env värden.
-    - Raderar förinställda handlers för att undvika duplicering,
-      vilket kan hända efter att modulen laddar om under testning.
+    Släpper igenom var N:e post per event-namn (den första alltid).
+    Sitter på loggern, så bortsamplade poster formateras eller köas aldrig.
     """
-    global _logger
-    
-    LOG_DIR.mkdir(parents=True, exist_ok=True)
 
-    logger = logging.getLogger("etl")
-    logger.setLevel(logging.INFO)
-    logger.propagate = False  # Undviker dubbelloggning via "root"
+    def __init__(self, rates: dict[str, int]):
+        super().__init__()
+        self.rates = rates
+        self.seen: dict[str, int] = {}
+        self._lock = threading.Lock()
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        event = getattr(record, "event", None)
+        every = self.rates.get(event)
+        if every is None or record.levelno >= logging.WARNING:
+            return True
+        with self._lock:
+            n = self.seen.get(event, 0)
+            self.seen[event] = n + 1
+        return n % every == 0
+
+
+def _make_formatter(log_format: str) -> logging.Formatter:
+    if log_format == "json":
+        return JsonFormatter()
+    return logging.Formatter("%(asctime)s [%(levelname)s] %(message)s")
+
+
+class BoundedQueueHandler(QueueHandler):
+    """QueueHandler med begränsad kö och uttalad policy när kön är full."""
 
-    # --- Idempotens: raderar alla gamla handlers på denna loggare ---
-    if logger.handlers:
-        for h in list(logger.handlers):
-            logger.removeHandler(h)
-            try:
+    def __init__(self, q: queue.Queue, block_sec: float = LOG_QUEUE_BLOCK_SEC):
+        super().__init__(q)
+        self.block_sec = block_sec
+        self.dropped = 0
+        self.listener: QueueListener | None = None
+
+    def enqueue(self, record: logging.LogRecord) -> None:
+        try:
+            if record.levelno >= logging.WARNING:
+                self.queue.put(record, timeout=self.block_sec)
+            else:
+                self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+    def close(self) -> None:
+        # Stoppa lyssnaren först: den tömmer kön och flushar fil-handlern
+        if self.listener is not None:
+            self.listener.stop()
+            if self.dropped:
+                note = logging.makeLogRecord({
+                    "name": "etl", "levelno": logging.WARNING, "levelname": "WARNING",
+                    "msg": f"{self.dropped} loggposter kastades (full loggkö).",
+                })
+                for h in self.listener.handlers:
+                    h.handle(note)
+            for h in self.listener.handlers:
                 h.close()
-            except Exception:
-                pass
-    # -----------------------------------------------------------
+            self.listener = None
+        super().close()
+
+
+def _close_handlers(logger: logging.Logger) -> None:
+    for h in list(logger.handlers):
+        logger.removeHandler(h)
+        try:
+            h.close()
+        except Exception:
+            pass
+
+
+def shutdown_logging() -> None:
+    """Tömmer loggkön (kö-läge) och stänger alla handlers. Körs även vid atexit."""
+    global _logger
+    _close_handlers(logging.getLogger("etl"))
+    _logger = None  # nästa get_logger() bygger om handlers
 
-    fmt = logging.Formatter("%(asctime)s [%(levelname)s] %(message)s")
+
+atexit.register(shutdown_logging)
+
+
+def _attach_handlers(logger: logging.Logger, log_path: Path, log_format: str,
+                     sample_spec: str | None, use_queue: bool) -> None:
+    """
+    Stänger loggarens gamla handlers och kopplar på nya: roterande fil +
+    console, direkt eller bakom en BoundedQueueHandler (kö-läge), samt
+    ev. SamplingFilter.
+    """
+    _close_handlers(logger)
+    fmt = _make_formatter(log_format)
+
+    # Sampling på loggern: gäller alla handlers och sker före formatering/kö
+    for f in [f for f in logger.filters if isinstance(f, SamplingFilter)]:
+        logger.removeFilter(f)
+    rates = parse_sample_rates(sample_spec)
+    if rates:
+        logger.addFilter(SamplingFilter(rates))
 
     fh = RotatingFileHandler(
-        filename=str(LOG_PATH),
+        filename=str(log_path),
         maxBytes=1_000_000,
         backupCount=3,
         encoding="utf-8",
     )
     fh.setFormatter(fmt)
-    logger.addHandler(fh)
 
     sh = logging.StreamHandler()
     sh.setFormatter(fmt)
-    logger.addHandler(sh)
+
+    if use_queue:
+        qh = BoundedQueueHandler(queue.Queue(maxsize=LOG_QUEUE_SIZE))
+        qh.listener = QueueListener(qh.queue, fh, sh, respect_handler_level=True)
+        qh.listener.start()
+        logger.addHandler(qh)
+    else:
+        logger.addHandler(fh)
+        logger.addHandler(sh)
+
+
+# --- Slut på delad kod ---
+
+
+def _settings_key() -> tuple:
+    """
+    Inställningarna som loggern byggs utifrån. LOG_DIR/LOG_FILE läses vid
+    import (modulen laddas om i testerna), LOG_QUEUE/LOG_FORMAT/LOG_SAMPLE
+    läses vid varje anrop.
+    """
+    return (
+        str(LOG_PATH),
+        os.getenv("LOG_QUEUE", "0"),
+        os.getenv("LOG_FORMAT", "text"),
+        os.getenv("LOG_SAMPLE", ""),
+    )
+
+
+def get_logger() -> logging.Logger:
+    """
+    Returnerar 'etl'-loggaren. Handlers byggs en gång per process:
+    - Nästa anrop återanvänder dem så länge inställningarna (_settings_key)
+      är oförändrade – ingen fil öppnas om i extract/transform/load/main.
+    - Ändras inställningarna (eller efter reconfigure()/shutdown_logging())
+      byggs handlers om. Gamla handlers stängs först för att undvika
+      duplicering, vilket också gäller efter att modulen laddats om i testerna.
+    - LOG_QUEUE=1: fil-/console-skrivningen sker i en bakgrundstråd (se ovan).
+    - LOG_FORMAT=json / LOG_SAMPLE: strukturerade JSON-rader och sampling (se ovan).
+    """
+    logger = logging.getLogger("etl")
+    if _logger is not None and _settings == _settings_key() and logger.handlers:
+        return _logger
+    return reconfigure()
+
+
+def reconfigure() -> logging.Logger:
+    """Bygger om loggarens handlers utifrån nuvarande inställningar."""
+    global _logger, _settings
+
+    settings = _settings_key()
+    _, use_queue, log_format, sample_spec = settings
+    LOG_DIR.mkdir(parents=True, exist_ok=True)
+
+    logger = logging.getLogger("etl")
+    logger.setLevel(logging.INFO)
+    logger.propagate = False  # Undviker dubbelloggning via "root"
+
+    # Idempotens: gamla handlers på loggaren stängs innan nya kopplas på
+    _attach_handlers(logger, LOG_PATH, log_format, sample_spec, use_queue == "1")
 
     _logger = logger
-    return logger
\ No newline at end of file
+    _settings = settings
+    return logger
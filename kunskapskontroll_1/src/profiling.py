@@ -0,0 +1,185 @@
+"""
+Inbyggd profilering av en körning (main.py --profile).
+
+Per steg (extract, transform, load) skrivs till data/profiles/<run-id>/:
+- <steg>.prof         cProfile-statistik (öppna med pstats, snakeviz, ...)
+- <steg>.txt          de tyngsta funktionerna sorterat på kumulativ tid
+- <steg>.folded       samplade väggklocke-stackar i "folded"-format
+                      (flamegraph.pl, speedscope, inferno)
+- <steg>.memory.txt   tracemalloc-diff över steget (bara med --profile-memory),
+                      plus transformens egen topp via memory_hook(steg)
+
+Samplingen görs av en bakgrundstråd som läser huvudtrådens stack med
+jämna mellanrum, så den ser även väntan på nätverk och databas.
+"""
+
+from __future__ import annotations
+import cProfile
+import io
+import pstats
+import sys
+import threading
+import tracemalloc
+from collections import Counter
+from contextlib import contextmanager
+from datetime import datetime
+from pathlib import Path
+from typing import Callable, Iterator, Optional
+
+from .logger import get_logger
+
+logger = get_logger()
+
+# --- Delad kod: identisk i kunskapskontroll_1/src/profiling.py och kunskapskontroll_2/src/profiling.py ---
+# Projekten är fristående och kan inte dela modul: ändra båda filerna
+# (tests/test_profiling.py jämför blocken när båda projekten finns).
+
+BASE_DIR = Path(__file__).resolve().parents[1]
+PROFILES_DIR = BASE_DIR / "data" / "profiles"
+SAMPLE_INTERVAL_MS = 5.0
+TOP_FUNCTIONS = 30
+TOP_ALLOCATIONS = 30
+
+
+def _folded_stack(frame) -> str:
+    """Stacken som 'yttersta;...;innersta' (modul:funktion:rad per ram)."""
+    parts = []
+    while frame is not None:
+        code = frame.f_code
+        parts.append(f"{Path(code.co_filename).stem}:{code.co_name}:{code.co_firstlineno}")
+        frame = frame.f_back
+    return ";".join(reversed(parts))
+
+
+class _StackSampler(threading.Thread):
+    """Samplar en tråds stack var interval_sec och räknar ihop identiska stackar."""
+
+    def __init__(self, thread_id: int, interval_sec: float):
+        super().__init__(name="stack-sampler", daemon=True)
+        self.thread_id = thread_id
+        self.interval_sec = interval_sec
+        self.samples: Counter[str] = Counter()
+        self._done = threading.Event()
+
+    def run(self) -> None:
+        while not self._done.wait(self.interval_sec):
+            frame = sys._current_frames().get(self.thread_id)
+            if frame is not None:
+                self.samples[_folded_stack(frame)] += 1
+
+    def stop(self) -> Counter[str]:
+        self._done.set()
+        self.join()
+        return self.samples
+
+
+class Profiler:
+    """
+    Profilerar pipelinens steg. Med enabled=False är stage() en no-op,
+    så main.py kan alltid gå via profilern.
+    """
+
+    def __init__(
+        self,
+        enabled: bool = False,
+        out_dir: Optional[Path] = None,
+        memory: bool = False,
+        sample_interval_ms: float = SAMPLE_INTERVAL_MS,
+    ):
+        self.enabled = enabled
+        self.memory = enabled and memory
+        self.sample_interval_sec = sample_interval_ms / 1000
+        run_id = datetime.now().strftime("%Y%m%d-%H%M%S")
+        self.out_dir = Path(out_dir) if out_dir is not None else PROFILES_DIR / run_id
+        self._profiles: dict[str, cProfile.Profile] = {}
+        self._samples: dict[str, Counter[str]] = {}
+        self._hook_peaks: dict[str, int] = {}
+
+    @contextmanager
+    def stage(self, name: str) -> Iterator[None]:
+        """Profilerar ett steg; körs steget flera gånger läggs resultaten ihop."""
+        if not self.enabled:
+            yield
+            return
+
+        self.out_dir.mkdir(parents=True, exist_ok=True)
+        if self.memory and not tracemalloc.is_tracing():
+            tracemalloc.start()
+        before = tracemalloc.take_snapshot() if self.memory else None
+
+        sampler = _StackSampler(threading.get_ident(), self.sample_interval_sec)
+        profile = self._profiles.setdefault(name, cProfile.Profile())
+        sampler.start()
+        profile.enable()
+        try:
+            yield
+        finally:
+            profile.disable()
+            self._samples.setdefault(name, Counter()).update(sampler.stop())
+            self._write_stage(name, profile)
+            if before is not None:
+                self._write_memory_diff(name, before, tracemalloc.take_snapshot())
+
+    def memory_hook(self, name: str) -> Optional[Callable[[int], None]]:
+        """
+        Hook för transform_movies(memory_hook=...) i steget `name`: hur mycket
+        transformen höjde tracemalloc-toppen (bytes) skrivs i <steg>.memory.txt.
+        None utan --profile-memory, så att transformen inte mäter alls.
+        """
+        if not self.memory:
+            return None
+
+        def record(peak: int) -> None:
+            self._hook_peaks[name] = max(peak, self._hook_peaks.get(name, 0))
+
+        return record
+
+    def _write_stage(self, name: str, profile: cProfile.Profile) -> None:
+        profile.dump_stats(self.out_dir / f"{name}.prof")
+
+        buf = io.StringIO()
+        pstats.Stats(profile, stream=buf).sort_stats("cumulative").print_stats(TOP_FUNCTIONS)
+        (self.out_dir / f"{name}.txt").write_text(buf.getvalue(), encoding="utf-8")
+
+        folded = "".join(
+            f"{name};{stack} {count}\n" for stack, count in self._samples[name].most_common()
+        )
+        (self.out_dir / f"{name}.folded").write_text(folded, encoding="utf-8")
+
+    def _write_memory_diff(self, name: str, before, after) -> None:
+        stats = after.compare_to(before, "lineno")
+        lines = [str(s) for s in stats[:TOP_ALLOCATIONS]]
+        current, peak = tracemalloc.get_traced_memory()
+        lines.append(f"\ncurrent={current} B, peak={peak} B")
+        if name in self._hook_peaks:
+            lines.append(f"memory_hook peak={self._hook_peaks[name]} B")
+        (self.out_dir / f"{name}.memory.txt").write_text("\n".join(lines) + "\n", encoding="utf-8")
+
+    def close(self) -> None:
+        """Stänger av tracemalloc och loggar var profilerna hamnade."""
+        if not self.enabled:
+            return
+        if self.memory and tracemalloc.is_tracing():
+            tracemalloc.stop()
+        if self._profiles:
+            logger.info(f"Profiler skrivna till {self.out_dir}")
+
+
+def add_profile_arguments(parser) -> None:
+    """Lägger till --profile-flaggorna på en argparse-parser."""
+    parser.add_argument("--profile", action="store_true",
+                        help="skriv cProfile, samplade stackar (folded) per steg till data/profiles/<run-id>/")
+    parser.add_argument("--profile-memory", action="store_true",
+                        help="med --profile: även tracemalloc-diff per steg (långsammare)")
+    parser.add_argument("--profile-interval", type=float, default=SAMPLE_INTERVAL_MS, metavar="MS",
+                        help=f"samplingsintervall i ms (standard {SAMPLE_INTERVAL_MS:g})")
+
+
+def profiler_from_args(args) -> Profiler:
+    return Profiler(
+        enabled=args.profile,
+        memory=args.profile_memory,
+        sample_interval_ms=args.profile_interval,
+    )
+
+# --- Slut på delad kod ---
@@ -1,4 +1,8 @@
 from __future__ import annotations
+import tracemalloc
+from contextlib import contextmanager
+from typing import Callable, Iterator
+import numpy as np
 import pandas as pd
 from datetime import datetime, timezone
 from .logger import get_logger
@@ -8,40 +12,72 @@ logger = get_logger()
 class TransformError(Exception):
     pass
 
-def transform_movies(df: pd.DataFrame) -> pd.DataFrame:
+@contextmanager
+def _track_peak_memory(memory_hook: Callable[[int], None] | None) -> Iterator[None]:
+    """
+    Mäter toppminnet (bytes, via tracemalloc) och skickar det till memory_hook.
+    Utan hook görs ingen mätning alls. Körs tracemalloc redan (yttre mätning)
+    rapporteras bara hur mycket blocket höjde toppen, och den nollställs inte.
+    """
+    if memory_hook is None:
+        yield
+        return
+
+    started_here = not tracemalloc.is_tracing()
+    if started_here:
+        tracemalloc.start()
+        peak_before = 0
+    else:
+        # En yttre mätning (t.ex. --profile-memory) pågår: nollställ inte dess
+        # topp utan rapportera hur mycket blocket höjde den.
+        peak_before = tracemalloc.get_traced_memory()[1]
+    try:
+        yield
+    finally:
+        _, peak = tracemalloc.get_traced_memory()
+        if started_here:
+            tracemalloc.stop()
+    memory_hook(peak - peak_before)
+
+def transform_movies(
+    df: pd.DataFrame,
+    memory_hook: Callable[[int], None] | None = None,
+) -> pd.DataFrame:
     """
     Tar DF med imdbID, Title, Year, Type och returnerar:
     imdb_id, title, year(int eller NaN), type, fetched_at(UTC ISO8601)
     Duplicat (imdb_id) tas bort.
+    Rådata kopieras aldrig som helhet; memory_hook får toppminnet i bytes om den anges.
     """
     required = {"imdbID", "Title", "Year", "Type"}
     missing = required - set(df.columns)
     if missing:
         raise TransformError(f"Saknar kolumner: {sorted(missing)}")
 
-    out = df.copy()
-
-    out = out.rename(columns={
-        "imdbID": "imdb_id",
-        "Title": "title",
-        "Year": "year",
-        "Type": "type",
-    })
-
-    # Year kan vara "1994" eller "1994–1996". För enkelhet: plocka första nummerserien.
-    out["year"] = (
-        out["year"]
-        .astype(str)
-        .str.extract(r"(\d{4})", expand=False)
-        .astype("Int64")  # tillåter NA
-    )
+    with _track_peak_memory(memory_hook):
+        # Ingen df.copy()/rename: bygg resultatet direkt från de konverterade kolumnerna.
+        # Year kan vara "1994" eller "1994–1996". För enkelhet: plocka första nummerserien.
+        out = pd.DataFrame(
+            {
+                "imdb_id": df["imdbID"],
+                "title": df["Title"].astype(str).str.strip(),
+                "year": (
+                    df["Year"]
+                    .astype(str)
+                    .str.extract(r"(\d{4})", expand=False)
+                    .astype("Int64")  # tillåter NA
+                ),
+                "type": df["Type"].astype(str).str.strip().str.lower(),
+            },
+            copy=False,
+        )
 
-    out["title"] = out["title"].astype(str).str.strip()
-    out["type"] = out["type"].astype(str).str.strip().str.lower()
+        # unika på imdb_id – en enda radselektion istället för drop_duplicates + reset_index
+        keep = ~out["imdb_id"].duplicated(keep="first").to_numpy()
+        out = out.take(np.flatnonzero(keep))
+        out.index = pd.RangeIndex(len(out))
 
-    # unika på imdb_id
-    out = out.drop_duplicates(subset=["imdb_id"]).reset_index(drop=True)
+        out["fetched_at"] = datetime.now(timezone.utc).isoformat(timespec="seconds")
 
-    out["fetched_at"] = datetime.now(timezone.utc).isoformat(timespec="seconds")
     logger.info(f"Transformerade {len(out)} rader.")
     return out
@@ -3,7 +3,7 @@ import pytest
 from sqlalchemy import create_engine, text
 from sqlalchemy.exc import IntegrityError
 
-from src.load import ensure_schema, load_movies_refresh
+from src.load import ensure_schema, load_movies_refresh, load_movies_incremental
 
 def _base_df():
     return pd.DataFrame([
@@ -67,3 +67,25 @@ def test_load_refresh_handles_empty_dataframe():
         cols = [r[1] for r in conn.execute(text("PRAGMA table_info('movies')")).fetchall()]
     assert rows == 0
     assert {"imdb_id","title","year","type","fetched_at"}.issubset(set(cols))
+
+def test_load_incremental_merges_and_skips_unchanged():
+    engine = create_engine("sqlite:///:memory:", future=True)
+    assert load_movies_incremental(engine, _base_df())["inserted"] == 2
+
+    # tt1 oförändrad (bara ny fetched_at), tt2 ändrad titel, tt3 ny, delete_missing utan borttag
+    df2 = _base_df()
+    df2["fetched_at"] = "2025-02-01T00:00:00Z"
+    df2.loc[1, "title"] = "Bar (remaster)"
+    df2 = pd.concat([df2, pd.DataFrame([
+        {"imdb_id":"tt3","title":"Baz","year":2010,"type":"movie","fetched_at":"2025-02-01T00:00:00Z"},
+    ])], ignore_index=True)
+    stats = load_movies_incremental(engine, df2, delete_missing=True)
+    assert stats == {"inserted": 1, "updated": 1, "unchanged": 1, "deleted": 0}
+
+    # Tom df ska inte tömma tabellen
+    load_movies_incremental(engine, _base_df().iloc[0:0], delete_missing=True)
+
+    with engine.connect() as conn:
+        rows = dict(conn.execute(text("SELECT imdb_id, fetched_at FROM movies")).fetchall())
+    assert set(rows) == {"tt1", "tt2", "tt3"}
+    assert rows["tt1"] == "2025-01-01T00:00:00Z"  # oförändrad rad skrevs inte om
@@ -2,6 +2,8 @@ import importlib
 import logging
 from pathlib import Path
 
+import pytest
+
 def test_logger_singleton():
     from src.logger import get_logger
     a = get_logger()
@@ -40,3 +42,90 @@ def test_logger_creates_folder_file_and_no_dup_handlers(monkeypatch, tmp_path):
     # För att kolla att inga duplikat av "handlers" blir tillagda
     _ = logmod.get_logger()
     assert len(logger.handlers) == 2
+
+def test_logger_queue_mode_flushes_on_shutdown(monkeypatch, tmp_path):
+    # LOG_QUEUE=1: en köhandler, skrivningen sker i bakgrunden och töms vid shutdown
+    monkeypatch.setenv("LOG_DIR", str(tmp_path / "logs"))
+    monkeypatch.setenv("LOG_FILE", "queued.log")
+    monkeypatch.setenv("LOG_QUEUE", "1")
+
+    import src.logger as logmod
+    importlib.reload(logmod)
+
+    logger = logmod.get_logger()
+    assert [type(h).__name__ for h in logger.handlers] == ["BoundedQueueHandler"]
+
+    logger.info("queued hello from test")
+    logmod.shutdown_logging()
+
+    assert "queued hello from test" in Path(tmp_path, "logs", "queued.log").read_text(encoding="utf-8")
+
+    # Full kö: INFO kastas istället för att blockera den som loggar
+    import queue
+    full = logmod.BoundedQueueHandler(queue.Queue(maxsize=1), block_sec=0.01)
+    for _ in range(3):
+        full.handle(logging.makeLogRecord({"msg": "x", "levelno": logging.INFO}))
+    assert full.dropped == 2
+
+def test_logger_is_configured_once_until_settings_change(monkeypatch, tmp_path):
+    # Handlers ska återanvändas mellan anrop och bara byggas om när inställningarna ändras
+    monkeypatch.setenv("LOG_DIR", str(tmp_path / "logs"))
+    monkeypatch.delenv("LOG_QUEUE", raising=False)
+
+    import src.logger as logmod
+    importlib.reload(logmod)
+
+    first = list(logmod.get_logger().handlers)
+    for _ in range(5):
+        logmod.get_logger()
+    assert logmod.get_logger().handlers == first
+
+    # Explicit reconfigure() -> nya handlers
+    logmod.reconfigure()
+    second = list(logmod.get_logger().handlers)
+    assert second != first and len(second) == 2
+
+    # Ändrad inställning -> get_logger() bygger om av sig själv
+    monkeypatch.setenv("LOG_QUEUE", "1")
+    assert [type(h).__name__ for h in logmod.get_logger().handlers] == ["BoundedQueueHandler"]
+    monkeypatch.delenv("LOG_QUEUE")
+    assert len(logmod.get_logger().handlers) == 2
+
+def test_logger_json_format_and_sampling(monkeypatch, tmp_path):
+    # LOG_FORMAT=json ger en JSON-rad per post med extra-fälten; LOG_SAMPLE samplar per event
+    import json
+    monkeypatch.setenv("LOG_DIR", str(tmp_path / "logs"))
+    monkeypatch.setenv("LOG_FILE", "json.log")
+    monkeypatch.setenv("LOG_FORMAT", "json")
+    monkeypatch.setenv("LOG_SAMPLE", "omdb.page=3")
+    monkeypatch.delenv("LOG_QUEUE", raising=False)
+
+    import src.logger as logmod
+    importlib.reload(logmod)
+    logger = logmod.get_logger()
+
+    for page in range(1, 8):
+        logger.info("Hämtade %d rader (page=%s).", 10, page, extra={"event": "omdb.page", "query": "dark", "page": page})
+    logger.warning("OMDb fel: %s", "x", extra={"event": "omdb.page", "page": 99})
+    logmod.shutdown_logging()
+
+    lines = [json.loads(l) for l in Path(tmp_path, "logs", "json.log").read_text(encoding="utf-8").splitlines()]
+    assert [l["page"] for l in lines] == [1, 4, 7, 99]  # var 3:e INFO, WARNING alltid
+    assert lines[0]["msg"] == "Hämtade 10 rader (page=1)."
+    assert lines[0]["query"] == "dark" and lines[-1]["level"] == "WARNING"
+
+
+def _shared_logger_block(path: Path) -> str:
+    text = path.read_text(encoding="utf-8")
+    start = text.index("# --- Delad kod:")
+    return text[start:text.index("# --- Slut på delad kod ---", start)]
+
+
+def test_shared_logger_code_matches_other_project():
+    # Kö-, JSON- och samplingkoden är kopierad mellan projekten och ska hållas identisk
+    import src.logger as logmod
+
+    other = Path(logmod.__file__).resolve().parents[2] / "kunskapskontroll_2" / "src" / "logger.py"
+    if not other.exists():
+        pytest.skip("kunskapskontroll_2 finns inte bredvid det här projektet")
+    assert _shared_logger_block(Path(logmod.__file__)) == _shared_logger_block(other)
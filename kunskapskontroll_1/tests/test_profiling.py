@@ -0,0 +1,63 @@
+from pathlib import Path
+
+import pytest
+
+from src.profiling import Profiler
+
+
+def test_profiler_writes_stage_files(tmp_path):
+    # Varje profilerat steg ska ge .prof, topplista och folded-stackar
+    profiler = Profiler(enabled=True, out_dir=tmp_path, sample_interval_ms=1)
+    with profiler.stage("extract"):
+        sorted(range(200_000), key=lambda x: -x)
+    profiler.close()
+
+    for suffix in (".prof", ".txt", ".folded"):
+        assert (tmp_path / f"extract{suffix}").exists()
+    assert not (tmp_path / "extract.memory.txt").exists()
+
+
+def test_main_passes_profiler_memory_hook_to_transform(monkeypatch, tmp_path):
+    # --profile --profile-memory: transformens topp ska hamna i transform.memory.txt
+    import pandas as pd
+    from sqlalchemy import create_engine
+    import main as mainmod
+    import src.profiling as profmod
+    from src.transform import transform_movies
+
+    monkeypatch.setattr(profmod, "PROFILES_DIR", tmp_path)
+    monkeypatch.setattr(mainmod, "fetch_movies", lambda **kw: pd.DataFrame(
+        [{"imdbID": "tt1", "Title": "Foo", "Year": "2000", "Type": "movie"}]
+    ))
+    hooks = []
+
+    def spy_transform(df, memory_hook=None):
+        hooks.append(memory_hook)
+        return transform_movies(df, memory_hook=memory_hook)
+
+    monkeypatch.setattr(mainmod, "transform_movies", spy_transform)
+    monkeypatch.setattr(mainmod, "get_engine", lambda: create_engine(f"sqlite:///{tmp_path / 'etl.db'}"))
+    monkeypatch.setattr(mainmod, "load_movies_refresh", lambda *a, **kw: None)
+
+    assert mainmod.main(["--profile", "--profile-memory"]) == 0
+    assert hooks and hooks[0] is not None
+    memory_txt = next(tmp_path.glob("*/transform.memory.txt")).read_text(encoding="utf-8")
+    assert "memory_hook peak=" in memory_txt
+
+    assert Profiler(enabled=True, out_dir=tmp_path).memory_hook("transform") is None
+
+
+def _shared_profiling_block(path: Path) -> str:
+    text = path.read_text(encoding="utf-8")
+    start = text.index("# --- Delad kod:")
+    return text[start:text.index("# --- Slut på delad kod ---", start)]
+
+
+def test_shared_profiling_code_matches_other_project():
+    # Profileraren är kopierad mellan projekten och ska hållas identisk
+    import src.profiling as profmod
+
+    other = Path(profmod.__file__).resolve().parents[2] / "kunskapskontroll_2" / "src" / "profiling.py"
+    if not other.exists():
+        pytest.skip("kunskapskontroll_2 finns inte bredvid det här projektet")
+    assert _shared_profiling_block(Path(profmod.__file__)) == _shared_profiling_block(other)
@@ -53,3 +53,36 @@ def test_transform_movies_empty_input():
     assert len(out) == 0
     # dtype ska fortfarande vara "nullable Int64" även när tom
     assert str(out["year"].dtype) == "Int64"
+
+def test_transform_movies_reports_peak_memory_and_keeps_input():
+    # memory_hook ska få toppminnet (bytes) och rådata ska inte ändras
+    raw = pd.DataFrame([
+        {"imdbID":"tt1","Title":"  Foo ","Year":"2000","Type":"Movie"},
+        {"imdbID":"tt1","Title":"Foo dup","Year":"2001","Type":"Movie"},
+    ])
+    before = raw.copy()
+    peaks = []
+
+    out = transform_movies(raw, memory_hook=peaks.append)
+
+    assert len(out) == 1
+    assert len(peaks) == 1 and peaks[0] > 0
+    pd.testing.assert_frame_equal(raw, before)
+
+def test_transform_movies_memory_hook_keeps_outer_tracemalloc_peak():
+    # Under en yttre mätning (--profile-memory) får transformen inte nollställa toppen
+    import tracemalloc
+    raw = pd.DataFrame([{"imdbID":"tt1","Title":"Foo","Year":"2000","Type":"Movie"}])
+    tracemalloc.start()
+    try:
+        big = bytearray(20_000_000)
+        del big
+        outer_peak = tracemalloc.get_traced_memory()[1]
+        peaks = []
+
+        transform_movies(raw, memory_hook=peaks.append)
+
+        assert tracemalloc.get_traced_memory()[1] >= outer_peak
+        assert len(peaks) == 1 and 0 <= peaks[0] < outer_peak
+    finally:
+        tracemalloc.stop()
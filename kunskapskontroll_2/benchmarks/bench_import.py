@@ -0,0 +1,106 @@
+"""
+Benchmark: kallstart (import av main.py och `main.py --help`).
+
+Kör från projektroten:
+    python -m benchmarks.bench_import
+    python -m benchmarks.bench_import --repeat 10 --max-ms 150 --json data/bench/import.json
+
+Importtiden tas från `python -X importtime` (kumulativ tid för main och de
+tyngsta modulerna). Varje mätning körs i en ny process. Exit-kod 1 om
+import av main tar mer än --max-ms eller om något tungt beroende (pandas,
+SQLAlchemy, requests, numpy, pyarrow) laddas redan vid import.
+"""
+
+from __future__ import annotations
+import argparse
+import json
+import statistics
+import subprocess
+import sys
+import time
+from pathlib import Path
+
+PROJECT_ROOT = Path(__file__).resolve().parents[1]
+DEFAULT_MAX_MS = 150.0
+TOP_MODULES = 10
+
+# Moduler som bara ska laddas när de används (src/lazy.py)
+HEAVY_MODULES = ("pandas.core.frame", "numpy.linalg", "sqlalchemy.engine", "requests.sessions", "pyarrow.lib")
+
+
+def _importtime() -> list[tuple[str, int, int]]:
+    """(modul, egen tid µs, kumulativ tid µs) för `import main` i en ny process."""
+    proc = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", "import main"],
+        cwd=PROJECT_ROOT, capture_output=True, text=True, check=True,
+    )
+    rows = []
+    for line in proc.stderr.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        self_us, cumulative_us, name = line[len("import time:"):].split("|")
+        rows.append((name.strip(), int(self_us), int(cumulative_us)))
+    return rows
+
+
+def _loaded_heavy_modules() -> list[str]:
+    code = f"import sys, main; print(','.join(m for m in {HEAVY_MODULES!r} if m in sys.modules))"
+    proc = subprocess.run([sys.executable, "-c", code], cwd=PROJECT_ROOT, capture_output=True, text=True, check=True)
+    return [m for m in proc.stdout.strip().split(",") if m]
+
+
+def _help_ms() -> float:
+    start = time.perf_counter()
+    subprocess.run([sys.executable, "main.py", "--help"], cwd=PROJECT_ROOT, capture_output=True, check=True)
+    return (time.perf_counter() - start) * 1000
+
+
+def run(repeat: int) -> dict:
+    import_ms, help_ms, top = [], [], {}
+    for _ in range(repeat):
+        rows = _importtime()
+        import_ms.append(next(cum for name, _, cum in rows if name == "main") / 1000)
+        for name, _, cum in rows:
+            if name.startswith(("main", "src")):
+                top[name] = min(top.get(name, cum), cum)
+        help_ms.append(_help_ms())
+
+    return {
+        "import_main_ms": round(statistics.median(import_ms), 1),
+        "help_ms": round(statistics.median(help_ms), 1),
+        "slowest_modules_ms": {
+            name: round(us / 1000, 1) for name, us in sorted(top.items(), key=lambda kv: -kv[1])[:TOP_MODULES]
+        },
+        "heavy_modules_loaded": _loaded_heavy_modules(),
+    }
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Benchmark för kallstart (import av main.py)")
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--max-ms", type=float, default=DEFAULT_MAX_MS, help="budget för import av main")
+    parser.add_argument("--json", type=Path, help="spara resultatet som JSON")
+    args = parser.parse_args()
+
+    result = run(args.repeat)
+    print(f"import main:   {result['import_main_ms']:>7.1f} ms (median av {args.repeat})")
+    print(f"main.py --help {result['help_ms']:>7.1f} ms (hela processen)")
+    for name, ms in result["slowest_modules_ms"].items():
+        print(f"  {name:<22} {ms:>7.1f} ms")
+
+    if args.json:
+        args.json.parent.mkdir(parents=True, exist_ok=True)
+        args.json.write_text(json.dumps(result, indent=2), encoding="utf-8")
+
+    failed = False
+    if result["heavy_modules_loaded"]:
+        print(f"Tunga beroenden laddas vid import: {', '.join(result['heavy_modules_loaded'])}")
+        failed = True
+    if result["import_main_ms"] > args.max_ms:
+        print(f"Import av main tar mer än budgeten {args.max_ms:g} ms")
+        failed = True
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
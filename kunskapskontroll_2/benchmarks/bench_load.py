@@ -0,0 +1,78 @@
+"""
+Benchmark: bulk_load_movies() mot nuvarande df.to_sql()-väg.
+
+Kör från projektroten:
+    python -m benchmarks.bench_load
+    python -m benchmarks.bench_load --sizes 10000 100000 --json data/bench_load.json
+
+Varje mätning sker mot en ny SQLite-fil i en temporär katalog och
+rapporterar rader/sekund för båda vägarna.
+"""
+
+from __future__ import annotations
+import argparse
+import json
+import tempfile
+import time
+from pathlib import Path
+
+import pandas as pd
+from sqlalchemy import create_engine
+
+from src.load import ensure_schema, bulk_load_movies
+from benchmarks.synthetic import synthetic_movies
+
+DEFAULT_SIZES = [10_000, 100_000, 1_000_000]
+
+
+def _time_load(method: str, df: pd.DataFrame, workdir: Path) -> float:
+    db_path = workdir / f"{method}_{len(df)}.db"
+    engine = create_engine(f"sqlite:///{db_path}", future=True)
+    ensure_schema(engine)
+
+    start = time.perf_counter()
+    if method == "to_sql":
+        df.to_sql("movies", con=engine, if_exists="append", index=False)
+    else:
+        bulk_load_movies(engine, df)
+    elapsed = time.perf_counter() - start
+
+    engine.dispose()
+    return elapsed
+
+
+def run(sizes: list[int]) -> list[dict]:
+    results = []
+    with tempfile.TemporaryDirectory() as tmp:
+        workdir = Path(tmp)
+        for n in sizes:
+            df = synthetic_movies(n)
+            row = {"rows": n}
+            for method in ("to_sql", "bulk"):
+                elapsed = _time_load(method, df, workdir)
+                row[f"{method}_sec"] = round(elapsed, 3)
+                row[f"{method}_rows_per_sec"] = round(n / elapsed)
+            row["speedup"] = round(row["to_sql_sec"] / row["bulk_sec"], 2)
+            results.append(row)
+            print(
+                f"{n:>9,} rader | to_sql {row['to_sql_rows_per_sec']:>10,} rader/s | "
+                f"bulk {row['bulk_rows_per_sec']:>10,} rader/s | x{row['speedup']}"
+            )
+    return results
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Benchmark för SQLite-laddning")
+    parser.add_argument("--sizes", type=int, nargs="+", default=DEFAULT_SIZES)
+    parser.add_argument("--json", type=Path, help="spara resultatet som JSON")
+    args = parser.parse_args()
+
+    results = run(args.sizes)
+    if args.json:
+        args.json.parent.mkdir(parents=True, exist_ok=True)
+        args.json.write_text(json.dumps(results, indent=2), encoding="utf-8")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,154 @@
+"""
+Benchmark: genomströmning och toppminne för pipelinens kärnfunktioner
+(transform_movies, load_movies_refresh, read_movies_df och sammanställningarna)
+på syntetisk OMDb-formad rådata.
+
+Kör från projektroten:
+    python -m benchmarks.bench_pipeline
+    python -m benchmarks.bench_pipeline --sizes 10000 100000 --save data/bench/baseline.json
+    python -m benchmarks.bench_pipeline --sizes 10000 100000 --compare data/bench/baseline.json
+
+Tiden är bästa av --repeat körningar utan tracemalloc; toppminnet mäts i en
+separat körning med tracemalloc (som annars skulle blåsa upp tiden).
+--compare jämför mot en sparad baslinje och avslutar med exit-kod 1 om något
+blivit mer än --threshold långsammare eller minneskrävande.
+"""
+
+from __future__ import annotations
+import argparse
+import json
+import platform
+import subprocess
+import tempfile
+import time
+import tracemalloc
+from datetime import datetime
+from pathlib import Path
+from typing import Callable
+
+import pandas as pd
+from sqlalchemy import create_engine
+
+from src.transform import transform_movies
+from src.load import load_movies_refresh
+from src.analyze import read_movies_df, genre_rating_summary, year_count_summary
+from benchmarks.synthetic import synthetic_omdb_raw
+
+DEFAULT_SIZES = [10_000, 100_000, 1_000_000]
+REGRESSION_THRESHOLD = 0.2
+
+
+def _measure(fn: Callable[[], object], repeat: int, memory: bool) -> dict:
+    """Bästa tid av repeat körningar, plus toppminne (MiB) från en extra körning."""
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - start)
+
+    out = {"sec": round(best, 4)}
+    if memory:
+        tracemalloc.start()
+        try:
+            fn()
+            _, peak = tracemalloc.get_traced_memory()
+        finally:
+            tracemalloc.stop()
+        out["peak_mib"] = round(peak / 2**20, 2)
+    return out
+
+
+def run(sizes: list[int], repeat: int = 3, memory: bool = True) -> list[dict]:
+    results = []
+    with tempfile.TemporaryDirectory() as tmp:
+        for n in sizes:
+            raw = synthetic_omdb_raw(n)
+            transformed = transform_movies(raw)
+            engine = create_engine(f"sqlite:///{Path(tmp) / f'pipeline_{n}.db'}", future=True)
+            load_movies_refresh(engine, transformed)
+            df = read_movies_df(engine=engine)
+
+            cases = {
+                "transform_movies": lambda: transform_movies(raw),
+                "load_movies_refresh": lambda: load_movies_refresh(engine, transformed),
+                "read_movies_df": lambda: read_movies_df(engine=engine),
+                "genre_rating_summary": lambda: genre_rating_summary(df),
+                "year_count_summary": lambda: year_count_summary(df),
+            }
+            for name, fn in cases.items():
+                row = {"benchmark": name, "rows": n, **_measure(fn, repeat, memory)}
+                row["rows_per_sec"] = round(n / row["sec"]) if row["sec"] else None
+                results.append(row)
+                mem = f" | topp {row['peak_mib']:>8.1f} MiB" if "peak_mib" in row else ""
+                print(f"{name:<21} {n:>9,} rader | {row['sec']:>8.3f} s | {row['rows_per_sec']:>11,} rader/s{mem}")
+
+            engine.dispose()
+    return results
+
+
+def _git_commit() -> str | None:
+    try:
+        out = subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True)
+        return out.stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def baseline_document(results: list[dict]) -> dict:
+    """Resultatet med metadata (commit, versioner) så att baslinjer kan jämföras."""
+    return {
+        "created_at": datetime.now().isoformat(timespec="seconds"),
+        "commit": _git_commit(),
+        "python": platform.python_version(),
+        "pandas": pd.__version__,
+        "machine": platform.machine(),
+        "results": results,
+    }
+
+
+def compare(results: list[dict], baseline: dict, threshold: float = REGRESSION_THRESHOLD) -> list[dict]:
+    """Kvot nu/baslinje för tid och minne per (benchmark, rader); regression om > 1 + threshold."""
+    base = {(r["benchmark"], r["rows"]): r for r in baseline["results"]}
+    rows = []
+    for r in results:
+        b = base.get((r["benchmark"], r["rows"]))
+        if b is None:
+            continue
+        row = {"benchmark": r["benchmark"], "rows": r["rows"], "time_ratio": round(r["sec"] / b["sec"], 2)}
+        if "peak_mib" in r and b.get("peak_mib"):
+            row["memory_ratio"] = round(r["peak_mib"] / b["peak_mib"], 2)
+        row["regression"] = any(row.get(k, 0) > 1 + threshold for k in ("time_ratio", "memory_ratio"))
+        rows.append(row)
+    return rows
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Benchmark för transform/load/läsning/sammanställningar")
+    parser.add_argument("--sizes", type=int, nargs="+", default=DEFAULT_SIZES)
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--no-memory", action="store_true", help="hoppa över tracemalloc-mätningen")
+    parser.add_argument("--save", type=Path, help="spara resultatet som JSON-baslinje")
+    parser.add_argument("--compare", type=Path, help="jämför mot en sparad JSON-baslinje")
+    parser.add_argument("--threshold", type=float, default=REGRESSION_THRESHOLD)
+    args = parser.parse_args()
+
+    results = run(args.sizes, args.repeat, memory=not args.no_memory)
+    if args.save:
+        args.save.parent.mkdir(parents=True, exist_ok=True)
+        args.save.write_text(json.dumps(baseline_document(results), indent=2), encoding="utf-8")
+
+    if args.compare:
+        baseline = json.loads(args.compare.read_text(encoding="utf-8"))
+        diff = compare(results, baseline, args.threshold)
+        print(f"\nJämfört med {args.compare} (commit {baseline.get('commit')}):")
+        for row in diff:
+            flag = "  <-- REGRESSION" if row["regression"] else ""
+            mem = f" | minne x{row['memory_ratio']}" if "memory_ratio" in row else ""
+            print(f"{row['benchmark']:<21} {row['rows']:>9,} rader | tid x{row['time_ratio']}{mem}{flag}")
+        if any(row["regression"] for row in diff):
+            return 1
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,107 @@
+"""
+Benchmark: analys- och Power BI-frågor mot 'movies' utan respektive med
+sekundära index (MOVIES_INDEXES) och planner-statistik (ANALYZE).
+
+Kör från projektroten:
+    python -m benchmarks.bench_queries
+    python -m benchmarks.bench_queries --rows 200000 --repeat 3
+"""
+
+from __future__ import annotations
+import argparse
+import json
+import tempfile
+import time
+from pathlib import Path
+
+from sqlalchemy import create_engine, text
+
+from src.load import MOVIES_INDEXES, ensure_schema, bulk_load_movies, optimize_database
+from benchmarks.synthetic import synthetic_movies
+
+QUERIES = {
+    "genre_summary": (
+        "SELECT genre_primary, AVG(imdb_rating), COUNT(imdb_id) "
+        "FROM movies GROUP BY genre_primary"
+    ),
+    "year_summary": "SELECT year, COUNT(*) FROM movies GROUP BY year",
+    "type_year_filter": (
+        "SELECT imdb_id, title, imdb_rating FROM movies "
+        "WHERE type = 'series' AND year = 2021"
+    ),
+    "genre_rating_filter": (
+        "SELECT COUNT(*), AVG(imdb_rating) FROM movies "
+        "WHERE genre_primary = 'Action' AND imdb_rating >= 8.0"
+    ),
+    "top_rated": (
+        "SELECT title, imdb_rating FROM movies "
+        "ORDER BY imdb_rating DESC LIMIT 100"
+    ),
+}
+
+
+def _time_queries(engine, repeat: int) -> dict[str, float]:
+    timings = {}
+    with engine.connect() as conn:
+        for name, sql in QUERIES.items():
+            best = float("inf")
+            for _ in range(repeat):
+                start = time.perf_counter()
+                conn.execute(text(sql)).fetchall()
+                best = min(best, time.perf_counter() - start)
+            timings[name] = best
+    return timings
+
+
+def run(rows: int, repeat: int) -> list[dict]:
+    with tempfile.TemporaryDirectory() as tmp:
+        engine = create_engine(f"sqlite:///{Path(tmp) / 'queries.db'}", future=True)
+        ensure_schema(engine)
+        bulk_load_movies(engine, synthetic_movies(rows))
+
+        # 1) Utan sekundära index och utan statistik
+        with engine.begin() as conn:
+            for name in MOVIES_INDEXES:
+                conn.execute(text(f"DROP INDEX IF EXISTS {name}"))
+            conn.execute(text("DROP TABLE IF EXISTS sqlite_stat1"))
+        before = _time_queries(engine, repeat)
+
+        # 2) Med index + ANALYZE/PRAGMA optimize (som efter en vanlig laddning)
+        ensure_schema(engine)
+        optimize_database(engine)
+        after = _time_queries(engine, repeat)
+
+        engine.dispose()
+
+    results = []
+    for name in QUERIES:
+        row = {
+            "query": name,
+            "scan_ms": round(before[name] * 1000, 2),
+            "indexed_ms": round(after[name] * 1000, 2),
+            "speedup": round(before[name] / after[name], 1),
+        }
+        results.append(row)
+        print(
+            f"{name:<18} | utan index {row['scan_ms']:>9.2f} ms | "
+            f"med index {row['indexed_ms']:>9.2f} ms | x{row['speedup']}"
+        )
+    return results
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Benchmark för index på movies")
+    parser.add_argument("--rows", type=int, default=1_000_000)
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--json", type=Path, help="spara resultatet som JSON")
+    args = parser.parse_args()
+
+    results = run(args.rows, args.repeat)
+    if args.json:
+        args.json.parent.mkdir(parents=True, exist_ok=True)
+        args.json.write_text(json.dumps(results, indent=2), encoding="utf-8")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,75 @@
+"""
+Syntetiska dataset för benchmarks (ingen nätverkstrafik, deterministiska via seed).
+"""
+
+from __future__ import annotations
+import numpy as np
+import pandas as pd
+
+
+def synthetic_movies(n: int, seed: int = 42) -> pd.DataFrame:
+    """Syntetisk data med samma schema som transform_movies() returnerar."""
+    rng = np.random.default_rng(seed)
+    genres = np.array(["Action", "Drama", "Comedy", "Thriller", "Horror", "Sci-Fi"])
+    primary = genres[rng.integers(0, len(genres), n)]
+    return pd.DataFrame({
+        "imdb_id": [f"tt{i:08d}" for i in range(n)],
+        "title": [f"Movie {i}" for i in range(n)],
+        "year": rng.integers(1990, 2026, n).astype(float),
+        "type": np.where(rng.random(n) < 0.8, "movie", "series"),
+        "genre": [f"{g}, Drama" for g in primary],
+        "genre_primary": primary,
+        "director": [f"Director {i % 5000}" for i in range(n)],
+        "country": np.array(["USA", "UK", "France", "Sweden"])[rng.integers(0, 4, n)],
+        "runtime_min": rng.integers(60, 200, n).astype(float),
+        "imdb_rating": np.round(rng.uniform(1, 10, n), 1),
+        "imdb_votes": rng.integers(10, 2_000_000, n).astype(float),
+        "fetched_at": "2025-01-01T00:00:00",
+    })
+
+
+def synthetic_omdb_raw(n: int, seed: int = 42) -> pd.DataFrame:
+    """
+    Syntetisk rådata i samma form som extract-steget ger (OMDb-fält som text),
+    inklusive det som gör transform_movies() dyr: årsintervall ("2019–2021",
+    "2020–"), "N/A"-värden, röster med tusentalskomma ("12,345"),
+    flera genrer/länder per rad och ~2 % dubbletter av titlar.
+    """
+    rng = np.random.default_rng(seed)
+    genres = np.array(["Action", "Drama", "Comedy", "Thriller", "Horror", "Sci-Fi", "Romance", "Crime"])
+    countries = np.array(["USA", "UK", "France", "Sweden", "Germany", "Japan"])
+
+    def na(values: list[str], share: float) -> np.ndarray:
+        out = np.array(values, dtype=object)
+        out[rng.random(n) < share] = "N/A"
+        return out
+
+    start = rng.integers(1990, 2026, n)
+    kind = rng.random(n)
+    year = np.where(
+        kind < 0.85, start.astype(str),
+        np.where(kind < 0.93, [f"{y}–{y + 2}" for y in start], [f"{y}–" for y in start]),
+    )
+
+    title_ids = np.arange(n)
+    dup = rng.random(n) < 0.02
+    title_ids[dup] = rng.integers(0, n, int(dup.sum()))
+
+    # Olika genrer/länder per rad: de första k i en slumpad ordning
+    g = genres[np.argsort(rng.random((n, len(genres))), axis=1)[:, :3]]
+    n_genres = rng.integers(1, 4, n)
+    c = countries[np.argsort(rng.random((n, len(countries))), axis=1)[:, :2]]
+    n_countries = rng.integers(1, 3, n)
+
+    return pd.DataFrame({
+        "imdbID": [f"tt{i:08d}" for i in range(n)],
+        "Title": [f"Movie {i}" for i in title_ids],
+        "Year": na(year.tolist(), 0.03),
+        "Type": rng.choice(["movie", "series", "episode"], n, p=[0.75, 0.2, 0.05]),
+        "Genre": na([", ".join(row[:k]) for row, k in zip(g, n_genres)], 0.02),
+        "Director": na([f"Director {i % 5000}" for i in range(n)], 0.05),
+        "Country": na([", ".join(row[:k]) for row, k in zip(c, n_countries)], 0.02),
+        "Runtime": na([f"{m} min" for m in rng.integers(60, 200, n)], 0.05),
+        "imdbRating": na([f"{r:.1f}" for r in rng.uniform(1, 10, n)], 0.05),
+        "imdbVotes": na([f"{v:,}" for v in rng.integers(5, 2_000_000, n)], 0.05),
+    })
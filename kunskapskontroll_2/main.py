@@ -1,27 +1,54 @@
 from __future__ import annotations
 from pathlib import Path
 from dotenv import load_dotenv
+import argparse
 import os
+import sys
 
 from src.logger import get_logger, LOG_PATH
 from src.extract import (
     build_dataset_for_year_range,
+    enable_warm_state,
     ExtractError,
 )
 from src.transform import transform_movies, TransformError
-from src.load import get_engine, load_movies_refresh
-from src.analyze import export_analysis
+from src.transform_cache import transform_movies_cached
+from src.load import get_engine, load_movies_refresh, load_movies_incremental, build_star_schema
+from src.analyze import export_analysis, refresh_movie_sketches
+from src.cube import CUBE_VIEWS
+from src.metrics import reset_metrics, write_run_report
+from src.run_history import RunMemory, record_run
+from src.profiling import add_profile_arguments, profiler_from_args
+from src.service import HEALTH_PORT, SERVICE_INTERVAL_SEC, CronSchedule, IntervalSchedule, ScheduleError, Service
 
 
 # Projektrot = där main.py ligger
 PROJECT_ROOT = Path(__file__).resolve().parent
 ENV_FILE = PROJECT_ROOT / ".env"
 
-# Ladda .env (för OMDB_API_KEY)
-loaded = load_dotenv(dotenv_path=ENV_FILE, override=False)
 
-
-def main() -> int:
+def parse_args(argv: list[str] | None = None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="OMDb ETL + analys")
+    add_profile_arguments(parser)
+    service = parser.add_argument_group("tjänsteläge")
+    service.add_argument("--serve", action="store_true",
+                         help="kör som långlivad tjänst med varma cacher (se src/service.py)")
+    when = service.add_mutually_exclusive_group()
+    when.add_argument("--interval", type=float, default=SERVICE_INTERVAL_SEC, metavar="SEK",
+                      help=f"kör var SEK sekund (standard {SERVICE_INTERVAL_SEC:g})")
+    when.add_argument("--cron", metavar="UTTRYCK", help='cron-schema, t.ex. "0 */6 * * *"')
+    service.add_argument("--health-port", type=int, default=HEALTH_PORT,
+                         help=f"port för /health, /metrics och /trigger på 127.0.0.1 (standard {HEALTH_PORT})")
+    return parser.parse_args([] if argv is None else argv)
+
+
+def main(argv: list[str] | None = None) -> int:
+    # Argumenten tolkas först: --help ska inte betala för .env, loggfil eller pandas
+    args = parse_args(argv)
+
+    # Konfigurationen läses en gång här vid start (.env -> miljövariabler);
+    # modulerna läser sina inställningar därifrån först när de används.
+    loaded = load_dotenv(dotenv_path=ENV_FILE, override=False)
     logger = get_logger()
 
     logger.info(f".env loaded from {ENV_FILE} -> {loaded}")
@@ -31,6 +58,31 @@ def main() -> int:
         logger.error("OMDB_API_KEY saknas i .env. Avbryter.")
         return 1
 
+    if args.serve:
+        return serve(args)
+    return run_pipeline(args)
+
+
+def serve(args: argparse.Namespace) -> int:
+    """
+    Tjänsteläge: samma pipeline enligt schema i en process som ligger kvar.
+    Engine (cachas per URL i load.py), HTTP-session och OMDb-svarscache
+    hålls varma mellan körningarna.
+    """
+    try:
+        schedule = CronSchedule(args.cron) if args.cron else IntervalSchedule(args.interval)
+    except ScheduleError as e:
+        get_logger().error(f"Ogiltigt schema: {e}")
+        return 1
+    enable_warm_state()
+    service = Service(lambda: run_pipeline(args), schedule, health_port=args.health_port)
+    return service.run_forever()
+
+
+def run_pipeline(args: argparse.Namespace) -> int:
+    """En körning av hela pipelinen (extract -> transform -> load -> analys)."""
+    logger = get_logger()
+
     # 1. Sökstrategi: breda queries
     queries = [
         "life", "world", "love", "dream", "dark", "light",
@@ -42,42 +94,88 @@ def main() -> int:
     # Vi vill ha ~5 års historik från nu (2025 -> 2020)
     year_min_extract = 2020
 
+    # Nytt mätregister per körning; rapporten skrivs i finally (även vid fel)
+    metrics = reset_metrics()
+    status = "error"
+
+    # Toppminne för just den här körningen (inte processens livstid, se --serve)
+    run_memory = RunMemory()
+    run_memory.start()
+
+    # --profile: cProfile, samplade stackar (och ev. tracemalloc) per steg i data/profiles/<run-id>/
+    profiler = profiler_from_args(args)
+
     try:
         # 2. Bygg rådatasetet från OMDb
-        raw = build_dataset_for_year_range(
-            queries=queries,
-            year_min=year_min_extract,
-            max_pages_per_query=5,
-            sleep_sec=0.2,
-        )
+        with metrics.stage("extract"), profiler.stage("extract"):
+            raw = build_dataset_for_year_range(
+                queries=queries,
+                year_min=year_min_extract,
+                max_pages_per_query=5,
+                sleep_sec=0.2,
+            )
 
         logger.info(
             f"Rådatamängd efter sampling/filter >= {year_min_extract}: {len(raw)} rader"
         )
 
         # 3. Transformera data → ren, filtrerad, analysklar
+        # TRANSFORM_CACHE=1 i .env återanvänder resultatet om rådata + parametrar är oförändrade
+        use_cache = os.getenv("TRANSFORM_CACHE", "0") == "1"
+        transform = transform_movies_cached if use_cache else transform_movies
+
         # Här styr du vilka titlar du vill behålla
-        transformed = transform_movies(
-            raw,
-            allowed_types=["movie"],          # ["movie"], ["series"], ["movie","series"], eller None
-            allowed_genres=["Action"],        # ["Action"], ["Action","Thriller"], eller None
-            dedupe_on="title",                # "title" ger en rad per titel
-            year_min=2020,                    # vi håller konsekvent 10-årsgränsen här också
-        )
+        with metrics.stage("transform"), profiler.stage("transform"):
+            transformed = transform(
+                raw,
+                allowed_types=["movie"],          # ["movie"], ["series"], ["movie","series"], eller None
+                allowed_genres=["Action"],        # ["Action"], ["Action","Thriller"], eller None
+                dedupe_on="title",                # "title" ger en rad per titel
+                year_min=2020,                    # vi håller konsekvent 10-årsgränsen här också
+                memory_hook=profiler.memory_hook("transform"),  # --profile-memory: topp i transform.memory.txt
+            )
 
         logger.info(f"Transformerad datamängd: {len(transformed)} rader")
 
-        # 4. Ladda till SQLite (full refresh)
+        # 4. Ladda till SQLite
+        # LOAD_MODE=refresh (default) skriver om hela tabellen,
+        # LOAD_MODE=incremental slår ihop på imdb_id och skriver bara ändrade rader.
         engine = get_engine()
         logger.info(f"SQLite path: {engine.url.database}")
         logger.info(f"Log file path: {LOG_PATH}")
 
-        load_movies_refresh(engine, transformed)
+        with metrics.stage("load"), profiler.stage("load"):
+            if os.getenv("LOAD_MODE", "refresh") == "incremental":
+                load_movies_incremental(
+                    engine,
+                    transformed,
+                    delete_missing=os.getenv("LOAD_DELETE_MISSING", "0") == "1",
+                )
+            else:
+                load_movies_refresh(engine, transformed)
+
+            # STAR_SCHEMA=1: dimensions-/bryggtabeller med heltalsnycklar för Power BI
+            # (byggs första gången; sedan håller laddningen dem uppdaterade)
+            if os.getenv("STAR_SCHEMA", "0") == "1":
+                build_star_schema(engine)
+
+        with metrics.stage("analyze"), profiler.stage("analyze"):
+            # ANALYSIS_SKETCHES=1: bygg om percentil-/unika-värden-sketcharna (strömmande)
+            if os.getenv("ANALYSIS_SKETCHES", "0") == "1":
+                refresh_movie_sketches(engine)
+
+            # 5. Exportera analyser (Power BI-ingång), inkl. kub-vyerna
+            # (genre × år, typ × år, land × genre) som roll-ups av samma kub
+            export_analysis(views=CUBE_VIEWS)
+
+            # EXPORT_PARQUET=1: även typade, komprimerade Parquet-filer (movies per år + sammanställningar)
+            if os.getenv("EXPORT_PARQUET", "0") == "1":
+                from src.export_parquet import export_parquet  # pyarrow laddas bara när det behövs
 
-        # 5. Exportera analyser (Power BI-ingång)
-        export_analysis()
+                export_parquet(engine)
 
         logger.info("✅ ETL + ANALYS klart utan fel.")
+        status = "ok"
         return 0
 
     except (ExtractError, TransformError) as e:
@@ -86,7 +184,26 @@ def main() -> int:
     except Exception as e:
         logger.exception(f"❌ Oväntat fel: {e}")
         return 2
+    finally:
+        profiler.close()
+        peak_memory = run_memory.stop()
+        # Körningsrapport: stegtider, API-anrop, svarstider, rader per filter, skrivtakt
+        try:
+            report = write_run_report(metrics, status=status, textfile=os.getenv("METRICS_TEXTFILE"))
+            logger.info(
+                "Stegtider (s): "
+                + ", ".join(f"{name}={st['wall_sec']:.2f}" for name, st in report["stages"].items())
+            )
+        except OSError as e:
+            logger.warning(f"Kunde inte skriva körningsrapport: {e}")
+            report = metrics.report(status=status)
+
+        # Körhistorik i etl_runs, oberoende av rapportfilen (jämför med: python -m src.run_history)
+        try:
+            record_run(get_engine(), report, peak_memory=peak_memory)
+        except Exception as e:
+            logger.warning(f"Kunde inte spara körhistorik: {e}")
 
 
 if __name__ == "__main__":
-    raise SystemExit(main())
+    raise SystemExit(main(sys.argv[1:]))
@@ -7,31 +7,129 @@ Exempel:
 Filnamn:
 - data/analysis/genre_rating_summary.csv
 - data/analysis/year_count_summary.csv
+- (valfritt) en CSV per kub-vy, t.ex. genre_year_summary.csv (se src/cube.py)
+- (valfritt) genre_approx_stats.csv / year_approx_stats.csv – percentiler och
+  antal unika värden ur sparade sketcher (se refresh_movie_sketches)
+- manifest.json – fingerprint per exporterad fil (se write_csv_if_changed)
 """
 
-import pandas as pd
+from __future__ import annotations
+import hashlib
+import json
+import os
+from datetime import datetime
+from typing import TYPE_CHECKING, Iterable, Iterator, Optional
 from pathlib import Path
-from sqlalchemy import text
-from src.logger import get_logger
-from src.load import get_engine
+from src.lazy import lazy_import
+from src.logger import LazyLogger
+from src.load import TABLE_VERSIONS_SQL, get_engine, table_version
+from src.sketches import HyperLogLog, QuantileSketch
+from src.cube import (
+    CUBE_VIEWS, build_cube, build_cube_chunked, build_cube_sql, cube_source_columns, cube_views, rollup,
+)
 
-logger = get_logger()
+if TYPE_CHECKING:
+    from sqlalchemy.engine import Engine
+
+np = lazy_import("numpy")
+pd = lazy_import("pandas")
+sa = lazy_import("sqlalchemy")
+
+logger = LazyLogger()
 
 # Basstruktur för analysfiler
 BASE_DIR = Path(__file__).resolve().parents[1]
+# Skapas först vid export (export_analysis), inte vid import
 ANALYSIS_DIR = BASE_DIR / "data" / "analysis"
-ANALYSIS_DIR.mkdir(parents=True, exist_ok=True)
+MANIFEST_NAME = "manifest.json"
+READ_CHUNK_SIZE = 50_000
+
+MOVIES_COLUMNS = (
+    "imdb_id", "title", "year", "type", "genre", "genre_primary", "director",
+    "country", "runtime_min", "imdb_rating", "imdb_votes", "fetched_at", "row_hash",
+)
+
+
+def _movies_query(
+    columns: Optional[Iterable[str]] = None,
+    year_min: Optional[int] = None,
+    year_max: Optional[int] = None,
+    types: Optional[Iterable[str]] = None,
+    genres: Optional[Iterable[str]] = None,
+):
+    """
+    Bygger SELECT mot movies med kolumnprojektion och filter som bundna
+    parametrar. Kolumnnamn valideras mot MOVIES_COLUMNS (de hamnar i SQL-texten).
+    """
+    cols = list(columns) if columns is not None else list(MOVIES_COLUMNS)
+    unknown = [c for c in cols if c not in MOVIES_COLUMNS]
+    if unknown:
+        raise ValueError(f"Okända kolumner i movies: {unknown}")
+
+    where, params, expanding = [], {}, []
+    if year_min is not None:
+        where.append("year >= :year_min")
+        params["year_min"] = year_min
+    if year_max is not None:
+        where.append("year <= :year_max")
+        params["year_max"] = year_max
+    if types is not None:
+        where.append("type IN :types")
+        params["types"] = list(types)
+        expanding.append(sa.bindparam("types", expanding=True))
+    if genres is not None:
+        where.append("genre_primary IN :genres")
+        params["genres"] = list(genres)
+        expanding.append(sa.bindparam("genres", expanding=True))
+
+    sql = f"SELECT {', '.join(cols)} FROM movies"
+    if where:
+        sql += " WHERE " + " AND ".join(where)
+    return sa.text(sql).bindparams(*expanding), params
+
+
+def iter_movies(
+    columns: Optional[Iterable[str]] = None,
+    year_min: Optional[int] = None,
+    year_max: Optional[int] = None,
+    types: Optional[Iterable[str]] = None,
+    genres: Optional[Iterable[str]] = None,
+    chunk_size: int = READ_CHUNK_SIZE,
+    engine: Engine | None = None,
+) -> Iterator[pd.DataFrame]:
+    """
+    Läser movies i chunks om högst chunk_size rader, med bara de kolumner
+    och rader (år, typ, primärgenre) som efterfrågas. Filtren görs i SQLite,
+    så att bara de rader som behövs når pandas. Används för analyser som kan
+    räknas inkrementellt (t.ex. build_cube_chunked) så att minnet hålls
+    begränsat även med miljontals rader.
+    """
+    query, params = _movies_query(columns, year_min, year_max, types, genres)
+    engine = engine or get_engine()
+    with engine.connect() as conn:
+        # stream_results: chunkerna hämtas löpande från cursorn, inte allt på en gång
+        conn = conn.execution_options(stream_results=True)
+        yield from pd.read_sql_query(query, conn, params=params, chunksize=chunk_size)
 
 
-def read_movies_df():
+def read_movies_df(
+    columns: Optional[Iterable[str]] = None,
+    year_min: Optional[int] = None,
+    year_max: Optional[int] = None,
+    types: Optional[Iterable[str]] = None,
+    genres: Optional[Iterable[str]] = None,
+    engine: Engine | None = None,
+):
     """
-    Läser hela tabellen 'movies' från databasen till en pandas DataFrame.
+    Läser tabellen 'movies' från databasen till en pandas DataFrame.
+    Utan argument läses hela tabellen; annars bara valda kolumner/rader
+    (samma filter som iter_movies).
     """
-    engine = get_engine()
-    query = "SELECT * FROM movies"
+    engine = engine or get_engine()
 
     try:
-        df = pd.read_sql_query(text(query), engine)
+        query, params = _movies_query(columns, year_min, year_max, types, genres)
+        df = pd.read_sql_query(query, engine, params=params)
         logger.info(f"Läste {len(df)} rader från movies (för analys).")
         return df
     except Exception as e:
@@ -39,75 +137,424 @@ def read_movies_df():
         return pd.DataFrame()
 
 
-def genre_rating_summary(df: pd.DataFrame) -> pd.DataFrame:
+def genre_rating_summary(df: pd.DataFrame, cube: pd.DataFrame | None = None) -> pd.DataFrame:
     """
     Gruppanalys: genomsnittligt betyg och antal filmer per primärgenre.
+    Räknas som en roll-up av aggregeringskuben (skicka in cube för att
+    återanvända en redan byggd kub istället för att gruppera df igen).
     """
     if df.empty:
         logger.warning("Ingen data i DataFrame. Hoppar över genre-analys.")
         return pd.DataFrame()
 
+    # Utan färdig kub räcker en kub på just genre/betyg (df behöver inte ha alla kubkolumner)
+    cube = cube if cube is not None else build_cube(df, ["genre_primary"], ["imdb_rating"])
     summary = (
-        df.groupby("genre_primary", dropna=False)
-        .agg(avg_imdb_rating=("imdb_rating", "mean"), count=("imdb_id", "count"))
-        .reset_index()
-        .sort_values(by="count", ascending=False)
+        rollup(cube, ["genre_primary"])
+        .rename(columns={"imdb_rating_mean": "avg_imdb_rating"})
+        [["genre_primary", "avg_imdb_rating", "count"]]
+        .sort_values(by="count", ascending=False, kind="stable")
+        .reset_index(drop=True)
     )
 
     logger.info(f"Skapade genre_rating_summary ({len(summary)} genrer).")
     return summary
 
 
-def year_count_summary(df: pd.DataFrame) -> pd.DataFrame:
+def year_count_summary(df: pd.DataFrame, cube: pd.DataFrame | None = None) -> pd.DataFrame:
     """
-    Gruppanalys: antal filmer per år.
+    Gruppanalys: antal filmer per år (roll-up av aggregeringskuben).
     """
     if df.empty:
         logger.warning("Ingen data i DataFrame. Hoppar över år-analys.")
         return pd.DataFrame()
 
+    cube = cube if cube is not None else build_cube(df, ["year"], [])
     summary = (
-        df.groupby("year", dropna=False)
-        .agg(count=("imdb_id", "count"))
-        .reset_index()
+        rollup(cube, ["year"])[["year", "count"]]
         .sort_values(by="year", ascending=True)
+        .reset_index(drop=True)
     )
 
     logger.info(f"Skapade year_count_summary ({len(summary)} år).")
     return summary
 
-def export_analysis():
+# SQL-pushdown: samma resultat som pandas-funktionerna ovan, men grupperingen
+# görs i databasen (täckande index, se MOVIES_INDEXES i load.py). Sorteringen
+# speglar pandas: stabil sortering på grupp-nyckeln, NULL-gruppen sist.
+GENRE_SUMMARY_SQL = """
+SELECT genre_primary,
+       AVG(imdb_rating) AS avg_imdb_rating,
+       COUNT(imdb_id)   AS count
+FROM movies
+GROUP BY genre_primary
+ORDER BY count DESC, genre_primary IS NULL, genre_primary
+"""
+
+YEAR_SUMMARY_SQL = """
+SELECT year, COUNT(imdb_id) AS count
+FROM movies
+GROUP BY year
+ORDER BY year IS NULL, year
+"""
+
+
+def genre_rating_summary_sql(engine: Engine | None = None) -> pd.DataFrame:
     """
-    Kör hela analysflödet:
-    1. Läs movies-tabellen
-    2. Skapa genre- och årssammanställning
-    3. Spara som CSV i data/analysis/
+    Som genre_rating_summary(), men beräknad med GROUP BY i databasen.
+    Bara en rad per genre överförs, oavsett hur stor movies-tabellen är.
     """
-    df = read_movies_df()
+    engine = engine or get_engine()
+    summary = pd.read_sql_query(sa.text(GENRE_SUMMARY_SQL), engine)
+    summary["avg_imdb_rating"] = summary["avg_imdb_rating"].astype("float64")
+    logger.info(f"Skapade genre_rating_summary via SQL ({len(summary)} genrer).")
+    return summary
+
+
+def year_count_summary_sql(engine: Engine | None = None) -> pd.DataFrame:
+    """
+    Som year_count_summary(), men beräknad med GROUP BY i databasen.
+    """
+    engine = engine or get_engine()
+    summary = pd.read_sql_query(sa.text(YEAR_SUMMARY_SQL), engine)
+    logger.info(f"Skapade year_count_summary via SQL ({len(summary)} år).")
+    return summary
 
+
+def read_materialized_summaries(engine: Engine | None = None) -> tuple[pd.DataFrame, pd.DataFrame]:
+    """
+    Läser genre_rating_summary/year_count_summary-tabellerna som load-steget
+    håller uppdaterade. Bara några dussin rader, oavsett storlek på movies.
+    """
+    engine = engine or get_engine()
+    gsum = pd.read_sql_query(sa.text(
+        "SELECT genre_primary, avg_imdb_rating, count FROM genre_rating_summary "
+        "ORDER BY count DESC, genre_primary IS NULL, genre_primary"
+    ), engine)
+    gsum["avg_imdb_rating"] = gsum["avg_imdb_rating"].astype("float64")
+    ysum = pd.read_sql_query(sa.text(
+        "SELECT year, count FROM year_count_summary ORDER BY year IS NULL, year"
+    ), engine)
+    logger.info(f"Läste materialiserade sammanställningar ({len(gsum)} genrer, {len(ysum)} år).")
+    return gsum, ysum
+
+
+def build_summaries(pushdown: bool = True, engine: Engine | None = None) -> tuple[pd.DataFrame, pd.DataFrame]:
+    """
+    Genre- och årssammanställningen ur databasen engine (standard: get_engine()).
+    Billigast först:
+    1. materialiserade sammanställningstabeller (uppdateras av load-steget)
+    2. SQL-pushdown (GROUP BY mot movies)
+    3. pandas via read_movies_df() – används också när pushdown=False
+    """
+    engine = engine or get_engine()
+    if pushdown:
+        try:
+            return read_materialized_summaries(engine)
+        except sa.exc.SQLAlchemyError as e:
+            logger.warning(f"Sammanställningstabeller saknas, använder SQL-pushdown: {e}")
+        try:
+            return genre_rating_summary_sql(engine), year_count_summary_sql(engine)
+        except sa.exc.SQLAlchemyError as e:
+            logger.warning(f"SQL-pushdown misslyckades, använder pandas istället: {e}")
+
+    df = read_movies_df(engine=engine)
     if df.empty:
+        return pd.DataFrame(), pd.DataFrame()
+    # En kub, två roll-ups – tabellen grupperas bara en gång
+    cube = build_cube(df)
+    return genre_rating_summary(df, cube), year_count_summary(df, cube)
+
+
+def build_cube_views(
+    views: dict[str, list[str]],
+    pushdown: bool = True,
+    engine: Engine | None = None,
+) -> dict[str, pd.DataFrame]:
+    """
+    Bygger kuben med EN scan (GROUP BY i SQLite, eller pandas som fallback)
+    och tar fram alla begärda vyer som roll-ups av den.
+    """
+    engine = engine or get_engine()
+    cube = None
+    if pushdown:
+        try:
+            cube = build_cube_sql(engine)
+        except sa.exc.SQLAlchemyError as e:
+            logger.warning(f"Kub via SQL misslyckades, använder pandas istället: {e}")
+    if cube is None:
+        # Fallback: kuben byggs chunk för chunk, med bara de kolumner den behöver
+        try:
+            cube = build_cube_chunked(iter_movies(columns=cube_source_columns(), engine=engine))
+        except sa.exc.SQLAlchemyError as e:
+            logger.exception(f"Fel vid läsning från databasen: {e}")
+            return {}
+        if cube.empty:
+            return {}
+
+    logger.info(f"Byggde aggregeringskub ({len(cube)} celler) för {len(views)} vyer.")
+    return cube_views(cube, views)
+
+
+def read_manifest(analysis_dir: Path | None = None) -> dict:
+    """
+    Läser manifest.json: {filnamn: {"fingerprint", "rows", "written_at"}}.
+    Nedströmsverktyg (t.ex. Power BI-schemaläggning) kan polla den här lilla
+    filen för att se om någon analysfil faktiskt har ändrats.
+    """
+    path = (analysis_dir or ANALYSIS_DIR) / MANIFEST_NAME
+    try:
+        return json.loads(path.read_text(encoding="utf-8"))
+    except (OSError, ValueError):
+        return {}
+
+
+def _write_manifest(analysis_dir: Path, manifest: dict) -> None:
+    path = analysis_dir / MANIFEST_NAME
+    tmp = path.with_name(f".{path.name}.tmp")
+    tmp.write_text(json.dumps(manifest, indent=2, sort_keys=True), encoding="utf-8")
+    os.replace(tmp, path)
+
+
+def write_csv_if_changed(df: pd.DataFrame, path: Path, manifest: dict) -> bool:
+    """
+    Skriver df som CSV bara om innehållet skiljer sig från förra exporten.
+    Fingerprint = blake2b av CSV-bytes, jämförs mot manifestet (och att filen
+    finns kvar). Ändrade filer skrivs till en temporär fil och byts in med
+    os.replace. Uppdaterar manifest på plats; returnerar True om filen skrevs.
+    """
+    data = df.to_csv(index=False).encode("utf-8")
+    fingerprint = hashlib.blake2b(data, digest_size=16).hexdigest()
+
+    entry = manifest.get(path.name)
+    if entry and entry.get("fingerprint") == fingerprint and path.exists():
+        logger.info(f"Oförändrad, hoppar över: {path}")
+        return False
+
+    tmp = path.with_name(f".{path.name}.tmp")
+    tmp.write_bytes(data)
+    os.replace(tmp, path)
+    manifest[path.name] = {
+        "fingerprint": fingerprint,
+        "rows": len(df),
+        "written_at": datetime.utcnow().isoformat(timespec="seconds"),
+    }
+    logger.info(f"Exporterat: {path}")
+    return True
+
+
+# Ungefärlig statistik per genre och år (se src/sketches.py). Sketcharna
+# byggs strömmande från iter_movies() och sparas i movie_sketches, så att
+# percentiler och antal unika värden kan tas fram utan att läsa movies igen.
+# I table_versions sparas vilken version av movies sketcharna byggdes från;
+# efter en laddning utan ombyggnad räknas de som inaktuella (sketches_are_current).
+SKETCH_GROUPS = ("genre_primary", "year")
+SKETCH_QUANTILE_COLUMNS = ("imdb_rating", "runtime_min")
+SKETCH_DISTINCT_COLUMNS = ("director", "country")
+SKETCH_QUANTILES = {"p10": 0.1, "median": 0.5, "p90": 0.9}
+APPROX_STATS_FILES = ("genre_approx_stats.csv", "year_approx_stats.csv")
+
+MOVIE_SKETCHES_SQL = """
+CREATE TABLE IF NOT EXISTS movie_sketches (
+  group_by  TEXT NOT NULL,
+  group_key TEXT NOT NULL,
+  column    TEXT NOT NULL,
+  kind      TEXT NOT NULL,
+  payload   TEXT NOT NULL,
+  PRIMARY KEY (group_by, group_key, column)
+);
+"""
+
+_SKETCH_KINDS = {"quantile": QuantileSketch, "hll": HyperLogLog}
+
+
+def _group_key(value) -> str:
+    # JSON-kodad gruppnyckel: "Action", 2024 eller null (år lagras som REAL i pandas)
+    if pd.isna(value):
+        return "null"
+    if isinstance(value, (float, np.floating)) and float(value).is_integer():
+        value = int(value)
+    return json.dumps(value.item() if isinstance(value, np.generic) else value)
+
+
+def _split_multi(values: pd.Series) -> pd.Series:
+    """'USA, UK' -> 'USA', 'UK' (unika värden räknas per enskilt land/regissör)."""
+    return values.dropna().astype(str).str.split(",").explode().str.strip()
+
+
+def _new_group_sketches() -> dict:
+    sketches = {c: QuantileSketch() for c in SKETCH_QUANTILE_COLUMNS}
+    sketches.update({c: HyperLogLog() for c in SKETCH_DISTINCT_COLUMNS})
+    return sketches
+
+
+def update_movie_sketches(sketches: dict, chunk: pd.DataFrame) -> dict:
+    """
+    Uppdaterar sketcharna med en chunk rader.
+    sketches: {(group_by, group_key): {kolumn: sketch}}
+    """
+    for group_by in SKETCH_GROUPS:
+        for value, part in chunk.groupby(group_by, dropna=False, sort=False):
+            group = sketches.setdefault((group_by, _group_key(value)), _new_group_sketches())
+            for c in SKETCH_QUANTILE_COLUMNS:
+                group[c].update(part[c])
+            for c in SKETCH_DISTINCT_COLUMNS:
+                group[c].update(_split_multi(part[c]))
+    return sketches
+
+
+def build_movie_sketches(chunks: Iterable[pd.DataFrame]) -> dict:
+    """Bygger sketcharna chunk för chunk (minnet beror inte på antalet rader)."""
+    sketches: dict = {}
+    for chunk in chunks:
+        update_movie_sketches(sketches, chunk)
+    return sketches
+
+
+def save_movie_sketches(engine: Engine, sketches: dict, movies_version: int | None = None) -> None:
+    """
+    Ersätter innehållet i movie_sketches med sketcharna (en transaktion).
+    movies_version = den version av movies de byggdes från (standard: aktuell).
+    """
+    if movies_version is None:
+        movies_version = table_version(engine)
+    kinds = {cls: kind for kind, cls in _SKETCH_KINDS.items()}
+    rows = [
+        {"group_by": group_by, "group_key": key, "column": column,
+         "kind": kinds[type(sketch)], "payload": sketch.to_json()}
+        for (group_by, key), group in sketches.items()
+        for column, sketch in group.items()
+    ]
+    with engine.begin() as conn:
+        conn.execute(sa.text(MOVIE_SKETCHES_SQL))
+        conn.execute(sa.text("DELETE FROM movie_sketches"))
+        if rows:
+            conn.execute(sa.text(
+                "INSERT INTO movie_sketches (group_by, group_key, column, kind, payload) "
+                "VALUES (:group_by, :group_key, :column, :kind, :payload)"
+            ), rows)
+        conn.execute(sa.text(TABLE_VERSIONS_SQL))
+        conn.execute(sa.text("""
+            INSERT INTO table_versions (table_name, version, updated_at)
+            VALUES ('movie_sketches', :v, strftime('%Y-%m-%dT%H:%M:%SZ', 'now'))
+            ON CONFLICT(table_name) DO UPDATE SET version = excluded.version, updated_at = excluded.updated_at
+        """), {"v": movies_version})
+
+
+def sketches_are_current(engine: Engine | None = None) -> bool:
+    """True om movie_sketches byggdes från nuvarande version av movies."""
+    engine = engine or get_engine()
+    return table_version(engine, "movie_sketches") == table_version(engine)
+
+
+def load_movie_sketches(engine: Engine | None = None) -> dict:
+    """Läser sparade sketcher. Tom dict om de inte har byggts."""
+    engine = engine or get_engine()
+    try:
+        with engine.connect() as conn:
+            rows = conn.execute(sa.text(
+                "SELECT group_by, group_key, column, kind, payload FROM movie_sketches"
+            )).all()
+    except sa.exc.SQLAlchemyError:
+        return {}
+
+    sketches: dict = {}
+    for group_by, key, column, kind, payload in rows:
+        sketches.setdefault((group_by, key), {})[column] = _SKETCH_KINDS[kind].from_json(payload)
+    return sketches
+
+
+def refresh_movie_sketches(engine: Engine | None = None, chunk_size: int = READ_CHUNK_SIZE) -> dict:
+    """
+    Bygger om sketcharna från movies (strömmande, chunk_size rader åt gången)
+    och sparar dem. Körs efter load-steget.
+    """
+    engine = engine or get_engine()
+    # Versionen läses före läsningen: laddas movies under tiden blir sketcharna inaktuella, inte felmärkta
+    version = table_version(engine)
+    columns = [*SKETCH_GROUPS, *SKETCH_QUANTILE_COLUMNS, *SKETCH_DISTINCT_COLUMNS]
+    sketches = build_movie_sketches(iter_movies(columns=columns, chunk_size=chunk_size, engine=engine))
+    save_movie_sketches(engine, sketches, movies_version=version)
+    logger.info(f"Byggde om statistik-sketcher ({len(sketches)} grupper).")
+    return sketches
+
+
+def approx_stats_summary(sketches: dict, group_by: str) -> pd.DataFrame:
+    """
+    Ungefärliga percentiler (p10/median/p90) för betyg och speltid samt
+    antal unika regissörer/länder per grupp, ur sparade eller nybyggda sketcher.
+    """
+    rows = []
+    for (gb, key), group in sketches.items():
+        if gb != group_by:
+            continue
+        row = {group_by: json.loads(key)}
+        for c in SKETCH_QUANTILE_COLUMNS:
+            for name, q in zip(SKETCH_QUANTILES, group[c].quantiles(SKETCH_QUANTILES.values())):
+                row[f"{c}_{name}"] = q
+        for c in SKETCH_DISTINCT_COLUMNS:
+            row[f"distinct_{c}"] = group[c].count()
+        rows.append(row)
+
+    if not rows:
+        return pd.DataFrame()
+    return pd.DataFrame(rows).sort_values(by=group_by, na_position="last").reset_index(drop=True)
+
+
+def export_analysis(pushdown: bool = True, views: dict[str, list[str]] | None = None):
+    """
+    Kör hela analysflödet:
+    1. Hämta genre- och årssammanställning (materialiserade tabeller,
+       SQL-pushdown eller pandas – se build_summaries)
+    2. Spara som CSV i data/analysis/
+    3. Om views anges (t.ex. CUBE_VIEWS): exportera även de vyerna,
+       alla som roll-ups av samma aggregeringskub.
+    4. Finns sparade sketcher byggda från nuvarande movies: exportera
+       ungefärlig statistik per genre/år. Inaktuella sketcher exporteras
+       inte, och tidigare exporterade approx-filer tas bort.
+    """
+    gsum, ysum = build_summaries(pushdown)
+
+    if gsum.empty and ysum.empty:
         logger.warning("Ingen data i databasen – hoppar över analys-export.")
         # se ändå till att analyskatalogen finns, så att Power BI kan peka dit
         ANALYSIS_DIR.mkdir(parents=True, exist_ok=True)
         return
 
-    gsum = genre_rating_summary(df)
-    ysum = year_count_summary(df)
-
     # se till att katalogen finns (även om ANALYSIS_DIR monkeypatchats i test)
     ANALYSIS_DIR.mkdir(parents=True, exist_ok=True)
 
     try:
-        if not gsum.empty:
-            gsum_path = ANALYSIS_DIR / "genre_rating_summary.csv"
-            gsum.to_csv(gsum_path, index=False, encoding="utf-8")
-            logger.info(f"Exporterat: {gsum_path}")
+        outputs = {"genre_rating_summary": gsum, "year_count_summary": ysum}
+        if views:
+            outputs.update(build_cube_views(views, pushdown))
+
+        manifest = read_manifest(ANALYSIS_DIR)
+        removed = []
+
+        # Ungefärlig statistik om sketcharna har byggts (refresh_movie_sketches) från nuvarande movies
+        engine = get_engine()
+        sketches = load_movie_sketches(engine)
+        if sketches and sketches_are_current(engine):
+            outputs["genre_approx_stats"] = approx_stats_summary(sketches, "genre_primary")
+            outputs["year_approx_stats"] = approx_stats_summary(sketches, "year")
+        elif sketches:
+            logger.warning("Statistik-sketcharna är äldre än movies (ANALYSIS_SKETCHES=1 bygger om dem); exporteras inte.")
+            for name in APPROX_STATS_FILES:
+                path = ANALYSIS_DIR / name
+                if path.exists() or name in manifest:
+                    path.unlink(missing_ok=True)
+                    manifest.pop(name, None)
+                    removed.append(name)
 
-        if not ysum.empty:
-            ysum_path = ANALYSIS_DIR / "year_count_summary.csv"
-            ysum.to_csv(ysum_path, index=False, encoding="utf-8")
-            logger.info(f"Exporterat: {ysum_path}")
+        # Oförändrade filer skrivs inte om -> inga onödiga Power BI-uppdateringar
+        changed = [
+            name for name, frame in outputs.items()
+            if not frame.empty and write_csv_if_changed(frame, ANALYSIS_DIR / f"{name}.csv", manifest)
+        ]
+        if changed or removed:
+            _write_manifest(ANALYSIS_DIR, manifest)
 
-        logger.info("✅ Analys-export klar.")
+        logger.info(f"✅ Analys-export klar ({len(changed)} av {len(outputs)} filer ändrade).")
     except Exception as e:
         logger.exception(f"Fel vid export av analysfiler: {e}")
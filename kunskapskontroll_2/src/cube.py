@@ -0,0 +1,186 @@
+"""
+Aggregeringskub för analyserna.
+
+Istället för att varje sammanställning grupperar hela movies-tabellen för sig
+räknas en kub fram EN gång på finaste nivån (alla dimensioner), med count och
+per mått: antal icke-NA (_n), summa, min och max. Alla sammanställningar
+(genre, år, genre × år, typ × år, land × genre, ...) blir sedan billiga
+roll-ups av kuben, som bara har en rad per unik dimensionskombination.
+
+Kuben kan byggas:
+- från en DataFrame (build_cube)
+- från flera delar/chunks, som slås ihop (merge_cubes, build_cube_chunked)
+- direkt i SQLite med en enda GROUP BY-scan (build_cube_sql)
+"""
+
+from __future__ import annotations
+from typing import TYPE_CHECKING, Iterable, Optional
+
+from .lazy import lazy_import
+
+if TYPE_CHECKING:
+    from sqlalchemy.engine import Engine
+
+pd = lazy_import("pandas")
+sa = lazy_import("sqlalchemy")
+
+CUBE_DIMENSIONS = ["genre_primary", "year", "type", "country_primary"]
+CUBE_MEASURES = ["imdb_rating", "runtime_min", "imdb_votes"]
+
+# Härledda dimensioner: hur de räknas fram i SQL (pandas-varianten i _with_derived)
+DERIVED_DIMENSION_SQL = {
+    "country_primary": (
+        "TRIM(CASE WHEN instr(country, ',') > 0 "
+        "THEN substr(country, 1, instr(country, ',') - 1) ELSE country END)"
+    ),
+}
+
+# Färdiga vyer för Power BI: namn -> dimensioner att rulla upp till
+CUBE_VIEWS = {
+    "genre_year_summary": ["genre_primary", "year"],
+    "type_year_summary": ["type", "year"],
+    "country_genre_summary": ["country_primary", "genre_primary"],
+}
+
+_PARTIALS = {"n": "sum", "sum": "sum", "min": "min", "max": "max"}
+
+
+def _with_derived(df: pd.DataFrame, dimensions: list[str]) -> pd.DataFrame:
+    """Lägger till härledda dimensioner (t.ex. country_primary = första landet)."""
+    if "country_primary" in dimensions and "country_primary" not in df.columns:
+        country = df["country"]
+        first = country.astype(str).str.split(",", n=1).str[0].str.strip()
+        df = df.assign(country_primary=first.where(country.notna()))
+    return df
+
+
+def _measures_of(cube: pd.DataFrame) -> list[str]:
+    return [c[: -len("_sum")] for c in cube.columns if c.endswith("_sum")]
+
+
+def build_cube(
+    df: pd.DataFrame,
+    dimensions: Optional[list[str]] = None,
+    measures: Optional[list[str]] = None,
+) -> pd.DataFrame:
+    """
+    Bygger kuben från en DataFrame med en enda groupby på alla dimensioner.
+    Kolumner: dimensionerna, count, och <mått>_n/_sum/_min/_max.
+    """
+    dims = list(CUBE_DIMENSIONS if dimensions is None else dimensions)
+    meas = list(CUBE_MEASURES if measures is None else measures)
+    frame = _with_derived(df, dims)
+
+    agg = {"count": ("imdb_id", "count")}
+    for m in meas:
+        agg[f"{m}_n"] = (m, "count")
+        agg[f"{m}_sum"] = (m, "sum")
+        agg[f"{m}_min"] = (m, "min")
+        agg[f"{m}_max"] = (m, "max")
+
+    return frame.groupby(dims, dropna=False).agg(**agg).reset_index()
+
+
+def cube_source_columns(
+    dimensions: Optional[list[str]] = None,
+    measures: Optional[list[str]] = None,
+) -> list[str]:
+    """Vilka movies-kolumner kuben behöver (för kolumnprojektion vid läsning)."""
+    dims = [("country" if d == "country_primary" else d) for d in (CUBE_DIMENSIONS if dimensions is None else dimensions)]
+    return list(dict.fromkeys(["imdb_id", *dims, *(CUBE_MEASURES if measures is None else measures)]))
+
+
+def build_cube_chunked(
+    chunks: Iterable[pd.DataFrame],
+    dimensions: Optional[list[str]] = None,
+    measures: Optional[list[str]] = None,
+) -> pd.DataFrame:
+    """
+    Bygger kuben inkrementellt: en delkub per chunk som direkt slås ihop med
+    den löpande kuben. Minnet begränsas av chunkstorleken + kubens storlek.
+    """
+    cube = pd.DataFrame()
+    for chunk in chunks:
+        if chunk.empty:
+            continue
+        cube = merge_cubes([cube, build_cube(chunk, dimensions, measures)])
+    return cube
+
+
+def build_cube_sql(
+    engine: Engine,
+    dimensions: Optional[list[str]] = None,
+    measures: Optional[list[str]] = None,
+) -> pd.DataFrame:
+    """
+    Samma kub som build_cube(), men beräknad i databasen med en enda GROUP BY.
+    Bara en rad per dimensionskombination överförs till pandas.
+    """
+    dims = list(CUBE_DIMENSIONS if dimensions is None else dimensions)
+    meas = list(CUBE_MEASURES if measures is None else measures)
+
+    select = [f"{DERIVED_DIMENSION_SQL.get(d, d)} AS {d}" for d in dims]
+    select.append("COUNT(imdb_id) AS count")
+    for m in meas:
+        select += [
+            f"COUNT({m}) AS {m}_n",
+            f"TOTAL({m}) AS {m}_sum",
+            f"MIN({m}) AS {m}_min",
+            f"MAX({m}) AS {m}_max",
+        ]
+
+    sql = f"SELECT {', '.join(select)} FROM movies GROUP BY {', '.join(dims)}"
+    cube = pd.read_sql_query(sa.text(sql), engine)
+    for m in meas:
+        for part in ("sum", "min", "max"):
+            cube[f"{m}_{part}"] = cube[f"{m}_{part}"].astype("float64")
+    return cube
+
+
+def rollup(cube: pd.DataFrame, dimensions: Iterable[str]) -> pd.DataFrame:
+    """
+    Rullar upp kuben till färre dimensioner (tom lista = totalsumma).
+    Räknar också <mått>_mean = sum / n (NaN om inga värden finns).
+    """
+    dims = list(dimensions)
+    meas = _measures_of(cube)
+
+    agg = {"count": ("count", "sum")}
+    for m in meas:
+        for part, how in _PARTIALS.items():
+            agg[f"{m}_{part}"] = (f"{m}_{part}", how)
+
+    if dims:
+        out = cube.groupby(dims, dropna=False).agg(**agg).reset_index()
+    else:
+        out = cube.assign(_all=0).groupby("_all").agg(**agg).reset_index(drop=True)
+
+    for m in meas:
+        out[f"{m}_mean"] = out[f"{m}_sum"] / out[f"{m}_n"].where(out[f"{m}_n"] > 0)
+    return out
+
+
+def merge_cubes(cubes: Iterable[pd.DataFrame]) -> pd.DataFrame:
+    """
+    Slår ihop kuber med samma dimensioner (t.ex. en per chunk) till en kub.
+    Räkningar och summor adderas, min/max kombineras.
+    """
+    parts = [c for c in cubes if not c.empty]
+    if not parts:
+        return pd.DataFrame()
+    dims = [c for c in parts[0].columns if c != "count" and c.rsplit("_", 1)[-1] not in _PARTIALS]
+    merged = rollup(pd.concat(parts, ignore_index=True), dims)
+    return merged.drop(columns=[c for c in merged.columns if c.endswith("_mean")])
+
+
+def cube_views(cube: pd.DataFrame, views: Optional[dict[str, list[str]]] = None) -> dict[str, pd.DataFrame]:
+    """
+    Tar fram flera sammanställningar ur samma kub: namn -> roll-up.
+    Sorteras på dimensionerna för stabila exportfiler.
+    """
+    views = CUBE_VIEWS if views is None else views
+    out = {}
+    for name, dims in views.items():
+        view = rollup(cube, dims)
+        out[name] = view.sort_values(by=dims, kind="stable").reset_index(drop=True)
+    return out
@@ -0,0 +1,171 @@
+"""
+Kolumnär export för Power BI (komplement till CSV-filerna i analyze.py).
+
+Skriver till data/analysis/parquet/:
+- movies/year=<år>/...parquet  – hela movies-tabellen, partitionerad per år
+- genre_rating_summary.parquet, year_count_summary.parquet (+ ev. kub-vyer)
+
+Filerna är typade (int/float/timestamp istället för text) och
+zstd-komprimerade. Power BI (och read_movies_parquet nedan) kan därför läsa
+bara de kolumner och år som behövs istället för att tolka hela filer.
+
+Allt skrivs först till en temporär sökväg och byts sedan in med rename,
+så att en läsare aldrig ser en halvskriven fil.
+"""
+
+from __future__ import annotations
+import os
+import shutil
+from pathlib import Path
+from typing import Iterable, Iterator, Optional
+
+import pandas as pd
+import pyarrow as pa
+import pyarrow.dataset as ds
+import pyarrow.parquet as pq
+from sqlalchemy import text
+from sqlalchemy.engine import Engine
+
+from src.logger import LazyLogger
+from src.load import get_engine
+from src.analyze import build_cube_views, build_summaries
+
+logger = LazyLogger()
+
+BASE_DIR = Path(__file__).resolve().parents[1]
+PARQUET_DIR = BASE_DIR / "data" / "analysis" / "parquet"
+PARQUET_COMPRESSION = "zstd"
+EXPORT_CHUNK_SIZE = 50_000
+
+# Typat schema för movies (row_hash är internt för load-steget och exporteras inte)
+MOVIES_PARQUET_SCHEMA = pa.schema([
+    ("imdb_id", pa.string()),
+    ("title", pa.string()),
+    ("year", pa.int16()),
+    ("type", pa.string()),
+    ("genre", pa.string()),
+    ("genre_primary", pa.string()),
+    ("director", pa.string()),
+    ("country", pa.string()),
+    ("runtime_min", pa.int32()),
+    ("imdb_rating", pa.float64()),
+    ("imdb_votes", pa.int64()),
+    ("fetched_at", pa.timestamp("ms")),
+])
+
+MOVIES_PARTITIONING = ds.partitioning(pa.schema([("year", pa.int16())]), flavor="hive")
+
+
+def _movie_batches(engine: Engine, chunk_size: int) -> Iterator[pa.RecordBatch]:
+    """Strömmar movies från databasen i chunks, konverterade till det typade schemat."""
+    query = text(f"SELECT {', '.join(MOVIES_PARQUET_SCHEMA.names)} FROM movies ORDER BY year, imdb_id")
+    for chunk in pd.read_sql_query(query, engine, chunksize=chunk_size):
+        chunk["fetched_at"] = pd.to_datetime(chunk["fetched_at"], errors="coerce")
+        yield pa.RecordBatch.from_pandas(chunk, schema=MOVIES_PARQUET_SCHEMA, preserve_index=False)
+
+
+def _replace_dir(tmp: Path, dest: Path) -> None:
+    """
+    Byter in en färdigskriven katalog. Kataloger kan inte bytas atomärt mot en
+    befintlig katalog, så den gamla flyttas undan först (ett rename-fönster)
+    och tas bort efteråt.
+    """
+    old = dest.with_name(f".{dest.name}.old-{os.getpid()}")
+    if dest.exists():
+        os.replace(dest, old)
+    os.replace(tmp, dest)
+    shutil.rmtree(old, ignore_errors=True)
+
+
+def write_movies_parquet(
+    engine: Engine | None = None,
+    out_dir: Optional[Path] = None,
+    chunk_size: int = EXPORT_CHUNK_SIZE,
+) -> Path:
+    """
+    Skriver movies som Parquet-dataset partitionerat per år (year=2024/...).
+    Läser databasen chunkvis, så minnet hålls nere även för stora tabeller.
+    Returnerar sökvägen till datasetet.
+    """
+    engine = engine or get_engine()
+    out_dir = Path(out_dir) if out_dir is not None else PARQUET_DIR
+    out_dir.mkdir(parents=True, exist_ok=True)
+
+    dest = out_dir / "movies"
+    tmp = out_dir / f".movies.tmp-{os.getpid()}"
+    shutil.rmtree(tmp, ignore_errors=True)
+
+    try:
+        ds.write_dataset(
+            _movie_batches(engine, chunk_size),
+            tmp,
+            schema=MOVIES_PARQUET_SCHEMA,
+            format="parquet",
+            partitioning=MOVIES_PARTITIONING,
+            file_options=ds.ParquetFileFormat().make_write_options(compression=PARQUET_COMPRESSION),
+            basename_template="part-{i}.parquet",
+            existing_data_behavior="overwrite_or_ignore",
+        )
+        tmp.mkdir(exist_ok=True)  # tom tabell -> tom katalog, inte en saknad
+        _replace_dir(tmp, dest)
+    except Exception:
+        shutil.rmtree(tmp, ignore_errors=True)
+        raise
+
+    logger.info(f"Exporterat (Parquet): {dest}")
+    return dest
+
+
+def write_frame_parquet(df: pd.DataFrame, path: Path) -> Path:
+    """Skriver en DataFrame som en Parquet-fil (temporär fil + os.replace)."""
+    path = Path(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp = path.with_name(f".{path.name}.tmp")
+    table = pa.Table.from_pandas(df, preserve_index=False)
+    pq.write_table(table, tmp, compression=PARQUET_COMPRESSION)
+    os.replace(tmp, path)
+    logger.info(f"Exporterat (Parquet): {path}")
+    return path
+
+
+def export_parquet(
+    engine: Engine | None = None,
+    out_dir: Optional[Path] = None,
+    views: dict[str, list[str]] | None = None,
+) -> None:
+    """
+    Exporterar movies och alla sammanställningar som Parquet.
+    Sammanställningarna tas fram på samma sätt som i export_analysis()
+    (materialiserade tabeller -> SQL-pushdown -> pandas).
+    """
+    engine = engine or get_engine()
+    out_dir = Path(out_dir) if out_dir is not None else PARQUET_DIR
+    write_movies_parquet(engine, out_dir)
+
+    # Samma databas för sammanställningarna som för movies
+    gsum, ysum = build_summaries(engine=engine)
+    frames = {"genre_rating_summary": gsum, "year_count_summary": ysum}
+    if views:
+        frames.update(build_cube_views(views, engine=engine))
+
+    for name, frame in frames.items():
+        if not frame.empty:
+            write_frame_parquet(frame, out_dir / f"{name}.parquet")
+
+    logger.info("✅ Parquet-export klar.")
+
+
+def read_movies_parquet(
+    columns: Optional[Iterable[str]] = None,
+    years: Optional[Iterable[int]] = None,
+    path: Optional[Path] = None,
+) -> pd.DataFrame:
+    """
+    Läser movies-datasetet och hämtar bara de kolumner och år som efterfrågas.
+    Årsfiltret matchas mot partitionerna, så övriga års filer öppnas aldrig.
+    """
+    path = Path(path) if path is not None else PARQUET_DIR / "movies"
+    dataset = ds.dataset(path, format="parquet", partitioning=MOVIES_PARTITIONING)
+    filt = ds.field("year").isin(list(years)) if years is not None else None
+    table = dataset.to_table(columns=list(columns) if columns is not None else None, filter=filt)
+    return table.to_pandas()
@@ -1,32 +1,136 @@
 from __future__ import annotations
 import os
+import threading
 import time
-from pathlib import Path
-import requests
-import pandas as pd
-from dotenv import load_dotenv
-from .logger import get_logger
+from collections import OrderedDict
+from .lazy import lazy_import
+from .logger import LazyLogger
+from .metrics import get_metrics
 
-# Ladda .env om den finns i projektroten så vi kan plocka OMDB_API_KEY
-# (Detta stör inte paths; paths styrs i load/logger.)
-BASE_DIR = Path(__file__).resolve().parents[1]
-ENV_FILE = BASE_DIR / ".env"
-load_dotenv(dotenv_path=ENV_FILE, override=False)
+pd = lazy_import("pandas")
+requests = lazy_import("requests")
 
-logger = get_logger()
+logger = LazyLogger()
 
-OMDB_API_KEY = os.getenv("OMDB_API_KEY")
 OMDB_URL = "https://www.omdbapi.com/"
+OMDB_TIMEOUT_SEC = 15
+
+# Varmt läge (tjänsteläget, main.py --serve): en delad HTTP-session (keep-alive)
+# och en minnescache för lyckade OMDb-svar mellan körningar. Detaljcachen är
+# nycklad på imdbID och fungerar därmed som ett varmt index över redan sedda
+# titlar: de hämtas ur minnet istället för via API:t tills TTL:en gått ut.
+SEARCH_CACHE_TTL_SEC = 3600
+DETAILS_CACHE_TTL_SEC = 24 * 3600
+RESPONSE_CACHE_MAX_ENTRIES = 100_000
+
+_session = None
+_response_cache: ResponseCache | None = None
+
 
 class ExtractError(Exception):
     pass
 
 
+class ResponseCache:
+    """LRU-cache för OMDb-svar med TTL per endpoint ("search"/"details"). Trådsäker."""
+
+    def __init__(
+        self,
+        ttl_sec: dict[str, float],
+        max_entries: int = RESPONSE_CACHE_MAX_ENTRIES,
+        clock=time.monotonic,
+    ):
+        self.ttl_sec = ttl_sec
+        self.max_entries = max_entries
+        self._clock = clock
+        self._entries: OrderedDict[tuple, tuple[float, dict]] = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, endpoint: str, key) -> dict | None:
+        with self._lock:
+            entry = self._entries.get((endpoint, key))
+            if entry is None:
+                return None
+            if self._clock() >= entry[0]:
+                del self._entries[(endpoint, key)]
+                return None
+            self._entries.move_to_end((endpoint, key))
+            return entry[1]
+
+    def put(self, endpoint: str, key, data: dict) -> None:
+        ttl = self.ttl_sec.get(endpoint, 0)
+        if ttl <= 0:
+            return
+        with self._lock:
+            self._entries[(endpoint, key)] = (self._clock() + ttl, data)
+            self._entries.move_to_end((endpoint, key))
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def __contains__(self, endpoint_key: tuple) -> bool:
+        return self.get(*endpoint_key) is not None
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+
+def enable_warm_state(
+    search_ttl_sec: float = SEARCH_CACHE_TTL_SEC,
+    details_ttl_sec: float = DETAILS_CACHE_TTL_SEC,
+) -> ResponseCache:
+    """
+    Slår på det varma läget för resten av processen: delad requests.Session
+    och svarscache. Anropas en gång av tjänsteläget; engångskörningar
+    påverkas inte.
+    """
+    global _session, _response_cache
+    if _session is None:
+        _session = requests.Session()
+    if _response_cache is None:
+        _response_cache = ResponseCache({"search": search_ttl_sec, "details": details_ttl_sec})
+    return _response_cache
+
+
+def disable_warm_state() -> None:
+    global _session, _response_cache
+    if _session is not None:
+        _session.close()
+    _session = None
+    _response_cache = None
+
+
+def _api_key() -> str | None:
+    # Läses vid anrop, inte vid import: main.py laddar .env en gång vid start
+    return os.getenv("OMDB_API_KEY")
+
+
 def _check_api_key():
-    if not OMDB_API_KEY:
+    if not _api_key():
         raise ExtractError("OMDB_API_KEY saknas i .env")
 
 
+def _record_api_call(endpoint: str, latency_ms: float) -> None:
+    metrics = get_metrics()
+    metrics.inc("omdb_api_calls_total", endpoint=endpoint)
+    metrics.observe("omdb_http_latency_ms", latency_ms, endpoint=endpoint)
+
+
+def _cached_response(endpoint: str, key) -> dict | None:
+    if _response_cache is None:
+        return None
+    data = _response_cache.get(endpoint, key)
+    get_metrics().inc("omdb_cache_total", endpoint=endpoint, result="miss" if data is None else "hit")
+    return data
+
+
+def _http_get(params: dict) -> dict:
+    # Den delade sessionen (varmt läge) återanvänder anslutningar; annars som tidigare
+    client = _session if _session is not None else requests
+    r = client.get(OMDB_URL, params=params, timeout=OMDB_TIMEOUT_SEC)
+    r.raise_for_status()
+    return r.json()
+
+
 def fetch_movies_basic(query: str, page: int = 1) -> pd.DataFrame:
     """
     Hämtar en enkel söklista från OMDb API med parametern 's'.
@@ -35,23 +139,34 @@ def fetch_movies_basic(query: str, page: int = 1) -> pd.DataFrame:
     """
     _check_api_key()
 
-    params = {"apikey": OMDB_API_KEY, "s": query, "page": page}
-    try:
-        r = requests.get(OMDB_URL, params=params, timeout=15)
-        r.raise_for_status()
-        data = r.json()
-    except requests.RequestException as e:
-        logger.error(f"HTTP-fel vid hämtning (query={query}, page={page}): {e}")
-        raise ExtractError("Nätverksfel mot OMDb") from e
+    params = {"apikey": _api_key(), "s": query, "page": page}
+    fields = {"event": "omdb.page", "query": query, "page": page}
+    data = _cached_response("search", (query, page))
+    if data is None:
+        started = time.perf_counter()
+        try:
+            data = _http_get(params)
+        except requests.RequestException as e:
+            get_metrics().inc("omdb_api_errors_total", endpoint="search")
+            logger.error("HTTP-fel vid hämtning (query=%s, page=%s): %s", query, page, e, extra=fields)
+            raise ExtractError("Nätverksfel mot OMDb") from e
+        fields["latency_ms"] = round((time.perf_counter() - started) * 1000, 1)
+        _record_api_call("search", fields["latency_ms"])
+        if _response_cache is not None and data.get("Response") == "True":
+            _response_cache.put("search", (query, page), data)
 
     if data.get("Response") != "True":
         msg = data.get("Error", "Okänt fel från OMDb")
-        logger.warning(f"OMDb fel (query={query}, page={page}): {msg}")
+        logger.warning("OMDb fel (query=%s, page=%s): %s", query, page, msg, extra=fields)
         return pd.DataFrame(columns=["imdbID", "Title", "Year", "Type"])
 
     items = data.get("Search", [])
     df = pd.DataFrame(items, columns=["imdbID", "Title", "Year", "Type"])
-    logger.info(f"Hämtade {len(df)} rader från OMDb för '{query}' (page={page}).")
+    # Lat formatering + sampling (LOG_SAMPLE=omdb.page=N) – den här raden loggas för varje sida
+    logger.info(
+        "Hämtade %d rader från OMDb för '%s' (page=%s).", len(df), query, page,
+        extra={**fields, "rows": len(df)},
+    )
     return df
 
 
@@ -63,19 +178,27 @@ def fetch_movie_details(imdb_id: str) -> dict:
     """
     _check_api_key()
 
-    params = {"apikey": OMDB_API_KEY, "i": imdb_id, "plot": "short"}
-    try:
-        r = requests.get(OMDB_URL, params=params, timeout=15)
-        r.raise_for_status()
-        data = r.json()
-    except requests.RequestException as e:
-        logger.error(f"HTTP-fel vid detaljhämntning imdb_id={imdb_id}: {e}")
-        return {}
+    params = {"apikey": _api_key(), "i": imdb_id, "plot": "short"}
+    fields = {"event": "omdb.details", "imdb_id": imdb_id}
+    data = _cached_response("details", imdb_id)
+    if data is None:
+        started = time.perf_counter()
+        try:
+            data = _http_get(params)
+        except requests.RequestException as e:
+            get_metrics().inc("omdb_api_errors_total", endpoint="details")
+            logger.error("HTTP-fel vid detaljhämntning imdb_id=%s: %s", imdb_id, e, extra=fields)
+            return {}
+        fields["latency_ms"] = round((time.perf_counter() - started) * 1000, 1)
+        _record_api_call("details", fields["latency_ms"])
+        if _response_cache is not None and data.get("Response") == "True":
+            _response_cache.put("details", imdb_id, data)
 
     if data.get("Response") != "True":
-        logger.warning(f"Detalj misslyckades för {imdb_id}: {data.get('Error')}")
+        logger.warning("Detalj misslyckades för %s: %s", imdb_id, data.get("Error"), extra=fields)
         return {}
 
+    logger.debug("Hämtade detaljer för %s.", imdb_id, extra=fields)
     return data
 
 
@@ -133,12 +256,15 @@ def fetch_all_movies_full(
                 continue
 
             # Om den överlever båda filtren -> hämta detaljer
+            # (ur svarscachen i varmt läge; då behövs ingen paus mot API:t)
+            cached = _response_cache is not None and ("details", imdb_id) in _response_cache
             det = fetch_movie_details(imdb_id)
             if det:
                 all_details.append(det)
                 global_seen_ids.add(imdb_id)
 
-            time.sleep(sleep_sec)
+            if not cached:
+                time.sleep(sleep_sec)
 
     if not all_details:
         logger.warning(f"Inga detaljerade poster alls för query={query}")
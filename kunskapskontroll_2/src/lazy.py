@@ -0,0 +1,38 @@
+"""
+Lata importer av tunga beroenden (pandas, numpy, SQLAlchemy, requests, pyarrow).
+
+    pd = lazy_import("pandas")
+
+registrerar modulen direkt men kör den först vid första attributåtkomsten
+(pd.DataFrame, ...). Att importera src-modulerna, eller köra main.py --help,
+kostar därför några millisekunder istället för nästan en sekund; beroendena
+laddas när de faktiskt används. Mät med: python -m benchmarks.bench_import
+"""
+
+from __future__ import annotations
+import importlib.util
+import sys
+import threading
+from types import ModuleType
+
+_LOCK = threading.Lock()
+
+
+def lazy_import(name: str) -> ModuleType:
+    """
+    Returnerar modulen `name`, laddad vid första användning.
+    Redan importerade moduler returneras som de är.
+    """
+    with _LOCK:
+        module = sys.modules.get(name)
+        if module is not None:
+            return module
+        spec = importlib.util.find_spec(name)
+        if spec is None:
+            raise ModuleNotFoundError(f"No module named {name!r}", name=name)
+        loader = importlib.util.LazyLoader(spec.loader)
+        spec.loader = loader
+        module = importlib.util.module_from_spec(spec)
+        sys.modules[name] = module
+        loader.exec_module(module)
+        return module
@@ -1,6 +1,11 @@
 from __future__ import annotations
+import atexit
+import json
 import logging
-from logging.handlers import RotatingFileHandler
+import os
+import queue
+import threading
+from logging.handlers import QueueHandler, QueueListener, RotatingFileHandler
 from pathlib import Path
 
 # Projektroot = mappen ovanför src/
@@ -13,12 +18,197 @@ LOG_PATH = LOG_DIR / LOG_FILE
 _logger: logging.Logger | None = None
 
 
+# --- Delad kod: identisk i kunskapskontroll_1/src/logger.py och kunskapskontroll_2/src/logger.py ---
+# Projekten är fristående och kan inte dela modul: ändra båda filerna
+# (tests/test_logger.py jämför blocken när båda projekten finns).
+
+# Kö-läge (LOG_QUEUE=1): loggningen lägger bara posten i en begränsad kö och
+# en bakgrundstråd (QueueListener) skriver till fil/console. När kön är full:
+# - DEBUG/INFO kastas (och räknas i dropped), så att API-hämtningen aldrig väntar
+# - WARNING och högre väntar högst LOG_QUEUE_BLOCK_SEC innan de också kastas
+LOG_QUEUE_SIZE = 10_000
+LOG_QUEUE_BLOCK_SEC = 1.0
+
+# Strukturerad loggning (LOG_FORMAT=json): en JSON-rad per post med fasta
+# fält (se LOG_FIELDS) som skickas via extra={...}. Meddelandet formateras
+# lat (logger.info("... %s", x)), dvs. först när posten faktiskt skrivs.
+LOG_FIELDS = ("event", "query", "page", "imdb_id", "rows", "latency_ms")
+
+# Sampling av högvolym-händelser: LOG_SAMPLE="omdb.page=10,omdb.details=100"
+# behåller var 10:e/100:e post med det event-namnet. WARNING och högre samplas aldrig.
+
+
+class JsonFormatter(logging.Formatter):
+    """Formaterar en post som en JSON-rad (ts, level, msg + LOG_FIELDS)."""
+
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            "ts": self.formatTime(record),
+            "level": record.levelname,
+            "msg": record.getMessage(),
+        }
+        for field in LOG_FIELDS:
+            value = getattr(record, field, None)
+            if value is not None:
+                entry[field] = value
+        if record.exc_info:
+            entry["exc"] = self.formatException(record.exc_info)
+        return json.dumps(entry, ensure_ascii=False, default=str)
+
+
+def parse_sample_rates(spec: str | None) -> dict[str, int]:
+    """'omdb.page=10,omdb.details=100' -> {"omdb.page": 10, "omdb.details": 100}"""
+    rates = {}
+    for part in (spec or "").split(","):
+        name, _, every = part.partition("=")
+        if name.strip() and every.strip().isdigit() and int(every) > 1:
+            rates[name.strip()] = int(every)
+    return rates
+
+
+class SamplingFilter(logging.Filter):
+    """
+    Släpper igenom var N:e post per event-namn (den första alltid).
+    Sitter på loggern, så bortsamplade poster formateras eller köas aldrig.
+    """
+
+    def __init__(self, rates: dict[str, int]):
+        super().__init__()
+        self.rates = rates
+        self.seen: dict[str, int] = {}
+        self._lock = threading.Lock()
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        event = getattr(record, "event", None)
+        every = self.rates.get(event)
+        if every is None or record.levelno >= logging.WARNING:
+            return True
+        with self._lock:
+            n = self.seen.get(event, 0)
+            self.seen[event] = n + 1
+        return n % every == 0
+
+
+def _make_formatter(log_format: str) -> logging.Formatter:
+    if log_format == "json":
+        return JsonFormatter()
+    return logging.Formatter("%(asctime)s [%(levelname)s] %(message)s")
+
+
+class BoundedQueueHandler(QueueHandler):
+    """QueueHandler med begränsad kö och uttalad policy när kön är full."""
+
+    def __init__(self, q: queue.Queue, block_sec: float = LOG_QUEUE_BLOCK_SEC):
+        super().__init__(q)
+        self.block_sec = block_sec
+        self.dropped = 0
+        self.listener: QueueListener | None = None
+
+    def enqueue(self, record: logging.LogRecord) -> None:
+        try:
+            if record.levelno >= logging.WARNING:
+                self.queue.put(record, timeout=self.block_sec)
+            else:
+                self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+    def close(self) -> None:
+        # Stoppa lyssnaren först: den tömmer kön och flushar fil-handlern
+        if self.listener is not None:
+            self.listener.stop()
+            if self.dropped:
+                note = logging.makeLogRecord({
+                    "name": "etl", "levelno": logging.WARNING, "levelname": "WARNING",
+                    "msg": f"{self.dropped} loggposter kastades (full loggkö).",
+                })
+                for h in self.listener.handlers:
+                    h.handle(note)
+            for h in self.listener.handlers:
+                h.close()
+            self.listener = None
+        super().close()
+
+
+def _close_handlers(logger: logging.Logger) -> None:
+    for h in list(logger.handlers):
+        logger.removeHandler(h)
+        try:
+            h.close()
+        except Exception:
+            pass
+
+
+def shutdown_logging() -> None:
+    """Tömmer loggkön (kö-läge) och stänger alla handlers. Körs även vid atexit."""
+    global _logger
+    _close_handlers(logging.getLogger("etl"))
+    _logger = None  # nästa get_logger() bygger om handlers
+
+
+atexit.register(shutdown_logging)
+
+
+def _attach_handlers(logger: logging.Logger, log_path: Path, log_format: str,
+                     sample_spec: str | None, use_queue: bool) -> None:
+    """
+    Stänger loggarens gamla handlers och kopplar på nya: roterande fil +
+    console, direkt eller bakom en BoundedQueueHandler (kö-läge), samt
+    ev. SamplingFilter.
+    """
+    _close_handlers(logger)
+    fmt = _make_formatter(log_format)
+
+    # Sampling på loggern: gäller alla handlers och sker före formatering/kö
+    for f in [f for f in logger.filters if isinstance(f, SamplingFilter)]:
+        logger.removeFilter(f)
+    rates = parse_sample_rates(sample_spec)
+    if rates:
+        logger.addFilter(SamplingFilter(rates))
+
+    fh = RotatingFileHandler(
+        filename=str(log_path),
+        maxBytes=1_000_000,
+        backupCount=3,
+        encoding="utf-8",
+    )
+    fh.setFormatter(fmt)
+
+    sh = logging.StreamHandler()
+    sh.setFormatter(fmt)
+
+    if use_queue:
+        qh = BoundedQueueHandler(queue.Queue(maxsize=LOG_QUEUE_SIZE))
+        qh.listener = QueueListener(qh.queue, fh, sh, respect_handler_level=True)
+        qh.listener.start()
+        logger.addHandler(qh)
+    else:
+        logger.addHandler(fh)
+        logger.addHandler(sh)
+
+
+# --- Slut på delad kod ---
+
+
+class LazyLogger:
+    """
+    Ställföreträdare för get_logger() som modulerna kan skapa vid import:
+    loggmappen, loggfilen och handlers skapas först vid första loggningen.
+    Efter shutdown_logging() konfigureras loggern om vid nästa anrop.
+    """
+
+    def __getattr__(self, name: str):
+        return getattr(get_logger(), name)
+
+
 def get_logger() -> logging.Logger:
     """
     Central logger för hela pipelinen (ETL + analys).
     - Skriver till både fil (roterande) och console.
     - Lägger inte till dubbla handlers.
     - Låser loggfilens plats till projektets egen data/logs/.
+    - LOG_QUEUE=1: fil-/console-skrivningen sker i en bakgrundstråd (se ovan).
+    - LOG_FORMAT=json / LOG_SAMPLE: strukturerade JSON-rader och sampling (se ovan).
     """
     global _logger
 
@@ -31,29 +221,14 @@ def get_logger() -> logging.Logger:
     logger.setLevel(logging.INFO)
     logger.propagate = False
 
-    # Rensa ev. gamla handlers (vid reload i pytest etc.)
-    if logger.handlers:
-        for h in list(logger.handlers):
-            logger.removeHandler(h)
-            try:
-                h.close()
-            except Exception:
-                pass
-
-    fmt = logging.Formatter("%(asctime)s [%(levelname)s] %(message)s")
-
-    fh = RotatingFileHandler(
-        filename=str(LOG_PATH),
-        maxBytes=1_000_000,
-        backupCount=3,
-        encoding="utf-8",
+    # Rensa ev. gamla handlers (vid reload i pytest etc.) och koppla på nya
+    _attach_handlers(
+        logger,
+        LOG_PATH,
+        os.getenv("LOG_FORMAT", "text"),
+        os.getenv("LOG_SAMPLE"),
+        os.getenv("LOG_QUEUE", "0") == "1",
     )
-    fh.setFormatter(fmt)
-    logger.addHandler(fh)
-
-    sh = logging.StreamHandler()
-    sh.setFormatter(fmt)
-    logger.addHandler(sh)
 
     _logger = logger
     return logger
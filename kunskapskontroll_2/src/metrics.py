@@ -0,0 +1,209 @@
+"""
+Mätvärden per körning: var tog tiden vägen?
+
+Ett enkelt register (MetricsRegistry) med:
+- stage(namn): väggtid och CPU-tid per pipeline-steg (extract, transform, ...)
+- inc(namn, värde, **etiketter): räknare, t.ex. API-anrop per endpoint
+- set(namn, värde, **etiketter): mätare, t.ex. rader kvar efter varje filter
+- observe(namn, värde, **etiketter): histogram, t.ex. HTTP-svarstid.
+  Percentilerna räknas med en QuantileSketch (konstant minne).
+
+Modulerna rapporterar till get_metrics(). main.py nollställer registret i
+början av varje körning och skriver till sist en JSON-rapport
+(data/metrics/run_report.json) och, om METRICS_TEXTFILE är satt, en
+Prometheus-textfil (för node_exporters textfile collector).
+"""
+
+from __future__ import annotations
+import json
+import os
+import threading
+import time
+from contextlib import contextmanager
+from datetime import datetime
+from pathlib import Path
+from typing import Iterator
+
+from .sketches import QuantileSketch
+
+BASE_DIR = Path(__file__).resolve().parents[1]
+METRICS_DIR = BASE_DIR / "data" / "metrics"
+RUN_REPORT_PATH = METRICS_DIR / "run_report.json"
+PROMETHEUS_PREFIX = "etl"
+REPORT_QUANTILES = {"p50": 0.5, "p90": 0.9, "p99": 0.99}
+
+
+def _key(name: str, labels: dict) -> tuple:
+    return name, tuple(sorted((k, str(v)) for k, v in labels.items()))
+
+
+class _Histogram:
+    # Värden buffras och läggs in i sketchen i omgångar (update per värde vore onödigt dyrt)
+    _BATCH = 1_000
+
+    def __init__(self):
+        self.count = 0
+        self.total = 0.0
+        self.max = float("-inf")
+        self._sketch = QuantileSketch()
+        self._pending: list[float] = []
+
+    def observe(self, value: float) -> None:
+        self.count += 1
+        self.total += value
+        self.max = max(self.max, value)
+        self._pending.append(value)
+        if len(self._pending) >= self._BATCH:
+            self._flush()
+
+    def _flush(self) -> None:
+        if self._pending:
+            self._sketch.update(self._pending)
+            self._pending = []
+
+    def quantiles(self) -> list[float]:
+        self._flush()
+        return self._sketch.quantiles(REPORT_QUANTILES.values())
+
+    def summary(self) -> dict:
+        out = {"count": self.count, "sum": round(self.total, 6), "max": self.max}
+        out.update(zip(REPORT_QUANTILES, self.quantiles()))
+        return out
+
+
+class MetricsRegistry:
+    """Räknare, mätare, histogram och stegtider för en körning (trådsäker)."""
+
+    def __init__(self):
+        self.started_at = datetime.utcnow().isoformat(timespec="seconds")
+        self.stages: dict[str, dict] = {}
+        self.counters: dict[tuple, float] = {}
+        self.gauges: dict[tuple, float] = {}
+        self.histograms: dict[tuple, _Histogram] = {}
+        self._lock = threading.Lock()
+
+    def inc(self, name: str, value: float = 1, **labels) -> None:
+        key = _key(name, labels)
+        with self._lock:
+            self.counters[key] = self.counters.get(key, 0) + value
+
+    def set(self, name: str, value: float, **labels) -> None:
+        with self._lock:
+            self.gauges[_key(name, labels)] = value
+
+    def observe(self, name: str, value: float, **labels) -> None:
+        key = _key(name, labels)
+        with self._lock:
+            self.histograms.setdefault(key, _Histogram()).observe(value)
+
+    def counter(self, name: str, **labels) -> float:
+        return self.counters.get(_key(name, labels), 0)
+
+    @contextmanager
+    def stage(self, name: str) -> Iterator[None]:
+        """Mäter väggtid och CPU-tid (processens) för ett steg; summeras om steget körs flera gånger."""
+        wall0, cpu0 = time.perf_counter(), time.process_time()
+        try:
+            yield
+        finally:
+            wall, cpu = time.perf_counter() - wall0, time.process_time() - cpu0
+            with self._lock:
+                st = self.stages.setdefault(name, {"wall_sec": 0.0, "cpu_sec": 0.0})
+                st["wall_sec"] = round(st["wall_sec"] + wall, 6)
+                st["cpu_sec"] = round(st["cpu_sec"] + cpu, 6)
+
+    def _derived(self) -> dict:
+        derived = {}
+        hits = self.counter("transform_cache_total", result="hit")
+        misses = self.counter("transform_cache_total", result="miss")
+        if hits + misses:
+            derived["transform_cache_hit_rate"] = hits / (hits + misses)
+        written = sum(v for (name, _), v in self.counters.items() if name == "db_rows_written_total")
+        load_sec = self.stages.get("load", {}).get("wall_sec")
+        if written and load_sec:
+            derived["db_rows_per_sec"] = round(written / load_sec, 1)
+        return derived
+
+    def report(self, **extra) -> dict:
+        """Hela körningen som en dict (grunden för JSON-rapporten)."""
+        def rows(items, value):
+            return [{"name": n, "labels": dict(l), **value(v)} for (n, l), v in sorted(items.items())]
+
+        return {
+            "started_at": self.started_at,
+            "finished_at": datetime.utcnow().isoformat(timespec="seconds"),
+            **extra,
+            "stages": self.stages,
+            "counters": rows(self.counters, lambda v: {"value": v}),
+            "gauges": rows(self.gauges, lambda v: {"value": v}),
+            "histograms": rows(self.histograms, lambda h: h.summary()),
+            "derived": self._derived(),
+        }
+
+    def to_prometheus(self) -> str:
+        """Prometheus text exposition format (räknare, mätare, summaries, stegtider)."""
+        def fmt(name: str, labels, value) -> str:
+            lbl = ",".join(f'{k}="{v}"' for k, v in labels)
+            return f"{PROMETHEUS_PREFIX}_{name}{{{lbl}}} {value}" if lbl else f"{PROMETHEUS_PREFIX}_{name} {value}"
+
+        lines = []
+        for metric in ("wall_sec", "cpu_sec"):
+            name = f"stage_{metric.replace('_sec', '_seconds')}"
+            lines.append(f"# TYPE {PROMETHEUS_PREFIX}_{name} gauge")
+            lines += [fmt(name, [("stage", s)], v[metric]) for s, v in sorted(self.stages.items())]
+
+        for kind, items in (("counter", self.counters), ("gauge", self.gauges)):
+            for name in sorted({n for n, _ in items}):
+                lines.append(f"# TYPE {PROMETHEUS_PREFIX}_{name} {kind}")
+                lines += [fmt(n, l, v) for (n, l), v in sorted(items.items()) if n == name]
+
+        for name in sorted({n for n, _ in self.histograms}):
+            lines.append(f"# TYPE {PROMETHEUS_PREFIX}_{name} summary")
+            for (n, l), h in sorted(self.histograms.items()):
+                if n != name:
+                    continue
+                for q, value in zip(REPORT_QUANTILES.values(), h.quantiles()):
+                    lines.append(fmt(name, [*l, ("quantile", q)], value))
+                lines.append(fmt(f"{name}_sum", l, h.total))
+                lines.append(fmt(f"{name}_count", l, h.count))
+        return "\n".join(lines) + "\n"
+
+
+_registry = MetricsRegistry()
+
+
+def get_metrics() -> MetricsRegistry:
+    """Registret för den pågående körningen."""
+    return _registry
+
+
+def reset_metrics() -> MetricsRegistry:
+    """Startar ett nytt, tomt register (anropas i början av varje körning)."""
+    global _registry
+    _registry = MetricsRegistry()
+    return _registry
+
+
+def _write_atomic(path: Path, content: str) -> None:
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp = path.with_name(f".{path.name}.tmp")
+    tmp.write_text(content, encoding="utf-8")
+    os.replace(tmp, path)
+
+
+def write_run_report(
+    registry: MetricsRegistry | None = None,
+    path: Path | None = None,
+    textfile: str | Path | None = None,
+    **extra,
+) -> dict:
+    """
+    Skriver körningens JSON-rapport (standard: data/metrics/run_report.json)
+    och, om textfile anges, en Prometheus-textfil. Returnerar rapporten.
+    """
+    registry = registry or get_metrics()
+    report = registry.report(**extra)
+    _write_atomic(Path(path) if path is not None else RUN_REPORT_PATH, json.dumps(report, indent=2, default=str))
+    if textfile:
+        _write_atomic(Path(textfile), registry.to_prometheus())
+    return report
@@ -0,0 +1,328 @@
+"""
+Lokalt läs-API för movies och sammanställningarna (Power BI, notebooks, ...).
+
+    python -m src.read_api                       # http://127.0.0.1:8766
+    python -m src.read_api --port 9000 --db sqlite:///data/etl.db
+
+Endpoints (JSON):
+    GET /movies?year_min=2020&year_max=2024&type=movie&genre=Action&columns=title,year&limit=100&offset=0
+        filtrerad sida av movies (sorterad på imdb_id), plus total = antal träffar
+    GET /summaries/genre    genomsnittligt betyg och antal per primärgenre
+    GET /summaries/year     antal filmer per år
+    GET /health             cachens version, antal rader, omladdningar
+
+Hela movies (utom row_hash) och sammanställningarna hålls i minnet som
+kolumner (pandas, kategorier för typ/genre). Cachen gäller så länge
+load-stegets tabellversion (table_versions i load.py) är oförändrad; den
+kontrolleras högst var VERSION_CHECK_SEC sekund med en enda radläsning,
+så upprepade läsningar går aldrig mot databasfilen.
+
+Varje svar har en ETag (tabellversion + fråga). Klienter som skickar
+If-None-Match får 304 utan kropp så länge datan inte laddats om.
+"""
+
+from __future__ import annotations
+import argparse
+import hashlib
+import json
+import threading
+import time
+from dataclasses import dataclass
+from datetime import datetime
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import TYPE_CHECKING, Callable
+from urllib.parse import parse_qs, urlsplit
+
+from .lazy import lazy_import
+from .logger import LazyLogger
+from .load import get_engine, table_version
+from .analyze import MOVIES_COLUMNS, read_materialized_summaries
+
+if TYPE_CHECKING:
+    from sqlalchemy.engine import Engine
+
+np = lazy_import("numpy")
+pd = lazy_import("pandas")
+sa = lazy_import("sqlalchemy")
+
+logger = LazyLogger()
+
+READ_API_HOST = "127.0.0.1"
+READ_API_PORT = 8766
+VERSION_CHECK_SEC = 1.0
+DEFAULT_PAGE_SIZE = 100
+MAX_PAGE_SIZE = 1000
+
+# Kolumnerna som serveras (row_hash är laddningens interna ändringsdetektering)
+API_COLUMNS = tuple(c for c in MOVIES_COLUMNS if c != "row_hash")
+_CATEGORY_COLUMNS = ("type", "genre_primary")
+_INT_COLUMNS = ("year", "runtime_min", "imdb_votes")
+_MOVIE_PARAMS = {"year_min", "year_max", "type", "genre", "columns", "limit", "offset"}
+
+
+class QueryError(ValueError):
+    pass
+
+
+@dataclass(frozen=True)
+class Snapshot:
+    """En laddad version av movies + sammanställningarna (ändras aldrig efter laddning)."""
+
+    version: int
+    movies: pd.DataFrame
+    genre_json: str
+    year_json: str
+    loaded_at: str
+
+
+class MovieCache:
+    """
+    Minnescache för movies och sammanställningarna, nycklad på tabellversionen.
+    snapshot() är trådsäker; läsare får en oföränderlig Snapshot.
+    """
+
+    def __init__(
+        self,
+        engine: Engine | None = None,
+        check_interval_sec: float = VERSION_CHECK_SEC,
+        clock: Callable[[], float] = time.monotonic,
+    ):
+        self.engine = engine or get_engine()
+        self.check_interval_sec = check_interval_sec
+        self.clock = clock
+        self.reloads = 0
+        self.version_checks = 0
+        self._snapshot: Snapshot | None = None
+        self._checked_at = float("-inf")
+        self._lock = threading.Lock()
+
+    def snapshot(self) -> Snapshot:
+        """Aktuell snapshot; laddas om bara när tabellversionen ändrats."""
+        now = self.clock()
+        snap = self._snapshot
+        if snap is not None and now - self._checked_at < self.check_interval_sec:
+            return snap
+
+        with self._lock:
+            if self._snapshot is not None and now - self._checked_at < self.check_interval_sec:
+                return self._snapshot  # en annan tråd hann kontrollera
+            self.version_checks += 1
+            version = table_version(self.engine)
+            if self._snapshot is None or self._snapshot.version != version:
+                self._snapshot = self._load(version)
+                self.reloads += 1
+            self._checked_at = now
+            return self._snapshot
+
+    def _load(self, version: int) -> Snapshot:
+        """
+        Läser movies och sammanställningarna. Ändras versionen under läsningen
+        (en laddning hann emellan) läses allt om, så att snapshoten är konsekvent.
+        """
+        while True:
+            try:
+                movies = pd.read_sql_query(
+                    sa.text(f"SELECT {', '.join(API_COLUMNS)} FROM movies ORDER BY imdb_id"), self.engine
+                )
+                gsum, ysum = read_materialized_summaries(self.engine)
+            except sa.exc.OperationalError as e:  # ingen laddning gjord ännu
+                logger.warning(f"Inga tabeller att läsa ännu ({e}); serverar tomt resultat.")
+                movies = pd.DataFrame(columns=list(API_COLUMNS))
+                gsum = ysum = pd.DataFrame()
+            latest = table_version(self.engine)
+            if latest == version:
+                break
+            version = latest
+
+        for col in _CATEGORY_COLUMNS:
+            movies[col] = movies[col].astype("category")
+        # NULL gör heltalskolumnerna till float i SQL-läsningen -> 2021, inte 2021.0, i JSON
+        for col in _INT_COLUMNS:
+            movies[col] = movies[col].astype("Int64")
+        if "year" in ysum:
+            ysum["year"] = ysum["year"].astype("Int64")
+        logger.info(f"Läs-API: laddade version {version} ({len(movies)} rader) till minnet.")
+        return Snapshot(
+            version=version,
+            movies=movies,
+            genre_json=gsum.to_json(orient="records"),
+            year_json=ysum.to_json(orient="records"),
+            loaded_at=datetime.now().isoformat(timespec="seconds"),
+        )
+
+
+def _single_int(params: dict[str, list[str]], name: str, default: int | None = None) -> int | None:
+    values = params.get(name)
+    if not values:
+        return default
+    try:
+        return int(values[-1])
+    except ValueError:
+        raise QueryError(f"{name} måste vara ett heltal") from None
+
+
+def _multi(params: dict[str, list[str]], name: str) -> list[str] | None:
+    """type=movie&type=series eller type=movie,series."""
+    values = [v for raw in params.get(name, []) for v in raw.split(",") if v]
+    return values or None
+
+
+def query_movies(snap: Snapshot, params: dict[str, list[str]]) -> str:
+    """Filtrerar och paginerar movies ur snapshoten; returnerar JSON-kroppen."""
+    unknown = set(params) - _MOVIE_PARAMS
+    if unknown:
+        raise QueryError(f"Okända parametrar: {sorted(unknown)}")
+
+    columns = _multi(params, "columns") or list(API_COLUMNS)
+    bad = [c for c in columns if c not in API_COLUMNS]
+    if bad:
+        raise QueryError(f"Okända kolumner: {bad}")
+    limit = _single_int(params, "limit", DEFAULT_PAGE_SIZE)
+    offset = _single_int(params, "offset", 0)
+    if not (0 < limit <= MAX_PAGE_SIZE) or offset < 0:
+        raise QueryError(f"limit ska vara 1-{MAX_PAGE_SIZE} och offset >= 0")
+
+    df = snap.movies
+    mask = np.ones(len(df), dtype=bool)
+    year_min, year_max = _single_int(params, "year_min"), _single_int(params, "year_max")
+    if year_min is not None:
+        mask &= (df["year"] >= year_min).to_numpy(dtype=bool, na_value=False)
+    if year_max is not None:
+        mask &= (df["year"] <= year_max).to_numpy(dtype=bool, na_value=False)
+    for param, col in (("type", "type"), ("genre", "genre_primary")):
+        values = _multi(params, param)
+        if values is not None:
+            mask &= df[col].isin(values).to_numpy()
+
+    hits = np.flatnonzero(mask)
+    page = df.iloc[hits[offset:offset + limit]][columns]
+    rows = page.to_json(orient="records", force_ascii=False)
+    return (
+        f'{{"version": {snap.version}, "total": {len(hits)}, '
+        f'"offset": {offset}, "limit": {limit}, "rows": {rows}}}'
+    )
+
+
+def etag_for(version: int, path: str, params: dict[str, list[str]]) -> str:
+    """ETag = tabellversion + normaliserad fråga (parameterordningen spelar ingen roll)."""
+    canonical = json.dumps([path, sorted((k, v) for k, v in params.items())])
+    return f'"{version}-{hashlib.sha1(canonical.encode("utf-8")).hexdigest()[:16]}"'
+
+
+def _etag_matches(header: str | None, etag: str) -> bool:
+    if not header:
+        return False
+    tags = [t.strip() for t in header.split(",")]
+    return "*" in tags or any(t.removeprefix("W/") == etag for t in tags)
+
+
+class ReadApi:
+    """HTTP-servern runt en MovieCache (ThreadingHTTPServer, en tråd per anslutning)."""
+
+    def __init__(self, cache: MovieCache, host: str = READ_API_HOST, port: int = READ_API_PORT):
+        self.cache = cache
+        self.host = host
+        self.port = port
+        self.requests_total = 0
+        self.not_modified_total = 0
+        self._lock = threading.Lock()
+        self._http: ThreadingHTTPServer | None = None
+
+    def handle(self, path: str, query: str, if_none_match: str | None) -> tuple[int, str, dict[str, str]]:
+        """(status, kropp, extra headers) för en GET-förfrågan."""
+        with self._lock:
+            self.requests_total += 1
+        params = parse_qs(query, keep_blank_values=False)
+
+        if path == "/health":
+            snap = self.cache.snapshot()
+            return 200, json.dumps({
+                "status": "ok",
+                "version": snap.version,
+                "rows": len(snap.movies),
+                "loaded_at": snap.loaded_at,
+                "reloads": self.cache.reloads,
+                "version_checks": self.cache.version_checks,
+                "requests_total": self.requests_total,
+                "not_modified_total": self.not_modified_total,
+            }), {}
+        if path not in ("/movies", "/summaries/genre", "/summaries/year"):
+            return 404, json.dumps({"error": "not found"}), {}
+
+        snap = self.cache.snapshot()
+        etag = etag_for(snap.version, path, params)
+        headers = {"ETag": etag, "Cache-Control": "no-cache"}
+        if _etag_matches(if_none_match, etag):
+            with self._lock:
+                self.not_modified_total += 1
+            return 304, "", headers
+
+        if path == "/summaries/genre":
+            return 200, snap.genre_json, headers
+        if path == "/summaries/year":
+            return 200, snap.year_json, headers
+        try:
+            return 200, query_movies(snap, params), headers
+        except QueryError as e:
+            return 400, json.dumps({"error": str(e)}, ensure_ascii=False), {}
+
+    def start(self) -> None:
+        """Startar servern i en bakgrundstråd (port 0 -> ledig port)."""
+        self._http = ThreadingHTTPServer((self.host, self.port), _make_handler(self))
+        self.port = self._http.server_address[1]
+        threading.Thread(target=self._http.serve_forever, name="read-api", daemon=True).start()
+        logger.info(f"Läs-API på http://{self.host}:{self.port}/movies")
+
+    def stop(self) -> None:
+        if self._http is not None:
+            self._http.shutdown()
+            self._http.server_close()
+            self._http = None
+
+
+def _make_handler(api: ReadApi) -> type[BaseHTTPRequestHandler]:
+    class Handler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            url = urlsplit(self.path)
+            status, body, headers = api.handle(url.path, url.query, self.headers.get("If-None-Match"))
+            data = body.encode("utf-8")
+            self.send_response(status)
+            if status != 304:
+                self.send_header("Content-Type", "application/json; charset=utf-8")
+                self.send_header("Content-Length", str(len(data)))
+            for name, value in headers.items():
+                self.send_header(name, value)
+            self.end_headers()
+            if status != 304:
+                self.wfile.write(data)
+
+        def log_message(self, format, *args):  # tyst: en rad per dashboard-anrop är för mycket
+            pass
+
+    return Handler
+
+
+def main(argv: list[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(description="Lokalt läs-API för movies och sammanställningarna.")
+    parser.add_argument("--db", help="Databas-URL (standard: projektets etl.db)")
+    parser.add_argument("--host", default=READ_API_HOST)
+    parser.add_argument("--port", type=int, default=READ_API_PORT)
+    parser.add_argument("--check-interval", type=float, default=VERSION_CHECK_SEC, metavar="SEK",
+                        help=f"hur ofta tabellversionen kontrolleras (standard {VERSION_CHECK_SEC:g})")
+    args = parser.parse_args(argv)
+
+    cache = MovieCache(get_engine(args.db), check_interval_sec=args.check_interval)
+    cache.snapshot()  # ladda direkt, inte vid första anropet
+    api = ReadApi(cache, host=args.host, port=args.port)
+    api.start()
+    try:
+        threading.Event().wait()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        api.stop()
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,212 @@
+"""
+Körhistorik för prestandaregressioner.
+
+Varje körning av main.py lägger till en rad i tabellen etl_runs (i etl.db)
+med start/slut, tid per steg, antal API-anrop, laddade rader och
+körningens toppminne (RunMemory), plus hela körningsrapporten som JSON (se metrics.py).
+
+Jämför senaste körningen mot medianen av de föregående:
+    python -m src.run_history                # senaste 5 lyckade körningar som baslinje
+    python -m src.run_history --window 10 --threshold 0.3
+Exit-kod 1 om något steg blivit långsammare (kan användas i CI/schemaläggning).
+"""
+
+from __future__ import annotations
+import argparse
+import json
+import os
+import sys
+import threading
+
+from typing import TYPE_CHECKING
+
+from .lazy import lazy_import
+from .load import get_engine
+
+if TYPE_CHECKING:
+    from sqlalchemy.engine import Engine
+
+pd = lazy_import("pandas")
+sa = lazy_import("sqlalchemy")
+
+try:  # finns inte på Windows
+    import resource
+except ImportError:  # pragma: no cover
+    resource = None
+
+RUN_STAGES = ("extract", "transform", "load", "analyze")
+BASELINE_WINDOW = 5
+SLOWER_THRESHOLD = 0.2   # 20 % långsammare än baslinjen ...
+MIN_DELTA_SEC = 0.5      # ... och minst en halv sekund (brus i korta steg ignoreras)
+
+ETL_RUNS_SQL = f"""
+CREATE TABLE IF NOT EXISTS etl_runs (
+  run_id INTEGER PRIMARY KEY AUTOINCREMENT,
+  started_at TEXT NOT NULL,
+  finished_at TEXT NOT NULL,
+  status TEXT NOT NULL,
+  {", ".join(f"{s}_sec REAL" for s in RUN_STAGES)},
+  api_calls INTEGER,
+  rows_loaded INTEGER,
+  peak_memory_bytes INTEGER,
+  report TEXT
+)
+"""
+
+
+RSS_SAMPLE_INTERVAL_SEC = 0.1
+
+
+def _max_rss_bytes() -> int | None:
+    """Processens högsta RSS hittills (None där resource-modulen saknas)."""
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux rapporterar kB, macOS bytes
+    return peak if sys.platform == "darwin" else peak * 1024
+
+
+def current_rss_bytes() -> int | None:
+    """Processens nuvarande RSS (Linux: /proc/self/statm, annars None)."""
+    try:
+        with open("/proc/self/statm", encoding="ascii") as f:
+            pages = int(f.read().split()[1])
+    except (OSError, ValueError, IndexError):
+        return None
+    return pages * os.sysconf("SC_PAGE_SIZE")
+
+
+class RunMemory(threading.Thread):
+    """
+    Toppminnet (RSS) för EN körning. ru_maxrss gäller hela processens livstid,
+    så i --serve-läget skulle varje körning efter den största annars få samma
+    gamla topp. Därför:
+    - Steg ru_maxrss under körningen satte körningen en ny processtopp -> exakt värde.
+    - Annars: högsta RSS som samplades under körningen (var interval_sec).
+    """
+
+    def __init__(self, interval_sec: float = RSS_SAMPLE_INTERVAL_SEC):
+        super().__init__(name="rss-sampler", daemon=True)
+        self.interval_sec = interval_sec
+        self.max_rss_at_start = _max_rss_bytes()
+        self.sampled_peak: int | None = None
+        self._done = threading.Event()
+        self._sample()
+
+    def _sample(self) -> None:
+        rss = current_rss_bytes()
+        if rss is not None and (self.sampled_peak is None or rss > self.sampled_peak):
+            self.sampled_peak = rss
+
+    def run(self) -> None:
+        while not self._done.wait(self.interval_sec):
+            self._sample()
+
+    def stop(self) -> int | None:
+        """Stoppar samplingen och returnerar körningens toppminne i bytes (eller None)."""
+        self._done.set()
+        if self.is_alive():
+            self.join()
+        self._sample()
+        max_rss = _max_rss_bytes()
+        if max_rss is not None and self.max_rss_at_start is not None and max_rss > self.max_rss_at_start:
+            return max_rss
+        return self.sampled_peak
+
+
+def _counter_total(report: dict, name: str) -> int:
+    return int(sum(c["value"] for c in report.get("counters", []) if c["name"] == name))
+
+
+def record_run(engine: Engine, report: dict, peak_memory: int | None = None) -> int:
+    """Sparar en körningsrapport (från write_run_report) i etl_runs. Returnerar run_id."""
+    stages = report.get("stages", {})
+    row = {
+        "started_at": report["started_at"],
+        "finished_at": report["finished_at"],
+        "status": report.get("status", "unknown"),
+        **{f"{s}_sec": stages.get(s, {}).get("wall_sec") for s in RUN_STAGES},
+        "api_calls": _counter_total(report, "omdb_api_calls_total"),
+        "rows_loaded": _counter_total(report, "db_rows_written_total"),
+        "peak_memory_bytes": peak_memory,
+        "report": json.dumps(report, default=str),
+    }
+    cols = list(row)
+    with engine.begin() as conn:
+        conn.execute(sa.text(ETL_RUNS_SQL))
+        result = conn.execute(
+            sa.text(f"INSERT INTO etl_runs ({', '.join(cols)}) VALUES ({', '.join(':' + c for c in cols)})"),
+            row,
+        )
+        return result.lastrowid
+
+
+def compare_latest(
+    engine: Engine,
+    window: int = BASELINE_WINDOW,
+    threshold: float = SLOWER_THRESHOLD,
+    min_delta_sec: float = MIN_DELTA_SEC,
+) -> pd.DataFrame:
+    """
+    Jämför senaste lyckade körningen med medianen av de `window` lyckade
+    körningarna innan. En rad per steg (+ total, API-anrop, rader, minne)
+    med kolumnerna latest, baseline, change (andel) och slower (bool).
+    """
+    runs = pd.read_sql_query(
+        sa.text("SELECT * FROM etl_runs WHERE status = 'ok' ORDER BY run_id DESC LIMIT :n"),
+        engine,
+        params={"n": window + 1},
+    )
+    if runs.empty:
+        return pd.DataFrame()
+
+    runs["total_sec"] = runs[[f"{s}_sec" for s in RUN_STAGES]].sum(axis=1, min_count=1)
+    latest, history = runs.iloc[0], runs.iloc[1:]
+
+    rows = []
+    for metric in [*(f"{s}_sec" for s in RUN_STAGES), "total_sec", "api_calls", "rows_loaded", "peak_memory_bytes"]:
+        known = pd.to_numeric(history[metric], errors="coerce").dropna()
+        value = latest[metric]
+        if known.empty and pd.isna(value):
+            continue  # mätvärdet finns inte i någon körning (t.ex. ett steg som aldrig körts)
+        baseline = known.median() if not known.empty else float("nan")
+        change = (value - baseline) / baseline if pd.notna(baseline) and baseline else float("nan")
+        slower = (
+            metric.endswith("_sec")
+            and pd.notna(change)
+            and change > threshold
+            and value - baseline >= min_delta_sec
+        )
+        rows.append({"metric": metric, "latest": value, "baseline": baseline, "change": change, "slower": bool(slower)})
+
+    return pd.DataFrame(rows)
+
+
+def main(argv: list[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(description="Jämför senaste ETL-körningen mot baslinjen.")
+    parser.add_argument("--db", help="Databas-URL (standard: projektets etl.db)")
+    parser.add_argument("--window", type=int, default=BASELINE_WINDOW, help="antal tidigare körningar i baslinjen")
+    parser.add_argument("--threshold", type=float, default=SLOWER_THRESHOLD, help="andel långsammare som flaggas")
+    args = parser.parse_args(argv)
+
+    engine = get_engine(args.db)
+    try:
+        result = compare_latest(engine, window=args.window, threshold=args.threshold)
+    except sa.exc.OperationalError as e:  # etl_runs finns inte ännu
+        print(f"Ingen körhistorik att jämföra ({e}).")
+        return 0
+    if result.empty:
+        print("Ingen lyckad körning i etl_runs ännu.")
+        return 0
+
+    print(result.to_string(index=False, float_format=lambda v: f"{v:.3f}"))
+    slower = result.loc[result["slower"], "metric"].tolist()
+    if slower:
+        print(f"\nLångsammare än baslinjen: {', '.join(slower)}")
+        return 1
+    print("\nInga steg långsammare än baslinjen.")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,346 @@
+"""
+Tjänsteläge: kör pipelinen enligt schema i en långlivad process.
+
+    python main.py --serve --interval 3600          # en gång i timmen
+    python main.py --serve --cron "0 */6 * * *"     # var 6:e timme, på hela timmen
+
+Processen ligger kvar mellan körningarna, så importer, databas-engine,
+HTTP-session och svarscachen (se extract.enable_warm_state) är varma.
+
+- Överlappande triggers slås ihop: kommer en schemalagd eller manuell trigger
+  medan en körning pågår blir det högst EN extra körning efteråt
+  (coalesced_total räknar de sammanslagna).
+- Ett litet HTTP-gränssnitt (bara 127.0.0.1 som standard):
+    GET  /health    status, senaste körningen (tider, exit-kod, stegtider), nästa körning
+    GET  /metrics   Prometheus-text: tjänstens räknare + senaste körningens mätvärden
+    POST /trigger   begär en körning nu (202; "coalesced" om en redan väntar)
+- SIGINT/SIGTERM: pågående körning får bli klar, sedan avslutas tjänsten.
+"""
+
+from __future__ import annotations
+import json
+import signal
+import threading
+import time
+from datetime import datetime, timedelta
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Callable
+
+from .logger import LazyLogger
+from .metrics import PROMETHEUS_PREFIX, get_metrics
+
+logger = LazyLogger()
+
+SERVICE_INTERVAL_SEC = 3600.0
+HEALTH_HOST = "127.0.0.1"
+HEALTH_PORT = 8765
+
+_CRON_FIELDS = (("minute", 0, 59), ("hour", 0, 23), ("day", 1, 31), ("month", 1, 12), ("weekday", 0, 7))
+
+
+class ScheduleError(ValueError):
+    pass
+
+
+class IntervalSchedule:
+    """Fast intervall i sekunder."""
+
+    def __init__(self, seconds: float):
+        if seconds <= 0:
+            raise ScheduleError("Intervallet måste vara större än 0 sekunder.")
+        self.seconds = seconds
+
+    def next_after(self, when: datetime) -> datetime:
+        return when + timedelta(seconds=self.seconds)
+
+    def __str__(self) -> str:
+        return f"var {self.seconds:g} s"
+
+
+def _parse_cron_field(spec: str, low: int, high: int) -> frozenset[int]:
+    values: set[int] = set()
+    for part in spec.split(","):
+        rng, _, step = part.partition("/")
+        try:
+            if rng == "*":
+                start, end = low, high
+            elif "-" in rng:
+                start, end = (int(x) for x in rng.split("-", 1))
+            else:
+                start = end = int(rng)
+            stride = int(step) if step else 1
+        except ValueError:
+            raise ScheduleError(f"Ogiltigt cron-fält '{spec}' (förväntade tal, *, a-b eller /steg).") from None
+        if step and rng != "*" and "-" not in rng:
+            end = high  # "5/15" = 5, 20, 35, 50
+        if not (low <= start <= end <= high):
+            raise ScheduleError(f"Ogiltigt cron-fält '{spec}' (tillåtet {low}-{high}).")
+        if stride <= 0:
+            raise ScheduleError(f"Ogiltigt steg i cron-fältet '{spec}' (måste vara > 0).")
+        values.update(range(start, end + 1, stride))
+    return frozenset(values)
+
+
+class CronSchedule:
+    """
+    Cron-uttryck med fem fält: minut timme dag månad veckodag (0/7 = söndag).
+    Stöder *, listor (1,15), intervall (1-5) och steg (*/10, 8-18/2).
+    Som i cron räcker det att dag ELLER veckodag matchar om båda är angivna.
+    """
+
+    def __init__(self, expr: str):
+        fields = expr.split()
+        if len(fields) != 5:
+            raise ScheduleError(f"Cron-uttrycket '{expr}' ska ha fem fält.")
+        self.expr = expr
+        parsed = [_parse_cron_field(spec, low, high) for spec, (_, low, high) in zip(fields, _CRON_FIELDS)]
+        self.minutes, self.hours, self.days, self.months, weekdays = parsed
+        self.weekdays = frozenset(d % 7 for d in weekdays)  # 7 = söndag = 0
+        self._any_day = fields[2] == "*"
+        self._any_weekday = fields[4] == "*"
+        # Ett schema som aldrig matchar (t.ex. 31 februari) ska stoppas här, inte när tjänsten redan startat
+        self.next_after(datetime.now())
+
+    def _day_matches(self, day: datetime) -> bool:
+        if day.month not in self.months:
+            return False
+        dom = day.day in self.days
+        dow = (day.weekday() + 1) % 7 in self.weekdays  # Python: måndag=0, cron: söndag=0
+        if self._any_day or self._any_weekday:
+            return dom and dow
+        return dom or dow
+
+    def next_after(self, when: datetime) -> datetime:
+        start = when.replace(second=0, microsecond=0) + timedelta(minutes=1)
+        day = start.replace(hour=0, minute=0)
+        for _ in range(366 * 5):  # täcker även 29 februari
+            if self._day_matches(day):
+                for hour in sorted(self.hours):
+                    for minute in sorted(self.minutes):
+                        candidate = day.replace(hour=hour, minute=minute)
+                        if candidate >= start:
+                            return candidate
+            day += timedelta(days=1)
+        raise ScheduleError(f"Cron-uttrycket '{self.expr}' matchar aldrig.")
+
+    def __str__(self) -> str:
+        return f"cron '{self.expr}'"
+
+
+class Service:
+    """Schemalagd körning av ett jobb (returnerar exit-kod) med sammanslagning av triggers."""
+
+    def __init__(
+        self,
+        job: Callable[[], int],
+        schedule: IntervalSchedule | CronSchedule,
+        run_on_start: bool = True,
+        health_host: str = HEALTH_HOST,
+        health_port: int | None = HEALTH_PORT,
+    ):
+        self.job = job
+        self.schedule = schedule
+        self.run_on_start = run_on_start
+        self.health_host = health_host
+        self.health_port = health_port
+        self.started_at = datetime.now()
+        self.next_run_at: datetime | None = None
+        self.running = False
+        self.runs_total = 0
+        self.failures_total = 0
+        self.coalesced_total = 0
+        self.last_run: dict | None = None
+        self._last_metrics_text = ""
+        self._pending = False
+        self._lock = threading.Lock()
+        self._wake = threading.Event()
+        self._stopping = threading.Event()
+        self._http: ThreadingHTTPServer | None = None
+
+    # --- triggers ---------------------------------------------------------
+
+    def trigger(self, reason: str = "manual") -> bool:
+        """
+        Begär en körning. Returnerar False om den slogs ihop med en som
+        redan väntar (t.ex. flera triggers under en pågående körning).
+        """
+        with self._lock:
+            if self._pending:
+                self.coalesced_total += 1
+                coalesced = True
+            else:
+                self._pending = True
+                coalesced = False
+        logger.info(f"Trigger ({reason}){' sammanslagen med väntande körning' if coalesced else ''}.")
+        self._wake.set()
+        return not coalesced
+
+    def stop(self) -> None:
+        self._stopping.set()
+        self._wake.set()
+
+    def _take_pending(self) -> bool:
+        with self._lock:
+            pending, self._pending = self._pending, False
+            self.running = pending
+            return pending
+
+    # --- körning ------------------------------------------------------------
+
+    def _run_job(self) -> None:
+        started = datetime.now()
+        t0 = time.perf_counter()
+        try:
+            exit_code = self.job()
+        except Exception as e:  # jobbet ska inte kunna ta ner tjänsten
+            logger.exception(f"❌ Schemalagd körning kraschade: {e}")
+            exit_code = 2
+        duration = time.perf_counter() - t0
+
+        registry = get_metrics()
+        with self._lock:
+            self.running = False
+            self.runs_total += 1
+            if exit_code != 0:
+                self.failures_total += 1
+            self.last_run = {
+                "started_at": started.isoformat(timespec="seconds"),
+                "finished_at": datetime.now().isoformat(timespec="seconds"),
+                "duration_sec": round(duration, 3),
+                "exit_code": exit_code,
+                "stages": {name: st["wall_sec"] for name, st in registry.stages.items()},
+            }
+            self._last_metrics_text = registry.to_prometheus()
+        logger.info(f"Körning klar (exit={exit_code}, {duration:.1f} s). Nästa: {self.next_run_at}")
+
+    def _catch_up_schedule(self, now: datetime) -> None:
+        """Schemalagda tider som passerat (t.ex. under en lång körning) blir EN trigger."""
+        if self.next_run_at is None or now < self.next_run_at:
+            return
+        due = 0
+        while self.next_run_at <= now:
+            due += 1
+            self.next_run_at = self.schedule.next_after(self.next_run_at)
+        with self._lock:
+            self.coalesced_total += due - 1
+        self.trigger("schema")
+
+    def run_forever(self) -> int:
+        """Kör tills stop()/SIGINT/SIGTERM. Returnerar 0."""
+        self._install_signal_handlers()
+        self._start_http()
+        now = datetime.now()
+        self.next_run_at = self.schedule.next_after(now)
+        logger.info(f"Tjänsteläge startat ({self.schedule}). Första schemalagda körning: {self.next_run_at}")
+        if self.run_on_start:
+            self.trigger("start")
+
+        try:
+            while not self._stopping.is_set():
+                while not self._stopping.is_set() and self._take_pending():
+                    self._run_job()
+                    self._catch_up_schedule(datetime.now())
+                if self._stopping.is_set():
+                    break
+                timeout = max(0.0, (self.next_run_at - datetime.now()).total_seconds())
+                self._wake.wait(timeout)
+                self._wake.clear()
+                self._catch_up_schedule(datetime.now())
+        finally:
+            self._stop_http()
+            logger.info("Tjänsteläge stoppat.")
+        return 0
+
+    def _install_signal_handlers(self) -> None:
+        if threading.current_thread() is not threading.main_thread():
+            return
+        for sig in (signal.SIGINT, getattr(signal, "SIGTERM", None)):
+            if sig is not None:
+                signal.signal(sig, lambda *_: self.stop())
+
+    # --- hälsa och mätvärden ---------------------------------------------
+
+    def health(self) -> dict:
+        with self._lock:
+            ok = self.last_run is None or self.last_run["exit_code"] == 0
+            return {
+                "status": "ok" if ok else "failing",
+                "started_at": self.started_at.isoformat(timespec="seconds"),
+                "uptime_sec": round((datetime.now() - self.started_at).total_seconds(), 1),
+                "schedule": str(self.schedule),
+                "running": self.running,
+                "pending": self._pending,
+                "next_run_at": self.next_run_at.isoformat(timespec="seconds") if self.next_run_at else None,
+                "runs_total": self.runs_total,
+                "failures_total": self.failures_total,
+                "coalesced_total": self.coalesced_total,
+                "last_run": self.last_run,
+            }
+
+    def prometheus(self) -> str:
+        with self._lock:
+            lines = [
+                f"# TYPE {PROMETHEUS_PREFIX}_service_runs_total counter",
+                f"{PROMETHEUS_PREFIX}_service_runs_total {self.runs_total}",
+                f"# TYPE {PROMETHEUS_PREFIX}_service_failures_total counter",
+                f"{PROMETHEUS_PREFIX}_service_failures_total {self.failures_total}",
+                f"# TYPE {PROMETHEUS_PREFIX}_service_coalesced_total counter",
+                f"{PROMETHEUS_PREFIX}_service_coalesced_total {self.coalesced_total}",
+                f"# TYPE {PROMETHEUS_PREFIX}_service_running gauge",
+                f"{PROMETHEUS_PREFIX}_service_running {int(self.running)}",
+            ]
+            if self.last_run is not None:
+                lines += [
+                    f"# TYPE {PROMETHEUS_PREFIX}_service_last_run_seconds gauge",
+                    f"{PROMETHEUS_PREFIX}_service_last_run_seconds {self.last_run['duration_sec']}",
+                    f"# TYPE {PROMETHEUS_PREFIX}_service_last_exit_code gauge",
+                    f"{PROMETHEUS_PREFIX}_service_last_exit_code {self.last_run['exit_code']}",
+                ]
+            return "\n".join(lines) + "\n" + self._last_metrics_text
+
+    def _start_http(self) -> None:
+        if self.health_port is None:
+            return
+        self._http = ThreadingHTTPServer((self.health_host, self.health_port), _make_handler(self))
+        self.health_port = self._http.server_address[1]  # port 0 -> faktisk port
+        threading.Thread(target=self._http.serve_forever, name="service-http", daemon=True).start()
+        logger.info(f"Hälsa/mätvärden på http://{self.health_host}:{self.health_port}/health")
+
+    def _stop_http(self) -> None:
+        if self._http is not None:
+            self._http.shutdown()
+            self._http.server_close()
+            self._http = None
+
+
+def _make_handler(service: Service) -> type[BaseHTTPRequestHandler]:
+    class Handler(BaseHTTPRequestHandler):
+        def _send(self, status: int, body: str, content_type: str) -> None:
+            data = body.encode("utf-8")
+            self.send_response(status)
+            self.send_header("Content-Type", content_type)
+            self.send_header("Content-Length", str(len(data)))
+            self.end_headers()
+            self.wfile.write(data)
+
+        def do_GET(self):
+            if self.path == "/health":
+                health = service.health()
+                status = 200 if health["status"] == "ok" else 503
+                self._send(status, json.dumps(health), "application/json")
+            elif self.path == "/metrics":
+                self._send(200, service.prometheus(), "text/plain; version=0.0.4")
+            else:
+                self._send(404, json.dumps({"error": "not found"}), "application/json")
+
+        def do_POST(self):
+            if self.path == "/trigger":
+                queued = service.trigger("http")
+                self._send(202, json.dumps({"queued": queued, "coalesced": not queued}), "application/json")
+            else:
+                self._send(404, json.dumps({"error": "not found"}), "application/json")
+
+        def log_message(self, format, *args):  # tyst: hälsokontroller ska inte fylla loggen
+            pass
+
+    return Handler
@@ -1,18 +1,94 @@
-import pandas as pd
-from typing import List, Optional
+from __future__ import annotations
+import re
+import tracemalloc
+from contextlib import contextmanager
 from datetime import datetime
+from typing import Callable, Iterator, List, Optional
+
+from .lazy import lazy_import
+from .metrics import get_metrics
+
+np = lazy_import("numpy")
+pd = lazy_import("pandas")
 
 
 class TransformError(Exception):
     pass
 
 
+# Rådatans kolumnnamn -> normaliserade namn
+RAW_COLUMN_NAMES = {
+    "imdbID": "imdb_id",
+    "Title": "title",
+    "Year": "year",
+    "Type": "type",
+    "Genre": "genre",
+    "Director": "director",
+    "Country": "country",
+    "Runtime": "runtime",
+    "imdbRating": "imdb_rating",
+    "imdbVotes": "imdb_votes",
+}
+
+
+def _dedupe_key(df: pd.DataFrame, out: pd.DataFrame, dedupe_on: str) -> pd.Series:
+    """
+    Kolumnen att deduplicera på. Godtar samma namn som när rådata döptes om
+    och dedupen gjordes på hela framen: utdatakolumnerna (year/rating/votes
+    som tal), fetched_at, de råa kolumnerna under sina normaliserade namn
+    (t.ex. runtime) och övriga rådatakolumner (t.ex. __source_query__).
+    """
+    if dedupe_on in out.columns:
+        return out[dedupe_on]
+    if dedupe_on == "fetched_at":
+        # Samma tidsstämpel på alla rader -> bara den första raden blir kvar
+        return pd.Series(0, index=df.index)
+    raw = {new: old for old, new in RAW_COLUMN_NAMES.items()}.get(dedupe_on)
+    if raw is None and dedupe_on in df.columns and dedupe_on not in RAW_COLUMN_NAMES:
+        raw = dedupe_on
+    if raw is None:
+        raise TransformError(
+            f"Kan inte deduplicera på '{dedupe_on}' eftersom kolumnen saknas."
+        )
+    return df[raw]
+
+
+@contextmanager
+def _track_peak_memory(memory_hook: Optional[Callable[[int], None]]) -> Iterator[None]:
+    """
+    Mäter toppminnet (bytes, via tracemalloc) för blocket och skickar det till memory_hook.
+    Utan hook görs ingenting, så mätningen kostar bara när någon faktiskt lyssnar.
+    Körs tracemalloc redan (yttre mätning) rapporteras bara hur mycket blocket
+    höjde toppen, och den yttre toppen nollställs inte.
+    """
+    if memory_hook is None:
+        yield
+        return
+
+    started_here = not tracemalloc.is_tracing()
+    if started_here:
+        tracemalloc.start()
+        peak_before = 0
+    else:
+        # En yttre mätning (t.ex. --profile-memory) pågår: nollställ inte dess
+        # topp utan rapportera hur mycket blocket höjde den.
+        peak_before = tracemalloc.get_traced_memory()[1]
+    try:
+        yield
+    finally:
+        _, peak = tracemalloc.get_traced_memory()
+        if started_here:
+            tracemalloc.stop()
+    memory_hook(peak - peak_before)
+
+
 def transform_movies(
     df: pd.DataFrame,
     allowed_types: Optional[List[str]] = None,
     allowed_genres: Optional[List[str]] = None,
     dedupe_on: str = "title",
     year_min: Optional[int] = None,
+    memory_hook: Optional[Callable[[int], None]] = None,
 ) -> pd.DataFrame:
     """
     Tar rådataframe från extract-steget och:
@@ -22,137 +98,120 @@ def transform_movies(
     - filtrerar på typ (movie/series/etc) om allowed_types anges
     - filtrerar på genre om allowed_genres anges
     - tar bort rader som saknar imdb_rating eller imdb_votes
-    - deduplikerar på valfri kolumn (default: title)
+    - deduplikerar på valfri kolumn (default: title) – utdatakolumnerna,
+      de råa kolumnerna under sina normaliserade namn (runtime) och övriga
+      rådatakolumner (t.ex. __source_query__)
     Returnerar en analysklar DataFrame.
     Kastar TransformError om kritiska kolumner saknas.
+
+    Minnessnål: rådata kopieras aldrig som helhet, filtren slås ihop till en
+    mask och raderna väljs ut i ett enda steg på slutet. Ange memory_hook
+    (t.ex. lambda peak: ...) för att få toppminnet i bytes för anropet.
     """
 
-    required_cols = [
-        "imdbID",
-        "Title",
-        "Year",
-        "Type",
-        "Genre",
-        "Director",
-        "Country",
-        "Runtime",
-        "imdbRating",
-        "imdbVotes",
-    ]
+    required_cols = list(RAW_COLUMN_NAMES)
     missing = [c for c in required_cols if c not in df.columns]
     if missing:
         raise TransformError(f"Saknar kolumner i rådata: {missing}")
 
-    # jobba på en kopia
-    df = df.copy()
-
-    # 1. Normalisera kolumnnamn
-    df = df.rename(
-        columns={
-            "imdbID": "imdb_id",
-            "Title": "title",
-            "Year": "year",
-            "Type": "type",
-            "Genre": "genre",
-            "Director": "director",
-            "Country": "country",
-            "Runtime": "runtime",
-            "imdbRating": "imdb_rating",
-            "imdbVotes": "imdb_votes",
-        }
-    )
-
-    # 2. Typkonverteringar
-
-    # "2024" eller "2024– " -> hämta första 4 siffrorna som float
-    df["year"] = (
-        df["year"]
-        .astype(str)
-        .str.extract(r"(\d{4})")[0]
-        .astype("float")
-    )
-
-    # "123 min" -> 123 som float
-    df["runtime_min"] = (
-        df["runtime"]
-        .astype(str)
-        .str.extract(r"(\d+)")
-        [0]
-        .astype("float")
-    )
-
-    # Rating -> float
-    df["imdb_rating"] = pd.to_numeric(df["imdb_rating"], errors="coerce")
-
-    # Votes "12,345" -> 12345 som float
-    df["imdb_votes"] = (
-        df["imdb_votes"]
-        .astype(str)
-        .str.replace(",", "", regex=False)
-    )
-    df["imdb_votes"] = pd.to_numeric(df["imdb_votes"], errors="coerce")
-
-    # Primärgenre = första genren i listan
-    df["genre_primary"] = (
-        df["genre"]
-        .astype(str)
-        .str.split(",")
-        .str[0]
-        .str.strip()
-    )
-
-    # fetched_at timestamp
-    df["fetched_at"] = datetime.utcnow().isoformat(timespec="seconds")
-
-    # 3. Filtrering
-
-    # 3a. Årsfilter (behåll filmer >= year_min)
-    if year_min is not None:
-        df = df[df["year"] >= float(year_min)]
-
-    # 3b. Filtrera på typ (movie/series/etc)
-    if allowed_types is not None:
-        allowed_types_norm = {t.lower() for t in allowed_types}
-        df = df[df["type"].str.lower().isin(allowed_types_norm)]
-
-    # 3c. Filtrera på genre (Action, Thriller, ...)
-    if allowed_genres is not None and len(allowed_genres) > 0:
-        import re
-        escaped = [re.escape(g) for g in allowed_genres]
-        pattern = r"(" + "|".join(escaped) + r")"
-
-        df = df[
-            df["genre"]
+    with _track_peak_memory(memory_hook):
+        # Ingen df.copy()/rename: vi bygger resultatet kolumn för kolumn.
+        # Oförändrade textkolumner delar minne med rådata (copy=False) och
+        # varje konvertering allokerar bara sin egen nya kolumn.
+
+        # 1. Typkonverteringar
+
+        # "2024" eller "2024– " -> hämta första 4 siffrorna som float
+        year = (
+            df["Year"]
+            .astype(str)
+            .str.extract(r"(\d{4})", expand=False)
+            .astype("float")
+        )
+
+        # "123 min" -> 123 som float
+        runtime_min = (
+            df["Runtime"]
             .astype(str)
-            .str.contains(pattern, case=False, na=False)
-        ]
+            .str.extract(r"(\d+)", expand=False)
+            .astype("float")
+        )
 
-    # 3d. Ta bort poster som saknar rating eller votes
-    # Vi kräver att båda finns (inte NaN)
-    df = df[df["imdb_rating"].notna() & df["imdb_votes"].notna()]
+        # Rating -> float
+        imdb_rating = pd.to_numeric(df["imdbRating"], errors="coerce")
 
-    # 4. Dedupe (t.ex. title)
-    if dedupe_on not in df.columns:
-        raise TransformError(
-            f"Kan inte deduplicera på '{dedupe_on}' eftersom kolumnen saknas."
+        # Votes "12,345" -> 12345 som float
+        imdb_votes = pd.to_numeric(
+            df["imdbVotes"].astype(str).str.replace(",", "", regex=False),
+            errors="coerce",
+        )
+
+        # Primärgenre = första genren i listan
+        genre_primary = (
+            df["Genre"]
+            .astype(str)
+            .str.split(",", n=1)
+            .str[0]
+            .str.strip()
+        )
+
+        # 2. Normaliserade kolumnnamn (i slutlig schemaordning, fetched_at läggs sist)
+        out = pd.DataFrame(
+            {
+                "imdb_id": df["imdbID"],
+                "title": df["Title"],
+                "year": year,
+                "type": df["Type"],
+                "genre": df["Genre"],
+                "genre_primary": genre_primary,
+                "director": df["Director"],
+                "country": df["Country"],
+                "runtime_min": runtime_min,
+                "imdb_rating": imdb_rating,
+                "imdb_votes": imdb_votes,
+            },
+            copy=False,
         )
 
-    df = df.drop_duplicates(subset=[dedupe_on], keep="first").reset_index(drop=True)
-
-    # 5. Returnera bestämt schema
-    return df[
-        [
-            "imdb_id",
-            "title",
-            "year",
-            "type",
-            "genre",
-            "genre_primary",
-            "director",
-            "country",
-            "runtime_min",
-            "imdb_rating",
-            "imdb_votes",
-            "fetched_at",
-        ]
-    ]
+        # 3. Filtrering – alla villkor kombineras till EN mask som appliceras sist
+
+        # 3a. Ta bort poster som saknar rating eller votes
+        # Vi kräver att båda finns (inte NaN)
+        metrics = get_metrics()
+        metrics.set("transform_rows", len(out), step="input")
+        mask = imdb_rating.notna() & imdb_votes.notna()
+        metrics.set("transform_rows", int(mask.sum()), step="rating_votes")
+
+        # 3b. Årsfilter (behåll filmer >= year_min)
+        if year_min is not None:
+            mask &= year >= float(year_min)
+            metrics.set("transform_rows", int(mask.sum()), step="year")
+
+        # 3c. Filtrera på typ (movie/series/etc)
+        if allowed_types is not None:
+            allowed_types_norm = {t.lower() for t in allowed_types}
+            mask &= out["type"].str.lower().isin(allowed_types_norm)
+            metrics.set("transform_rows", int(mask.sum()), step="type")
+
+        # 3d. Filtrera på genre (Action, Thriller, ...)
+        if allowed_genres is not None and len(allowed_genres) > 0:
+            escaped = [re.escape(g) for g in allowed_genres]
+            pattern = r"(?:" + "|".join(escaped) + r")"
+            mask &= out["genre"].astype(str).str.contains(pattern, case=False, na=False)
+            metrics.set("transform_rows", int(mask.sum()), step="genre")
+
+        # 4. Dedupe (t.ex. title) bland raderna som klarade filtren
+        key = _dedupe_key(df, out, dedupe_on)
+
+        keep = mask.to_numpy(dtype=bool, na_value=False)
+        keep[keep] = ~key[keep].duplicated(keep="first").to_numpy()
+
+        # 5. En enda radselektion -> bestämt schema
+        result = out.take(np.flatnonzero(keep))
+        metrics.set("transform_rows", len(result), step="dedupe")
+        result.index = pd.RangeIndex(len(result))
+
+        # fetched_at timestamp (bara för raderna som blev kvar)
+        result["fetched_at"] = datetime.utcnow().isoformat(timespec="seconds")
+
+    return result
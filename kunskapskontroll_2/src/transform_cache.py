@@ -0,0 +1,191 @@
+"""
+Opt-in cache för transform_movies().
+
+Nyckeln är ett snabbt innehållshash av rådataframen (kolumner, dtypes och
+värden) plus transform-parametrarna och ett hash av transform.py:s källkod. Resultatet sparas kolumnärt som
+Arrow IPC (Feather v2, okomprimerat) i data/cache/transform/ så att en
+upprepad körning kan minnesmappa filen istället för att köra om transformen.
+
+Cachen städas LRU-mässigt på diskstorlek: varje träff "rör" filen (mtime)
+och de äldsta filerna tas bort när katalogen blir större än max_bytes.
+"""
+
+from __future__ import annotations
+import hashlib
+import json
+import os
+from datetime import datetime
+from pathlib import Path
+from functools import lru_cache
+from typing import Callable, List, Optional
+
+from . import transform as transform_module
+from .lazy import lazy_import
+from .logger import LazyLogger
+from .metrics import get_metrics
+from .transform import transform_movies
+
+pd = lazy_import("pandas")
+pa = lazy_import("pyarrow")
+
+logger = LazyLogger()
+
+BASE_DIR = Path(__file__).resolve().parents[1]
+CACHE_DIR = BASE_DIR / "data" / "cache" / "transform"
+CACHE_MAX_BYTES = 200_000_000  # ~200 MB
+CACHE_SUFFIX = ".arrow"
+
+# Ändringar i transform.py ogiltigförklarar cachen av sig själva (källkodshash i
+# nyckeln). Höj bara vid ändringar utanför den filen, t.ex. i cacheformatet.
+CACHE_VERSION = 2
+
+
+@lru_cache(maxsize=1)
+def transform_source_hash() -> str:
+    """Hash av transform.py:s källkod, så att ändrat transformbeteende byter nyckel."""
+    source = Path(transform_module.__file__).read_bytes()
+    return hashlib.blake2b(source, digest_size=16).hexdigest()
+
+
+def fingerprint_frame(df: pd.DataFrame) -> str:
+    """
+    Snabbt innehållshash av en DataFrame (kolumnnamn, dtypes och alla värden).
+    Indexet ignoreras eftersom transform_movies() inte beror på det.
+    """
+    h = hashlib.blake2b(digest_size=16)
+    schema = [[str(c) for c in df.columns], [str(t) for t in df.dtypes]]
+    h.update(json.dumps(schema).encode("utf-8"))
+    h.update(pd.util.hash_pandas_object(df, index=False).to_numpy().tobytes())
+    return h.hexdigest()
+
+
+def cache_key(
+    df: pd.DataFrame,
+    allowed_types: Optional[List[str]] = None,
+    allowed_genres: Optional[List[str]] = None,
+    dedupe_on: str = "title",
+    year_min: Optional[int] = None,
+) -> str:
+    """
+    Nyckel = fingerprint av rådata + transform-parametrar + CACHE_VERSION
+    + källkodshash för transform.py.
+    Listorna sorteras eftersom ordningen inte påverkar filtreringen.
+    """
+    params = {
+        "version": CACHE_VERSION,
+        "transform_source": transform_source_hash(),
+        "allowed_types": sorted(allowed_types) if allowed_types is not None else None,
+        "allowed_genres": sorted(allowed_genres) if allowed_genres is not None else None,
+        "dedupe_on": dedupe_on,
+        "year_min": year_min,
+    }
+    h = hashlib.blake2b(digest_size=16)
+    h.update(fingerprint_frame(df).encode("utf-8"))
+    h.update(json.dumps(params, sort_keys=True).encode("utf-8"))
+    return h.hexdigest()
+
+
+def _read_cached(path: Path) -> pd.DataFrame:
+    # Minnesmappad läsning: numeriska kolumner utan NA pekar direkt in i filen.
+    with pa.memory_map(str(path), "r") as source:
+        table = pa.ipc.open_file(source).read_all()
+    return table.to_pandas(split_blocks=True)
+
+
+def _write_cached(path: Path, df: pd.DataFrame) -> None:
+    # Skriv till temporär fil och byt namn, så att en avbruten körning
+    # aldrig lämnar en halvskriven cachefil.
+    table = pa.Table.from_pandas(df, preserve_index=False)
+    tmp = path.with_suffix(path.suffix + ".tmp")
+    with pa.OSFile(str(tmp), "wb") as sink:
+        with pa.ipc.new_file(sink, table.schema) as writer:
+            writer.write_table(table)
+    os.replace(tmp, path)
+
+
+def evict_cache(cache_dir: Path, max_bytes: int) -> int:
+    """
+    Tar bort minst nyligen använda cachefiler tills katalogen ryms i max_bytes.
+    Den senast använda filen behålls alltid. Returnerar antal borttagna filer.
+    """
+    files = sorted(cache_dir.glob(f"*{CACHE_SUFFIX}"), key=lambda p: p.stat().st_mtime)
+    total = sum(p.stat().st_size for p in files)
+    removed = 0
+
+    while total > max_bytes and len(files) > 1:
+        oldest = files.pop(0)
+        size = oldest.stat().st_size
+        try:
+            oldest.unlink()
+        except OSError as e:
+            # T.ex. Windows om filen fortfarande är minnesmappad
+            logger.warning(f"Kunde inte ta bort cachefil {oldest.name}: {e}")
+            continue
+        total -= size
+        removed += 1
+
+    if removed:
+        logger.info(f"Transform-cache: tog bort {removed} gamla filer (LRU).")
+    return removed
+
+
+def transform_movies_cached(
+    df: pd.DataFrame,
+    allowed_types: Optional[List[str]] = None,
+    allowed_genres: Optional[List[str]] = None,
+    dedupe_on: str = "title",
+    year_min: Optional[int] = None,
+    cache_dir: Optional[Path] = None,
+    max_bytes: int = CACHE_MAX_BYTES,
+    memory_hook: Optional[Callable[[int], None]] = None,
+) -> pd.DataFrame:
+    """
+    Samma kontrakt som transform_movies(), men med cache:
+    - Träff: läser det sparade resultatet (minnesmappat) och hoppar över transformen.
+      Endast fetched_at sätts om, så att tidsstämpeln gäller den här körningen.
+    - Miss: kör transform_movies(), sparar resultatet och städar cachen (LRU).
+      memory_hook skickas vidare till transform_movies() (anropas bara vid miss).
+    """
+    cache_dir = Path(cache_dir) if cache_dir is not None else CACHE_DIR
+    cache_dir.mkdir(parents=True, exist_ok=True)
+
+    key = cache_key(
+        df,
+        allowed_types=allowed_types,
+        allowed_genres=allowed_genres,
+        dedupe_on=dedupe_on,
+        year_min=year_min,
+    )
+    path = cache_dir / f"{key}{CACHE_SUFFIX}"
+
+    if path.exists():
+        try:
+            out = _read_cached(path)
+        except (OSError, pa.ArrowException) as e:
+            logger.warning(f"Trasig cachefil {path.name}, transformerar om: {e}")
+        else:
+            os.utime(path)  # markera som nyligen använd (LRU)
+            get_metrics().inc("transform_cache_total", result="hit")
+            out["fetched_at"] = datetime.utcnow().isoformat(timespec="seconds")
+            logger.info(f"Transform-cache träff ({key[:12]}): {len(out)} rader.")
+            return out
+
+    get_metrics().inc("transform_cache_total", result="miss")
+    out = transform_movies(
+        df,
+        allowed_types=allowed_types,
+        allowed_genres=allowed_genres,
+        dedupe_on=dedupe_on,
+        year_min=year_min,
+        memory_hook=memory_hook,
+    )
+
+    try:
+        _write_cached(path, out)
+        logger.info(f"Transform-cache miss ({key[:12]}): sparade {len(out)} rader.")
+        evict_cache(cache_dir, max_bytes)
+    except (OSError, pa.ArrowException) as e:
+        # Cachen är bara en optimering – ett skrivfel får aldrig stoppa ETL:en.
+        logger.warning(f"Kunde inte skriva transform-cache: {e}")
+
+    return out
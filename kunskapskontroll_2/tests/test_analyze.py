@@ -2,8 +2,10 @@ import pandas as pd
 import pytest
 import importlib
 from pathlib import Path
+from sqlalchemy import create_engine
 
 import src.analyze as an
+from src.load import load_movies_incremental, load_movies_refresh
 
 
 def _sample_movies_df():
@@ -84,6 +86,24 @@ def test_genre_rating_summary_and_year_count_summary(monkeypatch):
     assert row_2024["count"] == 2
 
 
+def test_summaries_accept_minimal_frame():
+    """Sammanställningarna ska bara kräva de kolumner de faktiskt använder."""
+    df = pd.DataFrame({
+        "imdb_id": ["tt1", "tt2", "tt3"],
+        "genre_primary": ["Action", "Action", "Drama"],
+        "imdb_rating": [7.0, 8.0, None],
+        "year": [2020, 2021, 2021],
+    })
+
+    gsum = an.genre_rating_summary(df)
+    assert gsum["genre_primary"].tolist() == ["Action", "Drama"]
+    assert gsum["count"].tolist() == [2, 1]
+    assert gsum.loc[0, "avg_imdb_rating"] == pytest.approx(7.5)
+
+    ysum = an.year_count_summary(df[["imdb_id", "year"]])
+    assert ysum.to_dict("list") == {"year": [2020, 2021], "count": [1, 2]}
+
+
 def test_export_analysis_creates_csv(monkeypatch, tmp_path):
     """
     export_analysis() ska:
@@ -95,8 +115,11 @@ def test_export_analysis_creates_csv(monkeypatch, tmp_path):
       - ANALYSIS_DIR -> tmp_path / "analysis"
     """
 
-    # 1. mocka read_movies_df() så vi inte slår riktig DB
-    monkeypatch.setattr(an, "read_movies_df", lambda: _sample_movies_df())
+    # 1. mocka read_movies_df() så vi inte slår riktig DB.
+    # get_engine() pekar på en tom in-memory DB -> SQL-pushdown misslyckas
+    # och export_analysis() faller tillbaka på pandas-vägen.
+    monkeypatch.setattr(an, "read_movies_df", lambda **_: _sample_movies_df())
+    monkeypatch.setattr(an, "get_engine", lambda: create_engine("sqlite:///:memory:"))
 
     # 2. peka ANALYSIS_DIR till tempmapp
     new_analysis_dir = tmp_path / "analysis_dir"
@@ -150,8 +173,9 @@ def test_export_analysis_handles_empty(monkeypatch, tmp_path):
         ]
     )
 
-    # mocka read_movies_df() -> tom df
-    monkeypatch.setattr(an, "read_movies_df", lambda: empty_df)
+    # mocka read_movies_df() -> tom df (och ingen movies-tabell för SQL-pushdown)
+    monkeypatch.setattr(an, "read_movies_df", lambda **_: empty_df)
+    monkeypatch.setattr(an, "get_engine", lambda: create_engine("sqlite:///:memory:"))
 
     # peka analyskatalogen mot tmp_path
     new_analysis_dir = tmp_path / "analysis_dir_empty"
@@ -163,3 +187,135 @@ def test_export_analysis_handles_empty(monkeypatch, tmp_path):
     # Katalogen ska skapas ändå (mkdir), men inga filer ska skapas
     assert new_analysis_dir.exists()
     assert list(new_analysis_dir.iterdir()) == []
+
+
+def test_sql_pushdown_matches_pandas_summaries(monkeypatch, tmp_path):
+    """
+    genre_rating_summary_sql()/year_count_summary_sql() ska ge exakt samma
+    frames som pandas-varianterna på samma tabell (inkl. NULL-grupper och
+    lika många filmer per genre), och export_analysis() ska använda dem.
+    """
+    rows = _sample_movies_df().to_dict("records")
+    # En rad utan genre/år (NULL-grupper) och en Drama-rad till (lika count som Action)
+    rows.append({**rows[1], "imdb_id": "tt4", "genre_primary": None, "year": None})
+    rows.append({**rows[1], "imdb_id": "tt5", "year": 2023.0})
+    df = pd.DataFrame(rows)
+
+    engine = create_engine("sqlite:///:memory:", future=True)
+    load_movies_refresh(engine, df)
+    from_db = pd.read_sql_query("SELECT * FROM movies", engine)
+
+    # NULL-nyckeln blir None från SQL och NaN från pandas groupby – jämför utan den skillnaden
+    pd.testing.assert_frame_equal(
+        an.genre_rating_summary_sql(engine).fillna({"genre_primary": "<NULL>"}),
+        an.genre_rating_summary(from_db).fillna({"genre_primary": "<NULL>"}),
+    )
+    pd.testing.assert_frame_equal(an.year_count_summary_sql(engine), an.year_count_summary(from_db))
+
+    # export_analysis() ska inte behöva läsa hela tabellen till pandas
+    def fail_read():
+        raise AssertionError("read_movies_df() ska inte anropas när pushdown fungerar")
+
+    monkeypatch.setattr(an, "read_movies_df", fail_read)
+    monkeypatch.setattr(an, "get_engine", lambda: engine)
+    monkeypatch.setattr(an, "ANALYSIS_DIR", tmp_path)
+    an.export_analysis()
+
+    assert len(pd.read_csv(tmp_path / "genre_rating_summary.csv")) == 4
+
+
+def test_export_analysis_skips_unchanged_files(monkeypatch, tmp_path):
+    """
+    En andra export med samma data ska inte skriva om någon fil; ändras en
+    sammanställning ska bara den filen (och manifestet) skrivas om.
+    """
+    engine = create_engine(f"sqlite:///{tmp_path / 'etl.db'}")
+    load_movies_refresh(engine, _sample_movies_df())
+    out = tmp_path / "analysis"
+    monkeypatch.setattr(an, "get_engine", lambda: engine)
+    monkeypatch.setattr(an, "ANALYSIS_DIR", out)
+
+    an.export_analysis()
+    first = an.read_manifest(out)
+    assert set(first) == {"genre_rating_summary.csv", "year_count_summary.csv"}
+
+    mtimes = {p.name: p.stat().st_mtime_ns for p in out.iterdir()}
+    an.export_analysis()
+    assert {p.name: p.stat().st_mtime_ns for p in out.iterdir()} == mtimes
+    assert an.read_manifest(out) == first
+
+    # Nytt betyg i samma år -> genre-sammanställningen ändras, årssammanställningen inte
+    changed = _sample_movies_df()
+    changed.loc[0, "imdb_rating"] = 9.0
+    load_movies_refresh(engine, changed)
+    an.export_analysis()
+
+    second = an.read_manifest(out)
+    assert second["year_count_summary.csv"] == first["year_count_summary.csv"]
+    assert second["genre_rating_summary.csv"]["fingerprint"] != first["genre_rating_summary.csv"]["fingerprint"]
+    assert not [p for p in out.iterdir() if p.name.endswith(".tmp")]
+
+
+def test_iter_movies_projects_filters_and_chunks(tmp_path):
+    """
+    iter_movies() ska bara hämta valda kolumner och rader, i chunks om högst
+    chunk_size rader, och en kub byggd chunk för chunk ska bli samma som en hel.
+    """
+    rows = _sample_movies_df().to_dict("records")
+    rows += [{**rows[0], "imdb_id": f"tx{i}", "type": "series" if i % 2 else "movie"} for i in range(7)]
+    df = pd.DataFrame(rows)
+    engine = create_engine(f"sqlite:///{tmp_path / 'etl.db'}")
+    load_movies_refresh(engine, df)
+
+    chunks = list(an.iter_movies(columns=["imdb_id", "year"], chunk_size=4, engine=engine))
+    assert [len(c) for c in chunks] == [4, 4, 2]
+    assert all(list(c.columns) == ["imdb_id", "year"] for c in chunks)
+
+    filtered = pd.concat(an.iter_movies(
+        columns=["imdb_id"], year_min=2023, types=["movie"], genres=["Action", "Drama"], engine=engine,
+    ))
+    assert sorted(filtered["imdb_id"]) == ["tt1", "tt2", "tx0", "tx2", "tx4", "tx6"]
+
+    with pytest.raises(ValueError):
+        next(an.iter_movies(columns=["imdb_id; DROP TABLE movies"], engine=engine))
+
+    chunked = an.build_cube_chunked(an.iter_movies(columns=an.cube_source_columns(), chunk_size=3, engine=engine))
+    assert chunked["count"].sum() == len(df)
+    assert len(chunked) == len(an.build_cube(df))
+
+
+def test_movie_sketches_are_persisted_and_exported(monkeypatch, tmp_path):
+    """
+    refresh_movie_sketches() ska bygga sketcher chunkvis och spara dem;
+    export_analysis() ska sedan skriva ungefärlig statistik per genre/år.
+    """
+    rows = _sample_movies_df().to_dict("records")
+    rows.append({**rows[0], "imdb_id": "tt9", "director": "Dir B, Dir Z", "country": "USA, UK", "imdb_rating": 8.5})
+    engine = create_engine(f"sqlite:///{tmp_path / 'etl.db'}")
+    load_movies_refresh(engine, pd.DataFrame(rows))
+
+    an.refresh_movie_sketches(engine, chunk_size=2)
+    stats = an.approx_stats_summary(an.load_movie_sketches(engine), "genre_primary")
+
+    action = stats.loc[stats["genre_primary"] == "Action"].iloc[0]
+    assert action["distinct_director"] == 3   # Dir A, Dir B, Dir Z
+    assert action["distinct_country"] == 2    # USA, UK
+    assert action["imdb_rating_p10"] == 7.5 and action["imdb_rating_p90"] == 8.5
+
+    monkeypatch.setattr(an, "get_engine", lambda: engine)
+    monkeypatch.setattr(an, "ANALYSIS_DIR", tmp_path / "analysis")
+    an.export_analysis()
+
+    year_stats = pd.read_csv(tmp_path / "analysis" / "year_approx_stats.csv")
+    assert year_stats["year"].tolist() == [2022, 2024]
+    assert "runtime_min_median" in year_stats.columns
+
+    # Ny laddning utan ombyggda sketcher -> ingen inaktuell statistik exporteras
+    load_movies_incremental(engine, pd.DataFrame(rows).assign(imdb_rating=5.0))
+    assert not an.sketches_are_current(engine)
+    an.export_analysis()
+    assert not (tmp_path / "analysis" / "year_approx_stats.csv").exists()
+    assert "year_approx_stats.csv" not in an.read_manifest(tmp_path / "analysis")
+
+    an.refresh_movie_sketches(engine)
+    assert an.sketches_are_current(engine)
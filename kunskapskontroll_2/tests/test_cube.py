@@ -0,0 +1,94 @@
+import numpy as np
+import pandas as pd
+from sqlalchemy import create_engine
+
+import src.analyze as an
+from src.cube import CUBE_VIEWS, build_cube, build_cube_sql, cube_views, merge_cubes, rollup
+from src.load import load_movies_refresh
+from tests.test_analyze import _sample_movies_df
+
+
+def _random_movies_df(n=300, seed=1):
+    rng = np.random.default_rng(seed)
+    genres = np.array(["Action", "Drama", "Comedy", None], dtype=object)
+    countries = np.array(["USA", "UK, USA", "Sweden, Norway", None], dtype=object)
+    rating = rng.uniform(1, 10, n).round(1)
+    rating[rng.random(n) < 0.1] = np.nan
+    return pd.DataFrame({
+        "imdb_id": [f"tt{i}" for i in range(n)],
+        "title": [f"Film {i}" for i in range(n)],
+        "year": rng.integers(2015, 2020, n).astype(float),
+        "type": rng.choice(["movie", "series"], n),
+        "genre": genres[rng.integers(0, 4, n)],
+        "genre_primary": genres[rng.integers(0, 4, n)],
+        "director": "Dir",
+        "country": countries[rng.integers(0, 4, n)],
+        "runtime_min": rng.integers(80, 180, n).astype(float),
+        "imdb_rating": rating,
+        "imdb_votes": rng.integers(100, 100_000, n).astype(float),
+        "fetched_at": "2025-10-26T12:00:00",
+    })
+
+
+def _sorted(df, by):
+    return df.sort_values(by=by, kind="stable").reset_index(drop=True)
+
+
+def test_merged_chunk_cubes_equal_full_cube():
+    """Kuber per chunk som slås ihop ska ge exakt samma kub som en hel scan."""
+    df = _random_movies_df()
+    dims = ["genre_primary", "year", "type", "country_primary"]
+
+    full = _sorted(build_cube(df), dims)
+    merged = _sorted(merge_cubes(build_cube(df.iloc[i:i + 70]) for i in range(0, len(df), 70)), dims)
+
+    pd.testing.assert_frame_equal(merged[full.columns], full, check_dtype=False)
+
+
+def test_rollup_matches_direct_groupby():
+    """En roll-up av kuben ska ge samma siffror som en direkt groupby på rådata."""
+    df = _random_movies_df()
+    view = _sorted(rollup(build_cube(df), ["genre_primary", "year"]), ["genre_primary", "year"])
+
+    expected = _sorted(
+        df.groupby(["genre_primary", "year"], dropna=False)
+        .agg(count=("imdb_id", "count"), imdb_rating_mean=("imdb_rating", "mean"))
+        .reset_index(),
+        ["genre_primary", "year"],
+    )
+
+    pd.testing.assert_frame_equal(view[expected.columns], expected, check_dtype=False)
+    assert rollup(build_cube(df), [])["count"].iloc[0] == len(df)
+
+
+def test_sql_cube_matches_pandas_cube_and_feeds_views(monkeypatch, tmp_path):
+    """
+    build_cube_sql() ska ge samma kub som build_cube(), och export_analysis(views=...)
+    ska skriva en CSV per vy.
+    """
+    df = _random_movies_df()
+    engine = create_engine(f"sqlite:///{tmp_path / 'cube.db'}")
+    load_movies_refresh(engine, df)
+
+    dims = ["genre_primary", "year", "type", "country_primary"]
+    from_sql = _sorted(build_cube_sql(engine).fillna({d: "<NULL>" for d in ["genre_primary", "country_primary"]}), dims)
+    from_df = _sorted(build_cube(df).fillna({d: "<NULL>" for d in ["genre_primary", "country_primary"]}), dims)
+    pd.testing.assert_frame_equal(from_sql[from_df.columns], from_df, check_dtype=False)
+
+    monkeypatch.setattr(an, "get_engine", lambda: engine)
+    monkeypatch.setattr(an, "ANALYSIS_DIR", tmp_path)
+    an.export_analysis(views=CUBE_VIEWS)  # samma anrop som main.py gör
+    assert all((tmp_path / f"{name}.csv").exists() for name in CUBE_VIEWS)
+
+    exported = pd.read_csv(tmp_path / "type_year_summary.csv")
+    expected = cube_views(build_cube(df), {"v": ["type", "year"]})["v"]
+    assert exported["count"].tolist() == expected["count"].tolist()
+    assert exported["count"].sum() == len(df)
+
+
+def test_summaries_are_slices_of_cube():
+    """genre_rating_summary() ska ge samma svar med och utan en förbyggd kub."""
+    df = _sample_movies_df()
+    cube = build_cube(df)
+    pd.testing.assert_frame_equal(an.genre_rating_summary(df), an.genre_rating_summary(df, cube))
+    pd.testing.assert_frame_equal(an.year_count_summary(df), an.year_count_summary(df, cube))
@@ -0,0 +1,43 @@
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+from sqlalchemy import create_engine
+
+import src.analyze as an
+import src.export_parquet as ep
+from src.load import load_movies_refresh
+from tests.test_analyze import _sample_movies_df
+
+
+def test_export_parquet_partitions_types_and_projection(monkeypatch, tmp_path):
+    """
+    export_parquet() ska skriva movies partitionerat per år med typade kolumner,
+    plus sammanställningarna, utan kvarlämnade temporära filer. En omexport
+    ska ersätta datasetet (inga gamla partitioner kvar).
+    """
+    engine = create_engine(f"sqlite:///{tmp_path / 'etl.db'}")
+    load_movies_refresh(engine, _sample_movies_df())
+    # Standarddatabasen är en annan (tom) – allt ska ändå läsas från engine
+    monkeypatch.setattr(an, "get_engine", lambda: create_engine("sqlite:///:memory:"))
+
+    out = tmp_path / "parquet"
+    ep.export_parquet(engine, out, views={"type_year_summary": ["type", "year"]})
+
+    assert sorted(p.name for p in (out / "movies").iterdir()) == ["year=2022", "year=2024"]
+    assert pq.read_table(out / "genre_rating_summary.parquet").column("count").to_pylist() == [1, 1, 1]
+    assert pq.read_table(out / "type_year_summary.parquet").num_rows > 0
+    assert not [p for p in out.iterdir() if p.name.startswith(".")]
+
+    schema = pq.read_schema(next((out / "movies" / "year=2024").glob("*.parquet")))
+    assert schema.field("imdb_rating").type == pa.float64()
+    assert pa.types.is_timestamp(schema.field("fetched_at").type)
+
+    only_2022 = ep.read_movies_parquet(columns=["imdb_id", "imdb_rating"], years=[2022], path=out / "movies")
+    assert list(only_2022.columns) == ["imdb_id", "imdb_rating"]
+    assert only_2022["imdb_id"].tolist() == ["tt3"]
+
+    # Omexport efter att 2022-filmen försvunnit
+    load_movies_refresh(engine, _sample_movies_df().iloc[:2])
+    ep.write_movies_parquet(engine, out)
+    assert [p.name for p in (out / "movies").iterdir()] == ["year=2024"]
+    assert len(ep.read_movies_parquet(path=out / "movies")) == 2
@@ -249,3 +249,42 @@ def test_build_dataset_for_year_range_filters_years(monkeypatch):
     # check that __source_query__ column is still added for context
     assert "__source_query__" in df.columns
     assert df.iloc[0]["__source_query__"] == "new"
+
+
+def test_warm_state_reuses_session_and_caches_details(monkeypatch):
+    """
+    I varmt läge (tjänsteläget) ska detaljsvar hämtas via den delade
+    sessionen en gång och sedan serveras ur svarscachen. Misslyckade
+    svar ("Response": "False") ska inte cachas.
+    """
+    monkeypatch.setenv("OMDB_API_KEY", "TESTKEY")
+    calls = []
+
+    def fake_get(url, params=None, timeout=None):
+        calls.append(params["i"])
+        if params["i"] == "tt_missing":
+            return DummyResp({"Response": "False", "Error": "Incorrect IMDb ID."})
+        return DummyResp({"Response": "True", "imdbID": params["i"], "Title": "Cached"})
+
+    ex.enable_warm_state()
+    try:
+        monkeypatch.setattr(ex._session, "get", fake_get)
+        assert ex.fetch_movie_details("tt1")["Title"] == "Cached"
+        assert ex.fetch_movie_details("tt1")["Title"] == "Cached"
+        assert ex.fetch_movie_details("tt_missing") == {}
+        assert ex.fetch_movie_details("tt_missing") == {}
+        assert calls == ["tt1", "tt_missing", "tt_missing"]
+    finally:
+        ex.disable_warm_state()
+
+
+def test_response_cache_expires_and_evicts():
+    now = [0.0]
+    cache = ex.ResponseCache({"details": 10}, max_entries=2, clock=lambda: now[0])
+    cache.put("details", "a", {"x": 1})
+    cache.put("details", "b", {"x": 2})
+    cache.get("details", "a")                  # a blir senast använd
+    cache.put("details", "c", {"x": 3})        # b (äldst) trängs ut
+    assert ("details", "b") not in cache and ("details", "a") in cache
+    now[0] = 11
+    assert cache.get("details", "a") is None   # TTL har gått ut
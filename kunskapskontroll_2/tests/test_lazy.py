@@ -0,0 +1,43 @@
+import subprocess
+import sys
+from pathlib import Path
+
+from src.lazy import lazy_import
+
+PROJECT_ROOT = Path(__file__).resolve().parents[1]
+
+
+def test_import_main_has_no_heavy_imports_or_side_effects():
+    """
+    Att importera main (och därmed alla src-moduler) ska inte ladda pandas,
+    SQLAlchemy, requests eller pyarrow, och inte konfigurera loggern
+    (ingen loggfil öppnas). Körs i en ny process så att testets egna
+    importer inte påverkar.
+    """
+    code = (
+        "import logging, sys, main\n"
+        "heavy = ['pandas.core.frame', 'sqlalchemy.engine', 'requests.sessions', 'pyarrow.lib']\n"
+        "print([m for m in heavy if m in sys.modules], logging.getLogger('etl').handlers)\n"
+    )
+    out = subprocess.run(
+        [sys.executable, "-c", code], cwd=PROJECT_ROOT, capture_output=True, text=True, check=True
+    ).stdout.strip()
+    assert out == "[] []"
+
+
+def test_lazy_import_loads_on_first_use():
+    json_mod = lazy_import("json")  # redan importerad -> samma modul
+    assert json_mod is sys.modules["json"]
+
+    code = (
+        "import sys\n"
+        "from src.lazy import lazy_import\n"
+        "mod = lazy_import('tomllib')\n"
+        "before = 'tomllib._parser' in sys.modules\n"
+        "print(before, mod.loads('a = 1'), 'tomllib._parser' in sys.modules)\n"
+    )
+    out = subprocess.run(
+        [sys.executable, "-c", code], cwd=PROJECT_ROOT, capture_output=True, text=True, check=True
+    ).stdout.strip()
+    # Modulen körs först vid första attributåtkomsten
+    assert out == "False {'a': 1} True"
@@ -1,9 +1,21 @@
+import sqlite3
+from unittest.mock import MagicMock
 import pandas as pd
 import pytest
 from sqlalchemy import create_engine, text
 from sqlalchemy.exc import IntegrityError
 
-from src.load import ensure_schema, load_movies_refresh
+from src.load import (
+    MOVIES_INDEXES,
+    ensure_schema,
+    load_movies_refresh,
+    load_movies_incremental,
+    bulk_load_movies,
+    get_engine,
+    dispose_engines,
+    build_star_schema,
+    table_version,
+)
 
 
 def _sample_extended_df():
@@ -124,3 +136,314 @@ def test_load_refresh_handles_empty_dataframe():
         "imdb_votes",
         "fetched_at",
     }.issubset(set(cols))
+
+
+def test_load_incremental_only_writes_changes():
+    engine = create_engine("sqlite:///:memory:", future=True)
+
+    first = load_movies_incremental(engine, _sample_extended_df())
+    assert first == {"inserted": 2, "updated": 0, "unchanged": 0, "deleted": 0}
+
+    # tt1 oförändrad (ny fetched_at räknas inte), tt2 får nytt betyg, tt3 är ny
+    df2 = _sample_extended_df()
+    df2["fetched_at"] = "2025-02-01T00:00:00Z"
+    df2.loc[df2["imdb_id"] == "tt2", "imdb_rating"] = 9.1
+    df2 = pd.concat([df2, df2.iloc[[0]].assign(imdb_id="tt3", title="Baz")], ignore_index=True)
+
+    stats = load_movies_incremental(engine, df2)
+    assert stats == {"inserted": 1, "updated": 1, "unchanged": 1, "deleted": 0}
+
+    with engine.connect() as conn:
+        rows = dict(conn.execute(text("SELECT imdb_id, fetched_at FROM movies")).fetchall())
+        rating = conn.execute(text("SELECT imdb_rating FROM movies WHERE imdb_id = 'tt2'")).scalar_one()
+    # oförändrad rad ska inte ha skrivits om
+    assert rows["tt1"] == "2025-01-01T00:00:00Z"
+    assert rows["tt3"] == "2025-02-01T00:00:00Z"
+    assert rating == pytest.approx(9.1)
+
+
+def test_load_incremental_delete_missing_and_empty_input():
+    engine = create_engine("sqlite:///:memory:", future=True)
+    load_movies_incremental(engine, _sample_extended_df())
+
+    # tomt extract ska INTE tömma tabellen, inte ens med delete_missing
+    stats = load_movies_incremental(engine, _sample_extended_df().iloc[0:0], delete_missing=True)
+    assert stats["deleted"] == 0
+
+    stats = load_movies_incremental(engine, _sample_extended_df().iloc[[0]], delete_missing=True)
+    assert stats["deleted"] == 1
+
+    with engine.connect() as conn:
+        ids = [r[0] for r in conn.execute(text("SELECT imdb_id FROM movies")).fetchall()]
+    assert ids == ["tt1"]
+
+
+def test_table_version_bumps_only_when_movies_change():
+    engine = create_engine("sqlite:///:memory:", future=True)
+    assert table_version(engine) == 0
+
+    load_movies_refresh(engine, _sample_extended_df())
+    assert table_version(engine) == 1
+
+    # oförändrad inkrementell körning -> samma version (läsarnas cacher gäller)
+    load_movies_incremental(engine, _sample_extended_df())
+    assert table_version(engine) == 1
+
+    changed = _sample_extended_df()
+    changed.loc[0, "imdb_rating"] = 5.0
+    load_movies_incremental(engine, changed)
+    assert table_version(engine) == 2
+
+    bulk_load_movies(engine, _sample_extended_df().assign(imdb_id=["tt8", "tt9"]))
+    assert table_version(engine) == 3
+
+
+def test_load_rejects_non_sqlite_engines():
+    engine = MagicMock()
+    engine.url.get_backend_name.return_value = "postgresql"
+    with pytest.raises(ValueError, match="SQLite"):
+        load_movies_refresh(engine, _sample_extended_df())
+    with pytest.raises(ValueError, match="SQLite"):
+        bulk_load_movies(engine, _sample_extended_df())
+    engine.begin.assert_not_called()
+
+
+def test_bulk_load_uses_wal_and_rebuilds_indexes(tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path / 'bulk.db'}", future=True)
+    ensure_schema(engine)
+    with engine.begin() as conn:
+        conn.execute(text("CREATE INDEX idx_test_year ON movies(year)"))
+
+    # liten chunk_size så att flera executemany-batchar körs
+    n = bulk_load_movies(engine, _sample_extended_df(), chunk_size=1)
+    assert n == 2
+
+    with engine.connect() as conn:
+        rows = conn.execute(text("SELECT COUNT(*) FROM movies")).scalar_one()
+        journal = conn.execute(text("PRAGMA journal_mode")).scalar_one()
+        indexes = conn.execute(
+            text("SELECT name FROM sqlite_master WHERE type = 'index' AND tbl_name = 'movies'")
+        ).scalars().all()
+        hashes = conn.execute(text("SELECT COUNT(row_hash) FROM movies")).scalar_one()
+    assert rows == 2
+    assert journal == "wal"
+    assert "idx_test_year" in indexes  # indexet byggdes om efter laddningen
+    assert hashes == 2
+
+
+
+def test_bulk_cursor_closes_connection_when_setup_fails():
+    # fel redan när pragman läses får inte läcka den råa anslutningen
+    from src.load import _sqlite_bulk_cursor
+
+    raw = MagicMock()
+    raw.driver_connection.cursor.return_value.execute.side_effect = sqlite3.OperationalError("locked")
+    engine = MagicMock()
+    engine.raw_connection.return_value = raw
+
+    with pytest.raises(sqlite3.OperationalError):
+        with _sqlite_bulk_cursor(engine):
+            pass
+    raw.close.assert_called_once()
+
+def test_refresh_swaps_staging_table_atomically(tmp_path):
+    """
+    En läsare som redan har startat en läs-transaktion ska fortsätta se den
+    gamla tabellen medan refresh byter in den nya, och sedan se den nya.
+    """
+    db_path = tmp_path / "swap.db"
+    engine = create_engine(f"sqlite:///{db_path}", future=True)
+    ensure_schema(engine)
+    with engine.begin() as conn:
+        conn.execute(text("CREATE INDEX idx_test_year ON movies(year)"))
+    load_movies_refresh(engine, _sample_extended_df())
+
+    reader = sqlite3.connect(db_path, isolation_level=None)
+    reader.execute("BEGIN")
+    assert reader.execute("SELECT COUNT(*) FROM movies").fetchone()[0] == 2
+
+    load_movies_refresh(engine, _sample_extended_df().iloc[[0]])
+
+    # samma snapshot under pågående läsning
+    assert reader.execute("SELECT COUNT(*) FROM movies").fetchone()[0] == 2
+    reader.execute("COMMIT")
+    assert reader.execute("SELECT COUNT(*) FROM movies").fetchone()[0] == 1
+    reader.close()
+
+    with engine.connect() as conn:
+        tables = conn.execute(text("SELECT name FROM sqlite_master WHERE type = 'table'")).scalars().all()
+        indexes = conn.execute(
+            text("SELECT name FROM sqlite_master WHERE type = 'index' AND tbl_name = 'movies'")
+        ).scalars().all()
+    assert "movies_staging" not in tables
+    assert "idx_test_year" in indexes
+
+
+def test_schema_indexes_and_planner_statistics(tmp_path):
+    """
+    ensure_schema() ska skapa de sekundära indexen och varje laddning ska
+    uppdatera planner-statistiken (sqlite_stat1) så att indexen används.
+    """
+    engine = create_engine(f"sqlite:///{tmp_path / 'idx.db'}", future=True)
+    load_movies_refresh(engine, _sample_extended_df())
+
+    with engine.connect() as conn:
+        indexes = set(conn.execute(
+            text("SELECT name FROM sqlite_master WHERE type = 'index' AND tbl_name = 'movies'")
+        ).scalars().all())
+        stats = conn.execute(text("SELECT COUNT(*) FROM sqlite_stat1 WHERE tbl = 'movies'")).scalar_one()
+        plan = " ".join(
+            str(r[-1]) for r in conn.execute(text(
+                "EXPLAIN QUERY PLAN SELECT genre_primary, AVG(imdb_rating), COUNT(imdb_id) "
+                "FROM movies GROUP BY genre_primary"
+            )).fetchall()
+        )
+
+    assert set(MOVIES_INDEXES).issubset(indexes)
+    assert stats > 0
+    assert "COVERING INDEX idx_movies_genre_rating" in plan
+
+
+def test_get_engine_is_shared_per_url_and_sets_pragmas(tmp_path):
+    url = f"sqlite:///{tmp_path / 'nested' / 'shared.db'}"
+    engine = get_engine(url)
+
+    # samma engine (och pool) för samma URL
+    assert get_engine(url) is engine
+    assert (tmp_path / "nested").is_dir()
+
+    with engine.connect() as conn:
+        assert conn.execute(text("PRAGMA journal_mode")).scalar_one() == "wal"
+        assert conn.execute(text("PRAGMA foreign_keys")).scalar_one() == 1
+        assert conn.execute(text("PRAGMA busy_timeout")).scalar_one() == 5000
+
+    dispose_engines()
+    assert get_engine(url) is not engine
+    dispose_engines()
+
+
+def _summaries_from_tables(engine):
+    with engine.connect() as conn:
+        genres = conn.execute(text(
+            "SELECT genre_primary, count, ROUND(avg_imdb_rating, 6) FROM genre_rating_summary "
+            "ORDER BY genre_primary"
+        )).fetchall()
+        years = conn.execute(text("SELECT year, count FROM year_count_summary ORDER BY year")).fetchall()
+    return genres, years
+
+
+def _summaries_from_scratch(engine):
+    with engine.connect() as conn:
+        genres = conn.execute(text(
+            "SELECT genre_primary, COUNT(imdb_id), ROUND(AVG(imdb_rating), 6) FROM movies "
+            "GROUP BY genre_primary ORDER BY genre_primary"
+        )).fetchall()
+        years = conn.execute(text(
+            "SELECT year, COUNT(imdb_id) FROM movies GROUP BY year ORDER BY year"
+        )).fetchall()
+    return genres, years
+
+
+def test_summary_tables_follow_every_load_path(tmp_path):
+    """
+    genre_rating_summary/year_count_summary ska alltid vara lika med en
+    omräkning från movies, oavsett laddningsväg (refresh, bulk, incremental).
+    """
+    engine = create_engine(f"sqlite:///{tmp_path / 'summary.db'}", future=True)
+
+    load_movies_refresh(engine, _sample_extended_df())
+    assert _summaries_from_tables(engine) == _summaries_from_scratch(engine)
+
+    # bulk-append av en ny rad utan genre (NULL-grupp) och utan betyg
+    extra = _sample_extended_df().iloc[[0]].assign(
+        imdb_id="tt9", genre_primary=None, imdb_rating=None, year=2001
+    )
+    bulk_load_movies(engine, extra)
+    assert _summaries_from_tables(engine) == _summaries_from_scratch(engine)
+
+    # incremental: tt1 byter genre och år, tt3 ny, tt2/tt9 tas bort
+    df = _sample_extended_df()
+    df.loc[df["imdb_id"] == "tt1", ["genre_primary", "year", "imdb_rating"]] = ["Drama", 2005, 6.3]
+    df.loc[df["imdb_id"] == "tt2", "imdb_id"] = "tt3"
+    load_movies_incremental(engine, df, delete_missing=True)
+    genres, years = _summaries_from_tables(engine)
+    assert (genres, years) == _summaries_from_scratch(engine)
+    assert [g[0] for g in genres] == ["Drama"]
+    assert years == [(1999, 1), (2005, 1)]
+
+
+def test_star_schema_normalizes_multi_valued_fields(tmp_path):
+    """
+    build_star_schema() ska ge en rad per unikt värde i dimensionerna,
+    en bryggrad per (film, värde), och behålla nycklarna mellan körningar.
+    """
+    engine = create_engine(f"sqlite:///{tmp_path / 'etl.db'}")
+    df = _sample_extended_df()
+    df.loc[0, "country"] = "USA, UK"
+    load_movies_refresh(engine, df)
+
+    counts = build_star_schema(engine)
+    assert counts["fact_movies"] == len(df)
+
+    with engine.connect() as conn:
+        genres = dict(conn.execute(text("SELECT name, genre_id FROM dim_genre")).all())
+        expected = {g.strip() for row in df["genre"].dropna() for g in row.split(",")}
+        assert set(genres) == expected
+
+        # Att joina tillbaka via bryggan ger samma genre-lista per film
+        rebuilt = dict(conn.execute(text(
+            "SELECT b.imdb_id, group_concat(d.name, ', ') FROM "
+            "(SELECT * FROM movie_genre ORDER BY imdb_id, position) b "
+            "JOIN dim_genre d USING (genre_id) GROUP BY b.imdb_id"
+        )).all())
+        assert rebuilt == dict(zip(df["imdb_id"], df["genre"].str.replace(r"\s*,\s*", ", ", regex=True)))
+
+        assert conn.execute(text("SELECT COUNT(*) FROM movie_country")).scalar() == len(df) + 1
+        primary = conn.execute(text(
+            "SELECT d.name FROM fact_movies f JOIN dim_genre d ON d.genre_id = f.genre_primary_id "
+            "WHERE f.imdb_id = :i"
+        ), {"i": df.loc[0, "imdb_id"]}).scalar()
+        assert primary == df.loc[0, "genre_primary"]
+
+    # Ny körning utan första filmen: laddningen håller schemat uppdaterat själv,
+    # och nycklarna för kvarvarande genrer är oförändrade
+    load_movies_refresh(engine, df.iloc[1:])
+    with engine.connect() as conn:
+        after = dict(conn.execute(text("SELECT name, genre_id FROM dim_genre")).all())
+        assert conn.execute(text("SELECT COUNT(*) FROM movie_country")).scalar() == len(df) - 1
+        countries = set(conn.execute(text("SELECT name FROM dim_country")).scalars())
+    assert all(genres[name] == key for name, key in after.items())
+    assert countries == set(df["country"].iloc[1:])
+
+
+def test_star_schema_follows_incremental_loads_and_skips_na(tmp_path):
+    """
+    Inkrementella laddningar och bulk-laddningar ska uppdatera bryggorna för
+    just de ändrade filmerna; "N/A" ska aldrig bli en dimensionsrad, och
+    fact_movies ska vara en vy (ingen kopia av filmraderna).
+    """
+    engine = create_engine(f"sqlite:///{tmp_path / 'etl.db'}")
+    df = _sample_extended_df()
+    load_movies_incremental(engine, df)
+    build_star_schema(engine)
+
+    changed = df.copy()
+    changed.loc[1, "director"] = "N/A"
+    changed.loc[1, "country"] = "UK, N/A, Sweden"
+    load_movies_incremental(engine, changed)
+    bulk_load_movies(engine, df.iloc[[0]].assign(imdb_id="tt3", director="Dir C"))
+
+    with engine.connect() as conn:
+        kind = conn.execute(text("SELECT type FROM sqlite_master WHERE name = 'fact_movies'")).scalar()
+        directors = set(conn.execute(text("SELECT name FROM dim_director")).scalars())
+        countries = dict(conn.execute(text(
+            "SELECT d.name, b.position FROM movie_country b JOIN dim_country d USING (country_id) "
+            "WHERE b.imdb_id = 'tt2'"
+        )).all())
+        facts = conn.execute(text("SELECT COUNT(*) FROM fact_movies")).scalar()
+    assert kind == "view" and facts == 3
+    assert directors == {"Dir A", "Dir C"}          # Dir B borttagen, N/A aldrig tillagd
+    assert countries == {"UK": 0, "Sweden": 2}
+
+    # Schemat följer movies-versionen -> nästa anrop bygger inte om något
+    assert build_star_schema(engine)["dim_director"] == 2
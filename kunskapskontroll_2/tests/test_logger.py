@@ -1,10 +1,29 @@
 import importlib
 import logging
 from pathlib import Path
+import pytest
 import src.logger as logmod
 
 
-def test_get_logger_config_and_idempotency():
+@pytest.fixture(autouse=True)
+def tmp_log_path(monkeypatch, tmp_path):
+    """
+    Laddar om loggmodulen och pekar LOG_PATH mot tmp_path, så att testerna
+    aldrig skriver i projektets riktiga data/logs/app.log.
+    """
+    def reload():
+        importlib.reload(logmod)
+        monkeypatch.setattr(logmod, "LOG_DIR", tmp_path / "logs")
+        monkeypatch.setattr(logmod, "LOG_PATH", tmp_path / "logs" / logmod.LOG_FILE)
+
+    reload()
+    yield reload
+    logmod.shutdown_logging()
+    monkeypatch.undo()
+    importlib.reload(logmod)
+
+
+def test_get_logger_config_and_idempotency(tmp_log_path, tmp_path):
     """
     Testar den slutliga loggern i KK2.
 
@@ -15,9 +34,6 @@ def test_get_logger_config_and_idempotency():
     - Upprepad get_logger() återanvänder samma logger utan fler handlers.
     """
 
-    # Säkerställ att vi börjar i ett rent state
-    importlib.reload(logmod)
-
     # 1. Hämta loggern
     logger = logmod.get_logger()
 
@@ -48,6 +64,7 @@ def test_get_logger_config_and_idempotency():
     file_handler.flush()
 
     log_file_path = Path(file_handler.baseFilename)
+    assert log_file_path == tmp_path / "logs" / "app.log"
     assert log_file_path.exists(), "Loggfilen ska ha skapats"
     assert log_file_path.stat().st_size > 0, "Loggfilen ska inte vara tom"
 
@@ -55,3 +72,79 @@ def test_get_logger_config_and_idempotency():
     logger2 = logmod.get_logger()
     assert logger2 is logger
     assert len(logger2.handlers) == 2
+
+
+def test_queue_mode_is_bounded_and_flushes_on_shutdown(monkeypatch, tmp_log_path):
+    """
+    LOG_QUEUE=1: loggern har en enda köhandler, posterna skrivs av en
+    bakgrundstråd och shutdown_logging() tömmer kön till fil. En full kö
+    kastar INFO-poster istället för att blockera.
+    """
+    monkeypatch.setenv("LOG_QUEUE", "1")
+    tmp_log_path()
+    logger = logmod.get_logger()
+
+    assert [type(h).__name__ for h in logger.handlers] == ["BoundedQueueHandler"]
+    logger.info("queued hello from kk2")
+    logmod.shutdown_logging()
+
+    assert "queued hello from kk2" in logmod.LOG_PATH.read_text(encoding="utf-8")
+
+    # Full kö utan lyssnare: INFO kastas direkt, WARNING väntar block_sec och kastas sedan
+    import queue
+    full = logmod.BoundedQueueHandler(queue.Queue(maxsize=1), block_sec=0.01)
+    for level in (logging.INFO, logging.INFO, logging.WARNING):
+        full.handle(logging.makeLogRecord({"msg": "x", "levelno": level}))
+    assert full.dropped == 2
+
+
+def test_json_format_and_sampling(monkeypatch, tmp_log_path):
+    """
+    LOG_FORMAT=json: en JSON-rad per post med extra-fälten (query, page, ...).
+    LOG_SAMPLE=omdb.page=2: varannan INFO-post för det eventet, WARNING alltid.
+    Bortsamplade poster ska inte ens få sitt meddelande formaterat.
+    """
+    import json
+
+    monkeypatch.setenv("LOG_FORMAT", "json")
+    monkeypatch.setenv("LOG_SAMPLE", "omdb.page=2")
+    tmp_log_path()
+    logger = logmod.get_logger()
+
+    formatted = []
+
+    class Arg:
+        def __init__(self, page):
+            self.page = page
+
+        def __str__(self):
+            formatted.append(self.page)
+            return str(self.page)
+
+    marker = f"sample-test-{id(formatted)}"
+    for page in range(1, 5):
+        logger.info("%s page=%s", marker, Arg(page), extra={"event": "omdb.page", "page": page, "latency_ms": 1.5})
+    logger.warning("%s varning", marker, extra={"event": "omdb.page", "page": 0})
+    logmod.shutdown_logging()
+
+    lines = [
+        json.loads(line) for line in logmod.LOG_PATH.read_text(encoding="utf-8").splitlines()
+        if marker in line
+    ]
+    assert [l["page"] for l in lines] == [1, 3, 0]
+    assert lines[0]["latency_ms"] == 1.5 and lines[0]["event"] == "omdb.page"
+    assert set(formatted) == {1, 3}  # bara de behållna posterna formateras
+
+
+def _shared_logger_block(path: Path) -> str:
+    text = path.read_text(encoding="utf-8")
+    start = text.index("# --- Delad kod:")
+    return text[start:text.index("# --- Slut på delad kod ---", start)]
+
+
+def test_shared_logger_code_matches_other_project():
+    # Kö-, JSON- och samplingkoden är kopierad mellan projekten och ska hållas identisk
+    other = Path(logmod.__file__).resolve().parents[2] / "kunskapskontroll_1" / "src" / "logger.py"
+    if not other.exists():
+        pytest.skip("kunskapskontroll_1 finns inte bredvid det här projektet")
+    assert _shared_logger_block(Path(logmod.__file__)) == _shared_logger_block(other)
@@ -4,7 +4,7 @@ import pandas as pd
 import main as mainmod
 
 
-def test_main_runs_clean(monkeypatch):
+def test_main_runs_clean(monkeypatch, tmp_path):
     """
     Testar att main() körs utan undantag, med mockade moduler.
 
@@ -67,7 +67,13 @@ def test_main_runs_clean(monkeypatch):
     )
 
     # I main.py gjorde du: from src.analyze import export_analysis
-    monkeypatch.setattr(mainmod, "export_analysis", lambda: None)
+    export_kwargs = {}
+    monkeypatch.setattr(mainmod, "export_analysis", lambda **kw: export_kwargs.update(kw))
+
+    # Körningsrapporten ska hamna i tempmapp, inte i projektets data/metrics/
+    import src.metrics as metricsmod
+    report_path = tmp_path / "run_report.json"
+    monkeypatch.setattr(metricsmod, "RUN_REPORT_PATH", report_path)
 
     # 5. Kör main()
     rc = mainmod.main()
@@ -82,3 +88,37 @@ def test_main_runs_clean(monkeypatch):
     assert called_kwargs["allowed_genres"] == ["Action"]
     assert called_kwargs["dedupe_on"] == "title"
     assert called_kwargs["year_min"] == 2020
+    assert called_kwargs["memory_hook"] is None  # mäts bara med --profile-memory
+
+    # Kub-vyerna (genre × år, typ × år, land × genre) ska exporteras av pipelinen
+    from src.cube import CUBE_VIEWS
+    assert export_kwargs["views"] == CUBE_VIEWS
+
+    # Körningsrapporten ska ha stegtider för alla steg
+    import json
+    report = json.loads(report_path.read_text(encoding="utf-8"))
+    assert report["status"] == "ok"
+    assert set(report["stages"]) == {"extract", "transform", "load", "analyze"}
+
+
+def test_main_records_run_history_when_report_file_fails(monkeypatch):
+    """Körhistoriken (etl_runs) ska sparas även om JSON-rapporten inte kan skrivas."""
+    monkeypatch.setattr(mainmod, "load_dotenv", lambda *a, **kw: True)
+    monkeypatch.setenv("OMDB_API_KEY", "fakekey")
+    monkeypatch.setattr(mainmod, "build_dataset_for_year_range", lambda **kw: pd.DataFrame())
+    monkeypatch.setattr(mainmod, "transform_movies", lambda df, **kw: df)
+    monkeypatch.setattr(mainmod, "get_engine", lambda: MagicMock(url=MagicMock(database="fake.db")))
+    monkeypatch.setattr(mainmod, "load_movies_refresh", lambda *a, **kw: None)
+    monkeypatch.setattr(mainmod, "export_analysis", lambda **kw: None)
+
+    def fail_report(*a, **kw):
+        raise OSError("disken är full")
+
+    recorded = []
+    monkeypatch.setattr(mainmod, "write_run_report", fail_report)
+    monkeypatch.setattr(mainmod, "record_run", lambda engine, report, **kw: recorded.append(report))
+
+    assert mainmod.main() == 0
+    assert len(recorded) == 1
+    assert recorded[0]["status"] == "ok"
+    assert set(recorded[0]["stages"]) == {"extract", "transform", "load", "analyze"}
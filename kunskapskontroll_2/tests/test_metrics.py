@@ -0,0 +1,34 @@
+import json
+
+from src.metrics import MetricsRegistry, write_run_report
+
+
+def test_registry_report_and_prometheus_textfile(tmp_path):
+    """
+    Registret ska samla stegtider, räknare, mätare och histogram och
+    skriva dem som JSON-rapport och Prometheus-textfil.
+    """
+    m = MetricsRegistry()
+    with m.stage("load"):
+        m.inc("db_rows_written_total", 500, mode="refresh")
+    for ms in range(1, 101):
+        m.observe("omdb_http_latency_ms", float(ms), endpoint="search")
+        m.inc("omdb_api_calls_total", endpoint="search")
+    m.inc("transform_cache_total", result="hit")
+    m.inc("transform_cache_total", result="miss")
+    m.set("transform_rows", 42, step="dedupe")
+
+    report = write_run_report(m, path=tmp_path / "report.json", textfile=tmp_path / "etl.prom", status="ok")
+
+    assert json.loads((tmp_path / "report.json").read_text(encoding="utf-8"))["status"] == "ok"
+    assert report["stages"]["load"]["wall_sec"] >= 0
+    latency = report["histograms"][0]
+    assert latency["count"] == 100 and 45 <= latency["p50"] <= 55 and latency["max"] == 100
+    assert report["derived"]["transform_cache_hit_rate"] == 0.5
+    assert "db_rows_per_sec" in report["derived"]
+
+    prom = (tmp_path / "etl.prom").read_text(encoding="utf-8")
+    assert 'etl_omdb_api_calls_total{endpoint="search"} 100' in prom
+    assert 'etl_omdb_http_latency_ms_count{endpoint="search"} 100' in prom
+    assert 'etl_stage_wall_seconds{stage="load"}' in prom
+    assert "# TYPE etl_transform_rows gauge" in prom
@@ -0,0 +1,76 @@
+import pstats
+import time
+from pathlib import Path
+
+import pytest
+
+from src.profiling import Profiler
+
+
+def _busy(sec):
+    end = time.perf_counter() + sec
+    while time.perf_counter() < end:
+        sum(range(1000))
+
+
+def test_profiler_writes_stage_files(tmp_path):
+    """
+    Med profilering påslagen ska varje steg ge en cProfile-fil, en topplista,
+    samplade stackar i folded-format och (med memory=True) en tracemalloc-diff.
+    """
+    profiler = Profiler(enabled=True, out_dir=tmp_path, memory=True, sample_interval_ms=1)
+    with profiler.stage("transform"):
+        _busy(0.1)
+        data = [list(range(100)) for _ in range(1000)]
+    profiler.close()
+
+    stats = pstats.Stats(str(tmp_path / "transform.prof"))
+    assert any(func[2] == "_busy" for func in stats.stats)
+    assert "_busy" in (tmp_path / "transform.txt").read_text(encoding="utf-8")
+
+    folded = (tmp_path / "transform.folded").read_text(encoding="utf-8").splitlines()
+    assert folded and all(line.startswith("transform;") for line in folded)
+    assert any("_busy" in line for line in folded)
+    assert int(folded[0].rsplit(" ", 1)[1]) >= 1
+
+    assert "peak=" in (tmp_path / "transform.memory.txt").read_text(encoding="utf-8")
+    assert len(data) == 1000
+
+
+def test_profiler_disabled_writes_nothing(tmp_path):
+    profiler = Profiler(enabled=False, out_dir=tmp_path / "profiles")
+    with profiler.stage("load"):
+        pass
+    profiler.close()
+    assert not (tmp_path / "profiles").exists()
+
+
+def test_profiler_memory_hook_reports_transform_peak(tmp_path):
+    # memory_hook(steg) ger transformens topp i <steg>.memory.txt, men bara med memory=True
+    from src.transform import transform_movies
+    from tests.test_transform import _make_raw_df
+
+    assert Profiler(enabled=True, out_dir=tmp_path).memory_hook("transform") is None
+
+    profiler = Profiler(enabled=True, out_dir=tmp_path, memory=True, sample_interval_ms=1)
+    with profiler.stage("transform"):
+        transform_movies(_make_raw_df(), memory_hook=profiler.memory_hook("transform"))
+    profiler.close()
+
+    assert "memory_hook peak=" in (tmp_path / "transform.memory.txt").read_text(encoding="utf-8")
+
+
+def _shared_profiling_block(path: Path) -> str:
+    text = path.read_text(encoding="utf-8")
+    start = text.index("# --- Delad kod:")
+    return text[start:text.index("# --- Slut på delad kod ---", start)]
+
+
+def test_shared_profiling_code_matches_other_project():
+    # Profileraren är kopierad mellan projekten och ska hållas identisk
+    import src.profiling as profmod
+
+    other = Path(profmod.__file__).resolve().parents[2] / "kunskapskontroll_1" / "src" / "profiling.py"
+    if not other.exists():
+        pytest.skip("kunskapskontroll_1 finns inte bredvid det här projektet")
+    assert _shared_profiling_block(Path(profmod.__file__)) == _shared_profiling_block(other)
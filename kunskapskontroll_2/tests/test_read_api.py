@@ -0,0 +1,110 @@
+import json
+import urllib.request
+
+import pandas as pd
+import pytest
+from sqlalchemy import create_engine
+
+from src.load import load_movies_incremental, load_movies_refresh
+from src.read_api import MovieCache, ReadApi, query_movies
+
+
+def _movies(n=6):
+    return pd.DataFrame({
+        "imdb_id": [f"tt{i}" for i in range(n)],
+        "title": [f"Film {i}" for i in range(n)],
+        "year": [2020 + i % 3 for i in range(n)],
+        "type": ["movie" if i % 2 == 0 else "series" for i in range(n)],
+        "genre": ["Action, Drama"] * n,
+        "genre_primary": ["Action" if i < 4 else "Drama" for i in range(n)],
+        "director": ["Dir"] * n,
+        "country": ["Sweden"] * n,
+        "runtime_min": [100] * n,
+        "imdb_rating": [6.0 + i for i in range(n)],
+        "imdb_votes": [1000] * n,
+        "fetched_at": ["2025-01-01T00:00:00Z"] * n,
+    })
+
+
+class _Clock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+@pytest.fixture
+def engine(tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path / 'etl.db'}", future=True)
+    load_movies_refresh(engine, _movies())
+    yield engine
+    engine.dispose()
+
+
+def test_cache_reloads_only_when_table_version_changes(engine):
+    clock = _Clock()
+    cache = MovieCache(engine, check_interval_sec=1.0, clock=clock)
+    first = cache.snapshot()
+    assert len(first.movies) == 6 and cache.reloads == 1
+
+    # inom intervallet: ingen kontroll alls; efter intervallet: en radläsning, samma snapshot
+    assert cache.snapshot() is first and cache.version_checks == 1
+    clock.now = 2.0
+    assert cache.snapshot() is first and cache.version_checks == 2
+
+    # oförändrad inkrementell laddning behåller versionen, ändrad laddning invaliderar
+    load_movies_incremental(engine, _movies())
+    clock.now = 4.0
+    assert cache.snapshot() is first
+    load_movies_incremental(engine, _movies(8))
+    clock.now = 6.0
+    second = cache.snapshot()
+    assert second.version == first.version + 1 and len(second.movies) == 8
+    assert cache.reloads == 2
+
+    body = json.loads(query_movies(second, {"type": ["movie"], "year_min": ["2021"], "columns": ["imdb_id,year"]}))
+    assert body["total"] == 2
+    assert body["rows"] == [{"imdb_id": "tt2", "year": 2022}, {"imdb_id": "tt4", "year": 2021}]
+
+
+def _get(port, path, etag=None):
+    req = urllib.request.Request(f"http://127.0.0.1:{port}{path}")
+    if etag:
+        req.add_header("If-None-Match", etag)
+    try:
+        with urllib.request.urlopen(req, timeout=5) as r:
+            return r.status, r.headers.get("ETag"), r.read().decode()
+    except urllib.error.HTTPError as e:
+        return e.code, e.headers.get("ETag"), e.read().decode()
+
+
+def test_read_api_serves_pages_summaries_and_etags(engine):
+    api = ReadApi(MovieCache(engine, check_interval_sec=0), port=0)
+    api.start()
+    try:
+        status, etag, body = _get(api.port, "/movies?genre=Action&limit=2&offset=1")
+        page = json.loads(body)
+        assert status == 200 and page["total"] == 4
+        assert [r["imdb_id"] for r in page["rows"]] == ["tt1", "tt2"]
+
+        # samma fråga (annan parameterordning) + If-None-Match -> 304 utan kropp
+        status, same, body = _get(api.port, "/movies?offset=1&limit=2&genre=Action", etag=etag)
+        assert status == 304 and same == etag and body == ""
+
+        status, _, body = _get(api.port, "/summaries/genre")
+        assert status == 200
+        assert {r["genre_primary"]: r["count"] for r in json.loads(body)} == {"Action": 4, "Drama": 2}
+
+        # ny laddning -> ny version -> ny ETag och färsk data
+        load_movies_refresh(engine, _movies(3))
+        status, new_etag, body = _get(api.port, "/movies?offset=1&limit=2&genre=Action", etag=etag)
+        assert status == 200 and new_etag != etag and json.loads(body)["total"] == 3
+
+        assert _get(api.port, "/movies?limit=abc")[0] == 400
+        assert _get(api.port, "/movies?columns=row_hash")[0] == 400
+        assert _get(api.port, "/nope")[0] == 404
+        health = json.loads(_get(api.port, "/health")[2])
+        assert health["reloads"] == 2 and health["not_modified_total"] == 1
+    finally:
+        api.stop()
@@ -0,0 +1,84 @@
+import warnings
+
+from sqlalchemy import create_engine
+
+import src.run_history as rh
+
+
+def _report(extract_sec, status="ok", i=0):
+    return {
+        "started_at": f"2025-01-0{i + 1}T00:00:00",
+        "finished_at": f"2025-01-0{i + 1}T00:01:00",
+        "status": status,
+        "stages": {"extract": {"wall_sec": extract_sec}, "load": {"wall_sec": 1.0}},
+        "counters": [
+            {"name": "omdb_api_calls_total", "labels": {"endpoint": "search"}, "value": 10},
+            {"name": "omdb_api_calls_total", "labels": {"endpoint": "details"}, "value": 90},
+            {"name": "db_rows_written_total", "labels": {"mode": "refresh"}, "value": 250},
+        ],
+    }
+
+
+def test_run_history_flags_slower_stages(tmp_path, capsys):
+    """
+    record_run() ska spara en rad per körning och compare_latest()/CLI:n
+    ska flagga steg som är tydligt långsammare än medianen av de tidigare
+    lyckade körningarna (misslyckade körningar ingår inte i baslinjen).
+    """
+    url = f"sqlite:///{tmp_path / 'etl.db'}"
+    engine = create_engine(url)
+    for i, sec in enumerate([10.0, 11.0, 9.0]):
+        rh.record_run(engine, _report(sec, i=i), peak_memory=1_000)
+    rh.record_run(engine, _report(99.0, status="error", i=3))
+    run_id = rh.record_run(engine, _report(20.0, i=4), peak_memory=2_000)
+    assert run_id == 5
+
+    with warnings.catch_warnings():
+        warnings.simplefilter("error")   # inga "Mean of empty slice" för steg utan historik
+        result = rh.compare_latest(engine).set_index("metric")
+    assert "transform_sec" not in result.index
+    assert result.loc["extract_sec", "baseline"] == 10.0
+    assert bool(result.loc["extract_sec", "slower"]) is True
+    assert bool(result.loc["load_sec", "slower"]) is False
+    assert result.loc["api_calls", "latest"] == 100
+    assert result.loc["rows_loaded", "latest"] == 250
+
+    assert rh.main(["--db", url]) == 1
+    assert "Långsammare än baslinjen: extract_sec" in capsys.readouterr().out
+    assert rh.main(["--db", url, "--threshold", "2.0"]) == 0
+
+
+def test_run_memory_is_per_run_in_one_process(tmp_path, monkeypatch):
+    """
+    Två körningar i samma process (--serve): den andra ska inte ärva den
+    första körningens topp från ru_maxrss, utan få sin egen samplade topp.
+    """
+    state = {"max_rss": 100, "rss": 50}
+    monkeypatch.setattr(rh, "_max_rss_bytes", lambda: state["max_rss"])
+    monkeypatch.setattr(rh, "current_rss_bytes", lambda: state["rss"])
+    engine = create_engine(f"sqlite:///{tmp_path / 'etl.db'}")
+
+    # Körning 1 sätter en ny processtopp -> ru_maxrss gäller
+    first = rh.RunMemory()
+    state.update(rss=400, max_rss=400)
+    first._sample()
+    state["rss"] = 60
+    rh.record_run(engine, _report(1.0, i=0), peak_memory=first.stop())
+
+    # Körning 2 når aldrig den toppen -> körningens egen samplade topp
+    second = rh.RunMemory()
+    state["rss"] = 80
+    second._sample()
+    state["rss"] = 70
+    rh.record_run(engine, _report(1.0, i=1), peak_memory=second.stop())
+
+    with engine.connect() as conn:
+        peaks = conn.exec_driver_sql("SELECT peak_memory_bytes FROM etl_runs ORDER BY run_id").scalars().all()
+    assert peaks == [400, 80]
+
+    # Riktig sampling: tråden startar och stoppar och ger ett positivt värde
+    monkeypatch.undo()
+    live = rh.RunMemory(interval_sec=0.01)
+    live.start()
+    peak = live.stop()
+    assert peak is None or peak > 0
@@ -0,0 +1,75 @@
+import json
+import threading
+import time
+import urllib.request
+from datetime import datetime
+
+import pytest
+
+from src.service import CronSchedule, IntervalSchedule, ScheduleError, Service
+
+
+def test_cron_schedule_next_after():
+    monday = datetime(2026, 10, 19, 10, 7, 30)
+    assert CronSchedule("*/15 * * * *").next_after(monday) == datetime(2026, 10, 19, 10, 15)
+    assert CronSchedule("0 */6 * * *").next_after(monday) == datetime(2026, 10, 19, 12, 0)
+    assert CronSchedule("30 2 * * 7").next_after(monday) == datetime(2026, 10, 25, 2, 30)  # söndag
+    # både dag och veckodag angivna -> räcker att en matchar (som i cron)
+    assert CronSchedule("0 9 1 * 1-5").next_after(monday) == datetime(2026, 10, 20, 9, 0)
+    assert IntervalSchedule(90).next_after(monday) == datetime(2026, 10, 19, 10, 9)
+    for bad in ("61 * * * *", "x * * * *", "*/0 * * * *", "0 0 31 2 *", "* * *"):
+        with pytest.raises(ScheduleError):
+            CronSchedule(bad)
+
+
+def _get(port, path):
+    try:
+        with urllib.request.urlopen(f"http://127.0.0.1:{port}{path}", timeout=5) as r:
+            return r.status, r.read().decode()
+    except urllib.error.HTTPError as e:
+        return e.code, e.read().decode()
+
+
+def test_service_coalesces_triggers_and_exposes_health():
+    """
+    Triggers som kommer medan en körning pågår ska slås ihop till EN extra
+    körning, och /health, /metrics och /trigger ska spegla tjänstens läge.
+    """
+    started, release = threading.Event(), threading.Event()
+    exit_codes = iter([0, 1])
+
+    def job():
+        started.set()
+        release.wait(5)
+        return next(exit_codes)
+
+    service = Service(job, IntervalSchedule(3600), health_port=0)
+    thread = threading.Thread(target=service.run_forever, daemon=True)
+    thread.start()
+    try:
+        assert started.wait(5)
+        port = service.health_port
+        assert service.trigger() is True       # ny körning efter den pågående
+        assert service.trigger() is False      # sammanslagen
+        req = urllib.request.Request(f"http://127.0.0.1:{port}/trigger", method="POST")
+        with urllib.request.urlopen(req, timeout=5) as r:
+            assert r.status == 202 and json.loads(r.read())["coalesced"] is True
+
+        release.set()
+        for _ in range(100):
+            if service.runs_total == 2:
+                break
+            time.sleep(0.05)
+
+        status, body = _get(port, "/health")
+        health = json.loads(body)
+        assert status == 503 and health["status"] == "failing"   # andra körningen gav exit 1
+        assert health["runs_total"] == 2 and health["coalesced_total"] == 2
+        assert health["last_run"]["exit_code"] == 1
+
+        status, body = _get(port, "/metrics")
+        assert status == 200 and "etl_service_runs_total 2" in body
+    finally:
+        service.stop()
+        thread.join(5)
+    assert not thread.is_alive()
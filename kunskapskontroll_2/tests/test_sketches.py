@@ -0,0 +1,36 @@
+import numpy as np
+
+from src.sketches import HyperLogLog, QuantileSketch
+
+
+def test_quantile_sketch_is_accurate_mergeable_and_bounded():
+    """
+    Kvantilerna ska ligga nära de exakta, även när sketchen byggs av två
+    sammanslagna delsketcher, och minnet ska vara litet jämfört med datat.
+    """
+    rng = np.random.default_rng(7)
+    values = rng.normal(6.5, 1.2, 200_000)
+
+    left = QuantileSketch()
+    for chunk in np.array_split(values[:100_000], 10):
+        left.update(chunk)
+    right = QuantileSketch(seed=1).update(values[100_000:])
+    merged = QuantileSketch.from_json(left.merge(right).to_json())
+
+    approx = merged.quantiles([0.1, 0.5, 0.9])
+    exact = np.quantile(values, [0.1, 0.5, 0.9])
+    assert merged.n == len(values)
+    assert np.allclose(approx, exact, atol=0.05)
+    assert sum(level.size for level in merged.levels) < 5_000
+    assert np.isnan(QuantileSketch().update([None, np.nan]).quantiles([0.5])[0])
+
+
+def test_hyperloglog_counts_distinct_values_and_merges():
+    """HLL ska räkna unika värden inom några procent och tåla dubbletter/merge."""
+    a = HyperLogLog().update([f"dir {i}" for i in range(30_000)])
+    b = HyperLogLog().update([f"dir {i}" for i in range(20_000, 50_000)] + [None])
+
+    merged = HyperLogLog.from_json(a.merge(b).to_json())
+
+    assert abs(merged.count() - 50_000) / 50_000 < 0.05
+    assert HyperLogLog().update(["USA", "UK", "USA"]).count() == 2
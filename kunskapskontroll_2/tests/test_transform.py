@@ -145,3 +145,65 @@ def test_transform_movies_raises_if_missing_columns():
     ])
     with pytest.raises(TransformError):
         transform_movies(bad)
+
+
+def test_transform_movies_reports_peak_memory_and_keeps_input():
+    # memory_hook ska få toppminnet (bytes) och rådata får inte muteras
+    raw = _make_raw_df()
+    before = raw.copy()
+    peaks = []
+
+    result = transform_movies(raw, allowed_types=["movie"], memory_hook=peaks.append)
+
+    # kvar: Action Film, Old Action, Romantic Comedy (dublett + saknad rating bort)
+    assert list(result["imdb_id"]) == ["tt1", "tt4", "tt5"]
+    assert list(result.index) == [0, 1, 2]
+    assert len(peaks) == 1 and peaks[0] > 0
+    pd.testing.assert_frame_equal(raw, before)
+
+
+def test_transform_movies_dedupes_on_every_column_of_the_renamed_frame():
+    # dedupe_on godtar alla kolumner som fanns i den omdöpta framen, även
+    # rå kolumner som inte hamnar i utdata (runtime, __source_query__)
+    raw = _make_raw_df()
+    raw.loc[raw["imdbID"] == "tt4", "Runtime"] = "120 min"
+    raw["__source_query__"] = ["a", "a", "b", "b", "c", "c"]
+
+    # Referens: imdb_id är unikt -> alla filtrerade rader, plus de råa extrakolumnerna
+    rows = transform_movies(raw, dedupe_on="imdb_id").merge(
+        raw[["imdbID", "Runtime", "__source_query__"]].rename(
+            columns={"imdbID": "imdb_id", "Runtime": "runtime"}
+        ),
+        on="imdb_id",
+    )
+    for column in rows.columns:
+        expected = list(rows.drop_duplicates(subset=[column])["imdb_id"])
+        assert list(transform_movies(raw, dedupe_on=column)["imdb_id"]) == expected, column
+
+    assert list(transform_movies(raw, dedupe_on="runtime")["imdb_id"]) == ["tt1", "tt1b", "tt2", "tt5"]
+    assert list(transform_movies(raw, dedupe_on="__source_query__")["imdb_id"]) == ["tt1", "tt2", "tt4"]
+    assert list(transform_movies(raw, dedupe_on="fetched_at")["imdb_id"]) == ["tt1"]
+
+    # Kolumner som inte fanns i den omdöpta framen (rånamnet Title, okända) ger fel
+    for bad in ("Title", "nope"):
+        with pytest.raises(TransformError):
+            transform_movies(raw, dedupe_on=bad)
+
+
+def test_transform_movies_memory_hook_keeps_outer_tracemalloc_peak():
+    # Under en yttre mätning (--profile-memory) får transformen inte nollställa toppen
+    import tracemalloc
+
+    tracemalloc.start()
+    try:
+        big = bytearray(20_000_000)
+        del big
+        outer_peak = tracemalloc.get_traced_memory()[1]
+        peaks = []
+
+        transform_movies(_make_raw_df(), memory_hook=peaks.append)
+
+        assert tracemalloc.get_traced_memory()[1] >= outer_peak
+        assert len(peaks) == 1 and 0 <= peaks[0] < outer_peak
+    finally:
+        tracemalloc.stop()
@@ -0,0 +1,57 @@
+import os
+import pandas as pd
+
+import src.transform_cache as tc
+from tests.test_transform import _make_raw_df
+
+
+def test_transform_cache_miss_then_hit(monkeypatch, tmp_path):
+    """
+    Första anropet ska köra transform_movies() och spara resultatet,
+    andra anropet (samma rådata + parametrar) ska läsa från cachen.
+    """
+    calls = {"n": 0}
+    real_transform = tc.transform_movies
+
+    def counting_transform(df, **kwargs):
+        calls["n"] += 1
+        return real_transform(df, **kwargs)
+
+    monkeypatch.setattr(tc, "transform_movies", counting_transform)
+
+    params = dict(allowed_types=["movie"], allowed_genres=["Action"], dedupe_on="title", year_min=2015)
+
+    first = tc.transform_movies_cached(_make_raw_df(), cache_dir=tmp_path, **params)
+    second = tc.transform_movies_cached(_make_raw_df(), cache_dir=tmp_path, **params)
+
+    assert calls["n"] == 1
+    assert len(list(tmp_path.glob("*.arrow"))) == 1
+    pd.testing.assert_frame_equal(
+        first.drop(columns=["fetched_at"]),
+        second.drop(columns=["fetched_at"]),
+    )
+
+    # Andra parametrar -> ny nyckel -> ny transform
+    tc.transform_movies_cached(_make_raw_df(), cache_dir=tmp_path, year_min=2020)
+    assert calls["n"] == 2
+
+    # Ändrad transform.py -> ny nyckel, även utan att CACHE_VERSION höjts
+    monkeypatch.setattr(tc, "transform_source_hash", lambda: "changed-transform")
+    tc.transform_movies_cached(_make_raw_df(), cache_dir=tmp_path, **params)
+    assert calls["n"] == 3
+
+
+def test_transform_cache_evicts_least_recently_used(tmp_path):
+    """
+    evict_cache() ska ta bort de äldsta filerna tills katalogen ryms i max_bytes,
+    men alltid behålla den senast använda.
+    """
+    for i, name in enumerate(["a", "b", "c"]):
+        p = tmp_path / f"{name}.arrow"
+        p.write_bytes(b"x" * 100)
+        os.utime(p, (1_000 + i, 1_000 + i))
+
+    removed = tc.evict_cache(tmp_path, max_bytes=150)
+
+    assert removed == 2
+    assert [p.name for p in tmp_path.glob("*.arrow")] == ["c.arrow"]